@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+
+import sys
+from os.path import dirname, join
+sys.path.append(join(dirname(__file__), "..")) # Enable importing from parent directory
+
+def light_bright3(devname):
+    import att26a
+    from att26a import reflex
+    import signal
+
+    with att26a.ATT26A(devname) as led_board:
+        def signal_handler(sig, frame):
+            led_board.close()
+        signal.signal(signal.SIGINT, signal_handler)
+
+        # The driver lights the LEDs itself, however slow this loop is.
+        led_board.add_reflex(reflex.Cycle(range(0, 100)))
+        led_board.add_reflex(reflex.RadioGroup(range(100, 120)))
+
+        while led_board.is_open:
+            try:
+                btn = led_board.get_btn_press()
+                print("Button %d pressed" % btn)
+            except att26a.DriverClosedError as e:
+                break
+
+if __name__ == "__main__":
+    from att26a.clihelper import setup_standard_demo_cli
+    setup_standard_demo_cli('Light Bright with reflex rules', light_bright3)
@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+
+import sys
+from os.path import dirname, join
+sys.path.append(join(dirname(__file__), "..")) # Enable importing from parent directory
+
+def ticker(devname):
+    import att26a
+    from att26a import text
+    import signal
+
+    with att26a.ATT26A(devname) as led_board:
+        def signal_handler(sig, frame):
+            led_board.close()
+        signal.signal(signal.SIGINT, signal_handler)
+
+        message = text.TextRenderer().scrolling("Hello from the 26A! ")
+        with text.TextScroller(led_board, message, rate=8.0):
+            while led_board.is_open:
+                try:
+                    btn = led_board.get_btn_press()
+                    print("Button %d pressed" % btn)
+                except att26a.DriverClosedError as e:
+                    break
+
+if __name__ == "__main__":
+    from att26a.clihelper import setup_standard_demo_cli
+    setup_standard_demo_cli('Scroll a message across the LEDs', ticker)
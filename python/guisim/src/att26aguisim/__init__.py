@@ -1,146 +1,23 @@
 #! /usr/bin/env python3
-import att26a
-from att26a.simulator import Att26aSimBase
-
-from PyQt5 import QtCore
-from PyQt5 import QtWidgets
-from PyQt5 import QtGui
-
 import logging
-
-# Parse the ui file once.
-import sys, os.path
-from PyQt5 import uic
-thisdir = os.path.dirname(os.path.abspath(__file__))
-sys.path.append(thisdir) # Needed to load ui
-Att26aSimUi, Att26aSimUiBase = uic.loadUiType(os.path.join(thisdir, 'main.ui'))
-del sys.path[-1] # Remove the now unnecessary path entry
+import threading
 
 __title__ = 'att26aguisim'
 __version__ = '0.0.1'
 __author__ = 'Jessy Diamond Exum'
 
-palette_blink1 = QtGui.QPalette()
-palette_blink1.setColor(QtGui.QPalette.Highlight, QtGui.QColor(QtCore.Qt.blue))
-
-palette_blink2 = QtGui.QPalette()
-palette_blink2.setColor(QtGui.QPalette.Highlight, QtGui.QColor(QtCore.Qt.green))
-
-palette_off_on = QtGui.QPalette()
-palette_off_on.setColor(QtGui.QPalette.Highlight, QtGui.QColor(QtCore.Qt.red))
-
-class Att26ASimQt(QtWidgets.QMainWindow):
-    signal_set_led_state = QtCore.pyqtSignal(int, int)
-    signal_set_led_range_state = QtCore.pyqtSignal(int, list)
-    class Att26aSimInstrumentor(Att26aSimBase):
-        def __init__(self, serialdev, qtsim):
-            super().__init__(serialdev)
-            self.qtsim = qtsim
-
-        def on_set_led_range_state(self, start_ledid, states_on_off):
-            self.qtsim.signal_set_led_range_state.emit(start_ledid, states_on_off)
-
-        def on_set_led_state(self, state, ledID):
-            self.qtsim.signal_set_led_state.emit(state, ledID)
-
-        def on_set_factory_test_mode_enable(self, enable):
-            self.qtsim.on_set_factory_test_mode_enable(enable)
-
-        def on_set_IO_enable(self, enable):
-            self.qtsim.on_set_IO_enable(enable)
-
-        def on_get_led_status(self, ledID):
-            return self.on_get_led_status(ledID)
-
-    def on_set_led_range_state(self, start_ledid, states_on_off):
-        self._log.info("Setting %d LEDs starting at %d"%(len(states_on_off), start_ledid))
-        for i, state in enumerate(states_on_off):
-            led = self.leds[(start_ledid + i) % 100]
-            led.setPalette(palette_off_on)
-            led.setValue(state)
-
-    def on_set_led_state(self, state, ledID):
-        self._log.info("Setting led %d's state to %d IN PASS THROUGH"%(ledID, state))
-        led = self.leds[ledID]
-        ison = True
-        if state == att26a.LED_ON:
-            led.setPalette(palette_off_on)
-        elif state == att26a.LED_BLINK1:
-            led.setPalette(palette_blink1)
-        elif state == att26a.LED_BLINK2:
-            led.setPalette(palette_blink2)
-        else:
-            led.setPalette(palette_off_on)
-            ison = False
-
-        led.setValue(ison)
-
-    def on_set_factory_test_mode_enable(self, enable):
-        self._log.info("%s factory test" % "Enable" if enable else "Disable")
-        self._factory_test = enable
-
-    def on_set_IO_enable(self, enable):
-        self._log.info("%s IO driver" % "Enable" if enable else "Disable")
-        self._io_enabled = enable
-
-    def on_get_led_status(self, ledID):
-        self._log.info("Reading led %d state" % ledID)
-        return self.leds[ledID].value()
-
-    def __init__(self, serialdev, log=None):
-        super(Att26ASimQt, self).__init__()
-        self.ui = Att26aSimUi()
-        self.ui.setupUi(self)
-
-        # Set the signals for button presses
-        for btn_num in range(120):
-            btn = self.findChild(QtWidgets.QPushButton, "btn_%03d"%btn_num)
-            btn.pressed.connect(self.on_any_btn_press)
-
-        self.leds = [self.findChild(QtWidgets.QProgressBar, "led_%03d"%btn_num)
-                     for btn_num in range(120)]
-        self._factory_test = False
-        self._io_enabled = True
-
-        self.signal_set_led_state.connect(self.on_set_led_state)
-        self.signal_set_led_range_state.connect(self.on_set_led_range_state)
-
-        self.__sim = Att26ASimQt.Att26aSimInstrumentor(serialdev, self)
-
-        self._log = logging.getLogger('att26aguisim') if not log else log
-
-    @QtCore.pyqtSlot()
-    def on_any_btn_press(self):
-        btn_num = int(self.sender().text())
-        self.__sim.send_btn_press(btn_num)
-
-
-def run(app, serialdev):
-    window = Att26ASimQt(serialdev)
-    window.show()
-
-    return app.exec_() # Start the event loop.
-
-def main_bootstrap(serialdev):
-    import sys
-
-    # Initialize the QApplication object, and free it last.
-    # Not having this in a different function than other QT
-    # objects can cause segmentation faults as app is freed
-    # before the QWidgets.
-    app = QtWidgets.QApplication(sys.argv)
-
-    # Allow Ctrl-C to interrupt QT by scheduling GIL unlocks.
-    timer = QtCore.QTimer()
-    timer.start(500)
-    timer.timeout.connect(lambda: None) # Let the interpreter run.
-
-    sys.exit(run(app, serialdev))
+def __getattr__(name):
+    # Load Qt only once the window classes are actually used.
+    if name in ('Att26ASimQt', 'LedPanel', 'run', 'main_bootstrap'):
+        from . import window
+        return getattr(window, name)
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
 
 def main_api(address="", port=7778, log=None):
     from att26a.serial_adapter import RFC2217SerialAdapter
+    from .window import main_bootstrap
     r = RFC2217SerialAdapter(address, port, log)
-    main_bootstrap(r)
+    main_bootstrap(r, log)
 
 def main_cli():
     import argparse
@@ -170,17 +47,140 @@ def main_cli():
 
     main_api(args.addr, args.port)
 
-def _main_subprocess_bootstrap(q):
-    q.put(23)
-    main_api(port=0)
 
-def start_subprocess():
+class SimulatorProcess(object):
+    """Handle of a graphical simulator running in its own process.
+
+    Returned by start_subprocess(). Drivers connect to
+    'rfc2217://<address>:<port>'.
+
+    Attributes:
+        port (int): TCP port the simulator's RFC2217 server listens on.
+        process (:obj:`multiprocessing.Process`): The simulator process.
+    """
+
+    def __init__(self, process, conn, port):
+        self.process = process
+        self.port = port
+        self._conn = conn
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
+
+    @property
+    def is_alive(self):
+        return self.process.is_alive()
+
+    def _request(self, cmd, arg=None):
+        with self._lock:
+            self._conn.send((cmd, arg))
+            return self._conn.recv()
+
+    def state(self):
+        """Return a dict with the 120 LED modes ('leds'), 'factory_test',
+        'io_enabled' and 'in_reset'."""
+        return self._request('state')
+
+    def press(self, btn_id):
+        """Press button 'btn_id' as if it was clicked."""
+        self._request('press', btn_id)
+
+    def shutdown(self, timeout=5.0):
+        """Close the simulator window and wait for the process to exit."""
+        if self.process.is_alive():
+            try:
+                with self._lock:
+                    self._conn.send(('quit', None))
+            except (BrokenPipeError, OSError):
+                pass
+            self.process.join(timeout)
+            if self.process.is_alive():
+                self.process.terminate()
+                self.process.join()
+        self._conn.close()
+
+
+def _control_thread_func(conn, window, app):
+    from PyQt5 import QtCore
+    try:
+        while True:
+            cmd, arg = conn.recv()
+            if cmd == 'state':
+                conn.send(window.state())
+            elif cmd == 'press':
+                window.on_any_btn_press(arg)
+                conn.send(None)
+            elif cmd == 'quit':
+                break
+    except EOFError:
+        pass # The parent process went away.
+    QtCore.QMetaObject.invokeMethod(app, "quit", QtCore.Qt.QueuedConnection)
+
+def _main_subprocess_bootstrap(conn, address, port, loglevel):
+    import sys
+    logging.basicConfig(level=loglevel)
+    try:
+        from PyQt5 import QtWidgets
+        from att26a.serial_adapter import AsyncRFC2217SerialAdapter
+        from .window import Att26ASimQt
+
+        app = QtWidgets.QApplication(sys.argv[:1])
+        adapter = AsyncRFC2217SerialAdapter(address, port)
+        window = Att26ASimQt(adapter)
+        window.show()
+    except Exception as e:
+        conn.send(('error', "%s: %s" % (type(e).__name__, e)))
+        raise
+
+    conn.send(('ready', adapter.bound_port))
+    threading.Thread(target=_control_thread_func, args=(conn, window, app),
+                     daemon=True).start()
+    app.exec_()
+    adapter.close()
+
+def start_subprocess(address="localhost", port=0, loglevel=logging.WARNING, timeout=10.0):
+    """Run a graphical simulator in a new process.
+
+    May be called any number of times; every simulator gets its own
+    process and, with the default port 0, its own free TCP port.
+
+    Args:
+        address (str): Address of the simulator's RFC2217 server.
+        port (int): TCP port of the server; 0 picks a free one.
+        loglevel (int): Logging level in the simulator process.
+        timeout (float): Seconds to wait for the simulator to start.
+
+    Returns:
+        :obj:`SimulatorProcess`: Handle with the bound port.
+    """
     import multiprocessing as mp
-    mp.set_start_method("spawn")
-    q = mp.Queue()
-    p = mp.Process(target=_main_subprocess_bootstrap, args=(q,))
+    ctx = mp.get_context("spawn")
+    conn, child_conn = ctx.Pipe()
+    p = ctx.Process(target=_main_subprocess_bootstrap,
+                    args=(child_conn, address, port, loglevel), daemon=True)
     p.start()
-    return q.get()
+    child_conn.close()
+
+    try:
+        if not conn.poll(timeout):
+            raise RuntimeError("Simulator did not start within %.1f seconds." % timeout)
+        status, value = conn.recv()
+    except (RuntimeError, EOFError) as e:
+        p.terminate()
+        p.join()
+        conn.close()
+        if isinstance(e, EOFError):
+            raise RuntimeError("Simulator process exited during startup.")
+        raise
+    if status != 'ready':
+        p.join()
+        conn.close()
+        raise RuntimeError("Simulator failed to start: %s" % value)
+    return SimulatorProcess(p, conn, value)
 
 if __name__ == "__main__":
     main_cli()
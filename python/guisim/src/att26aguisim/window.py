@@ -0,0 +1,277 @@
+"""Qt window of the graphical simulator.
+
+Kept apart from the package so that importing att26aguisim does not
+load Qt.
+"""
+
+import att26a
+from att26a.simulator import Att26aSimBase
+
+from PyQt5 import QtCore
+from PyQt5 import QtWidgets
+from PyQt5 import QtGui
+
+import logging
+import threading
+
+# Rows of button IDs from top to bottom, in three groups like the console.
+ROW_GROUPS = (
+    [list(range(row * 10, row * 10 + 10)) for row in (9, 8, 7, 6, 5)],
+    [list(range(row * 10, row * 10 + 10)) for row in (4, 3, 2, 1, 0)],
+    [list(range(100, 110)), list(range(110, 120))],
+)
+
+CELL_SIZE = 30
+CELL_SPACING = 6
+GROUP_SPACING = 10
+MARGIN = 9
+
+REFRESH_INTERVAL = 16 # ms, about one display refresh
+BLINK_INTERVAL = 125 # ms
+BLINK1_PERIOD = 8 # blink ticks per BLINK1 on/off cycle
+BLINK2_PERIOD = 2 # blink ticks per BLINK2 on/off cycle
+
+LED_COLORS = {
+    att26a.LED_ON: QtGui.QColor(QtCore.Qt.red),
+    att26a.LED_BLINK1: QtGui.QColor(QtCore.Qt.blue),
+    att26a.LED_BLINK2: QtGui.QColor(QtCore.Qt.green),
+}
+LED_OFF_COLOR = QtGui.QColor(60, 60, 60)
+
+
+class LedPanel(QtWidgets.QWidget):
+    """All 120 LEDs and buttons of the console, painted as one widget.
+
+    LED modes live in a bytearray that any thread may update. Updates
+    only mark the panel dirty; the GUI thread repaints at most once
+    per REFRESH_INTERVAL however many commands arrived in between,
+    and one shared timer animates every blinking LED.
+    """
+
+    btn_pressed = QtCore.pyqtSignal(int)
+    _update_requested = QtCore.pyqtSignal()
+
+    def __init__(self, parent=None):
+        super(LedPanel, self).__init__(parent)
+        self._lock = threading.Lock()
+        self._modes = bytearray(120)
+        self._dirty = False
+        self._blink_tick = 0
+        self._pressed = None
+
+        self._refresh = QtCore.QTimer(self)
+        self._refresh.setSingleShot(True)
+        self._refresh.setInterval(REFRESH_INTERVAL)
+        self._refresh.timeout.connect(self._on_refresh)
+        self._update_requested.connect(self._on_update_requested)
+
+        self._blink = QtCore.QTimer(self)
+        self._blink.setInterval(BLINK_INTERVAL)
+        self._blink.timeout.connect(self._on_blink)
+        self._blink.start()
+
+        self._led_rects = [None] * 120
+        self._btn_rects = [None] * 120
+        self._layout_cells()
+
+    def _layout_cells(self):
+        y = MARGIN
+        for group in ROW_GROUPS:
+            for row in group:
+                x = MARGIN
+                for ledID in row:
+                    self._led_rects[ledID] = QtCore.QRect(x, y, CELL_SIZE, CELL_SIZE)
+                    x += CELL_SIZE + CELL_SPACING
+                    self._btn_rects[ledID] = QtCore.QRect(x, y, CELL_SIZE, CELL_SIZE)
+                    x += CELL_SIZE + CELL_SPACING
+                y += CELL_SIZE + CELL_SPACING
+            y += GROUP_SPACING
+        width = MARGIN * 2 + 20 * CELL_SIZE + 19 * CELL_SPACING
+        self.setMinimumSize(width, y - CELL_SPACING - GROUP_SPACING + MARGIN)
+
+    def sizeHint(self):
+        return self.minimumSize()
+
+    # Thread safe state updates.
+    def set_led_state(self, state, ledID):
+        with self._lock:
+            self._modes[ledID] = state
+            self._mark_dirty()
+
+    def set_led_range_state(self, start_ledid, states_on_off):
+        with self._lock:
+            for i, val in enumerate(states_on_off):
+                self._modes[(start_ledid + i) % 100] = att26a.LED_ON if val else att26a.LED_OFF
+            self._mark_dirty()
+
+    def clear(self):
+        with self._lock:
+            self._modes[:] = bytes(120)
+            self._mark_dirty()
+
+    def get_led_state(self, ledID):
+        return self._modes[ledID]
+
+    @property
+    def modes(self):
+        """Copy of the 120 LED modes."""
+        with self._lock:
+            return bytes(self._modes)
+
+    def _mark_dirty(self):
+        # Only the first update after a repaint crosses the thread boundary.
+        if not self._dirty:
+            self._dirty = True
+            self._update_requested.emit()
+
+    @QtCore.pyqtSlot()
+    def _on_update_requested(self):
+        if not self._refresh.isActive():
+            self._refresh.start()
+
+    @QtCore.pyqtSlot()
+    def _on_refresh(self):
+        self.update()
+
+    @QtCore.pyqtSlot()
+    def _on_blink(self):
+        self._blink_tick += 1
+        if any(mode in (att26a.LED_BLINK1, att26a.LED_BLINK2) for mode in self._modes):
+            self.update()
+
+    def _led_lit(self, mode):
+        if mode == att26a.LED_BLINK1:
+            return self._blink_tick % BLINK1_PERIOD < BLINK1_PERIOD // 2
+        if mode == att26a.LED_BLINK2:
+            return self._blink_tick % BLINK2_PERIOD < BLINK2_PERIOD // 2
+        return mode == att26a.LED_ON
+
+    def paintEvent(self, event):
+        with self._lock:
+            modes = bytes(self._modes)
+            self._dirty = False
+
+        painter = QtGui.QPainter(self)
+        palette = self.palette()
+        painter.setPen(palette.color(QtGui.QPalette.Dark))
+        for ledID in range(120):
+            mode = modes[ledID]
+            rect = self._led_rects[ledID]
+            if rect.intersects(event.rect()):
+                painter.setBrush(LED_COLORS[mode] if self._led_lit(mode) else LED_OFF_COLOR)
+                painter.drawRect(rect.adjusted(0, 0, -1, -1))
+
+            rect = self._btn_rects[ledID]
+            if rect.intersects(event.rect()):
+                painter.setBrush(palette.color(QtGui.QPalette.Mid if ledID == self._pressed
+                                               else QtGui.QPalette.Button))
+                painter.drawRoundedRect(rect.adjusted(0, 0, -1, -1), 3, 3)
+                painter.setPen(palette.color(QtGui.QPalette.ButtonText))
+                painter.drawText(rect, QtCore.Qt.AlignCenter, str(ledID))
+                painter.setPen(palette.color(QtGui.QPalette.Dark))
+        painter.end()
+
+    def _btn_at(self, pos):
+        for ledID, rect in enumerate(self._btn_rects):
+            if rect.contains(pos):
+                return ledID
+        return None
+
+    def mousePressEvent(self, event):
+        btn = self._btn_at(event.pos())
+        if event.button() == QtCore.Qt.LeftButton and btn is not None:
+            self._pressed = btn
+            self.update(self._btn_rects[btn])
+            self.btn_pressed.emit(btn)
+
+    def mouseReleaseEvent(self, event):
+        if self._pressed is not None:
+            self.update(self._btn_rects[self._pressed])
+            self._pressed = None
+
+
+class Att26ASimQt(QtWidgets.QMainWindow):
+    class Att26aSimInstrumentor(Att26aSimBase):
+        def __init__(self, serialdev, qtsim, **kwargs):
+            self.qtsim = qtsim
+            super().__init__(serialdev, **kwargs)
+
+        def on_reset(self):
+            self.qtsim.panel.clear()
+
+        def on_set_led_range_state(self, start_ledid, states_on_off):
+            self.qtsim.panel.set_led_range_state(start_ledid, states_on_off)
+
+        def on_set_led_state(self, state, ledID):
+            self.qtsim.panel.set_led_state(state, ledID)
+
+        def on_set_factory_test_mode_enable(self, enable):
+            self.qtsim.on_set_factory_test_mode_enable(enable)
+
+        def on_set_IO_enable(self, enable):
+            self.qtsim.on_set_IO_enable(enable)
+
+        def on_get_led_status(self, ledID):
+            return self.qtsim.on_get_led_status(ledID)
+
+    def on_set_factory_test_mode_enable(self, enable):
+        self._log.info("%s factory test", "Enable" if enable else "Disable")
+        self._factory_test = enable
+
+    def on_set_IO_enable(self, enable):
+        self._log.info("%s IO driver", "Enable" if enable else "Disable")
+        self._io_enabled = enable
+
+    def on_get_led_status(self, ledID):
+        self._log.info("Reading led %d state", ledID)
+        return att26a.LED_MODES.index(self.panel.get_led_state(ledID))
+
+    def __init__(self, serialdev, log=None):
+        super(Att26ASimQt, self).__init__()
+        self._log = logging.getLogger('att26aguisim') if not log else log
+        self.setWindowTitle("AT&T 26A Simulator")
+
+        self.panel = LedPanel(self)
+        self.setCentralWidget(self.panel)
+        self.panel.btn_pressed.connect(self.on_any_btn_press)
+
+        self._factory_test = False
+        self._io_enabled = True
+
+        self.__sim = Att26ASimQt.Att26aSimInstrumentor(serialdev, self, log=self._log)
+
+    @QtCore.pyqtSlot(int)
+    def on_any_btn_press(self, btn_num):
+        self.__sim.send_btn_press(btn_num)
+
+    def state(self):
+        """Snapshot of the simulated console; safe to call from any thread."""
+        return {
+            'leds': self.panel.modes,
+            'factory_test': self._factory_test,
+            'io_enabled': self._io_enabled,
+            'in_reset': self.__sim.in_reset,
+        }
+
+
+def run(app, serialdev, log=None):
+    window = Att26ASimQt(serialdev, log)
+    window.show()
+
+    return app.exec_() # Start the event loop.
+
+def main_bootstrap(serialdev, log=None):
+    import sys
+
+    # Initialize the QApplication object, and free it last.
+    # Not having this in a different function than other QT
+    # objects can cause segmentation faults as app is freed
+    # before the QWidgets.
+    app = QtWidgets.QApplication(sys.argv)
+
+    # Allow Ctrl-C to interrupt QT by scheduling GIL unlocks.
+    timer = QtCore.QTimer()
+    timer.start(500)
+    timer.timeout.connect(lambda: None) # Let the interpreter run.
+
+    sys.exit(run(app, serialdev, log))
@@ -54,6 +54,18 @@ setup(
     url='https://github.com/diamondman/att26a',
     packages=find_packages("src"),
     package_dir={"":"src"},
+    entry_points = {
+        'console_scripts': [
+            'att26a-simfarm=att26a.simfarm:main_cli',
+            'att26a-consoled=att26a.consoled:main_cli',
+            'att26a-bench=att26a.bench:main_cli',
+            'att26a-anim=att26a.animation:main_cli',
+            'att26a-fwsim=att26a.firmwaresim:main_cli',
+            'att26a-explore=att26a.explorer:main_cli',
+            'att26a-calibrate=att26a.calibration:main_cli',
+            'att26a-storm=att26a.storm:main_cli',
+        ],
+    },
     platforms='any',
     license='LGPL 2.1',
     install_requires=[
@@ -34,6 +34,7 @@ __ALL__ = [
     'ButtonTimeoutError',
 ]
 
+import collections
 import serial
 import threading
 import time
@@ -42,6 +43,9 @@ import math
 import logging
 
 from . import interruptablequeue
+from . import rtt
+from . import keepalive
+from . import framecache
 
 LED_OFF = 0x0
 LED_BLINK1 = 0x8
@@ -89,13 +93,53 @@ class ATT26A(object):
     Provides functions to read button presses and set led states on
     AT&T 26A hardware.
 
+    The ACK round trip estimate is kept in 'rtt', and the period and
+    phase of the console's keep-alives in 'keepalive' (a
+    :obj:`att26a.keepalive.KeepAliveClock`).
+
     Args:
         devname (str): A path to a posix character device.
         log (:obj:`logging.Logger`, optional): logging object.
+        journal (str or :obj:`att26a.journal.LedStateJournal`, optional):
+            File recording the console's LED state. Updated after
+            every acknowledged command.
+        warm_attach (bool): Skip the power on reset and trust the
+            state recorded in 'journal' instead. The journal is spot
+            checked against LEDs 100-119; if the console does not
+            match (e.g. it was power cycled), it is reset and the
+            journaled state is repainted.
+        max_retries (int): Retransmissions of idempotent commands.
+        frame_cache_bytes (int): Size of the LRU cache of encoded
+            LED commands (see 'frame_cache'); 0 disables it.
+        cost_model (str or :obj:`att26a.calibration.CostModel`, optional):
+            Measured command costs of this console (see 'calibrate').
+            They seed the ACK timeout and are used to plan frame
+            updates. A model file that can not be loaded is ignored.
+        tune_serial (bool): Apply Linux low latency settings to the
+            serial port opened for 'dev' (see att26a.serialtune); the
+            report is kept in 'serial_tuning'.
     """
 
-    def __init__(self, dev, *, log=None):
+    def __init__(self, dev, *, log=None, journal=None, warm_attach=False, max_retries=2,
+                 frame_cache_bytes=65536, cost_model=None, tune_serial=False):
         self.__is_open = True
+        self.__frame_cache = framecache.EncodedFrameCache(frame_cache_bytes) \
+            if frame_cache_bytes else None
+        self.rtt = rtt.RttEstimator()
+        self.keepalive = keepalive.KeepAliveClock()
+        self.__cost_model = None
+        self.__command_cost = None
+        self.serial_tuning = None
+        self.max_retries = max_retries
+        self.retransmit_count = 0
+        self.late_ack_count = 0
+        self.dropped_button_count = 0
+        self.reflex_write_count = 0
+        self.__txlock = threading.RLock()
+        self.__reflexes = ()
+        self.__reflexq = collections.deque()
+        self.__reflex_ready = threading.Event()
+        self.__reflexthread = None
         self.__do_recvthread = False
         self.__recvthread = None
         self.__btnq = None
@@ -103,13 +147,39 @@ class ATT26A(object):
 
         self._log = logging.getLogger('att26a') if not log else log
 
+        if isinstance(cost_model, str):
+            from .calibration import CostModel
+            try:
+                cost_model = CostModel.load(cost_model)
+            except (OSError, ValueError, KeyError) as e:
+                self._log.warning("Ignoring cost model %s: %s", cost_model, e)
+                cost_model = None
+        if cost_model is not None:
+            self.__use_cost_model(cost_model)
+
+        if isinstance(journal, str):
+            from .journal import LedStateJournal
+            journal = LedStateJournal(journal)
+        self.__journal = journal
+
         if isinstance(dev, str):
             self.__ser = ATT26A.openSerialPortByName(dev)
             self._log.info("%s (type: %s)", self.__ser, type(self.__ser))
+            if tune_serial:
+                from .serialtune import tune_port
+                self.serial_tuning = tune_port(self.__ser, log=self._log)
         else:
             self.__ser = dev
 
-        self.reset()
+        if warm_attach and journal is not None and journal.valid:
+            self.__start_recvthread()
+            if not self.__verify_warm_attach():
+                self._log.warning("Warm attach failed; resetting and repainting from journal.")
+                self.__repaint_after_reset()
+        else:
+            if warm_attach:
+                self._log.warning("Warm attach requires a valid journal; resetting.")
+            self.reset()
 
     def __enter__(self):
         if not self.__is_open:
@@ -131,7 +201,10 @@ class ATT26A(object):
             if dojoin:
                 self.__recvthread.join(0.5)
             self.__ser.close()
+            if self.__journal is not None:
+                self.__journal.close()
         self.__is_open = False
+        self.__reflex_ready.set()
 
     def reset(self):
         """Execute a complete power on reset of the 26A."""
@@ -140,23 +213,134 @@ class ATT26A(object):
         self.__ser.dtr = False
         time.sleep(0.1)
 
+        if self.__journal is not None:
+            self.__journal.invalidate()
+
         # Terminate the reader thread
         self.__do_recvthread = False
         if self.__recvthread is not None:
             self.__recvthread.join(2)
 
+        # Exit device reset
+        self.__ser.dtr = True
+
+        self.keepalive.reset()
+        self.__reflexq.clear()
+        for rule in self.__reflexes:
+            rule.reset()
+        self.__start_recvthread()
+
+        if self.__journal is not None:
+            self.__journal.record_reset()
+
+    def __start_recvthread(self):
         # Clear out the queues
         self.__btnq = interruptablequeue.InterruptableQueue(100)
         self.__retq = interruptablequeue.InterruptableQueue()
 
-        # Exit device reset
-        self.__ser.dtr = True
-
         # (Re)start the reader thread
         self.__do_recvthread = True
         self.__recvthread = threading.Thread(daemon=True, target=self.__recvthread_func)
         self.__recvthread.start()
 
+    def add_reflex(self, rule):
+        """Run 'rule' (an :obj:`att26a.reflex.Reflex`) on every button press.
+
+        The LED writes of reflex rules are sent ahead of all other
+        commands, as soon as the command in flight (if any) is ACKed.
+        Presses are still delivered to get_btn_press afterwards.
+
+        Returns:
+            The rule, for remove_reflex.
+        """
+        with self.__txlock:
+            self.__reflexes = self.__reflexes + (rule,)
+            if self.__reflexthread is None:
+                self.__reflexthread = threading.Thread(daemon=True,
+                                                       target=self.__reflexthread_func)
+                self.__reflexthread.start()
+        return rule
+
+    def remove_reflex(self, rule):
+        """Stop running 'rule'; writes it already queued are still sent."""
+        with self.__txlock:
+            self.__reflexes = tuple(r for r in self.__reflexes if r is not rule)
+
+    def __reflexthread_func(self):
+        while self.__is_open:
+            self.__reflex_ready.wait()
+            self.__reflex_ready.clear()
+            try:
+                with self.__txlock:
+                    self.__send_reflexes()
+            except DriverClosedError:
+                break
+
+    def __send_reflexes(self):
+        """Send the queued reflex writes. Call with the tx lock held."""
+        while self.__reflexq:
+            state, ledID = self.__reflexq.popleft()
+            try:
+                self.__tx_frame_locked(self.__encoded_led_state(state, ledID), True)
+            except (Att26AProtocolError, ValueError) as e:
+                self._log.warning("Reflex write of LED %d failed: %s", ledID, e)
+                continue
+            self.reflex_write_count += 1
+            if self.__journal is not None and self.__is_open:
+                self.__journal.record_led_state(state, ledID)
+
+    def __use_cost_model(self, model):
+        self.__cost_model = model
+        self.__command_cost = model.command_cost()
+        self.rtt.seed(model.max_overhead, model.max_jitter)
+
+    def calibrate(self, path=None, **kwargs):
+        """Measure the cost of commands on this console and use them.
+
+        Runs att26a.calibration.calibrate (which overwrites the LEDs
+        and leaves them all OFF) and uses the fitted model from then on.
+
+        Args:
+            path (str, optional): File to save the model to, for the
+                'cost_model' argument of later drivers.
+            **kwargs: Passed on to att26a.calibration.calibrate.
+
+        Returns:
+            :obj:`att26a.calibration.CostModel`
+        """
+        from . import calibration
+        model = calibration.calibrate(self, **kwargs)
+        if path is not None:
+            model.save(path)
+        self.__use_cost_model(model)
+        return model
+
+    def __verify_warm_attach(self):
+        """Check the console still shows what the journal recorded."""
+        journal = self.__journal
+        try:
+            for ledID in range(100, 120):
+                if self.get_led_status(ledID) != journal.get_led_state(ledID):
+                    self._log.info("LED %d does not match the journal.", ledID)
+                    return False
+        except Att26AProtocolError as e:
+            self._log.info("Console did not answer warm attach check: %s", e)
+            return False
+        return True
+
+    def __repaint_after_reset(self):
+        from . import framediff
+        journal = self.__journal
+        modes = journal.modes
+        factory_test = journal.factory_test
+        io_enabled = journal.io_enabled
+
+        self.reset()
+        framediff.send_updates(self, framediff.plan_updates(bytes(120), modes))
+        if factory_test:
+            self.set_factory_test_mode_enable(True)
+        if not io_enabled:
+            self.set_IO_enable(False)
 
     def __recvthread_func(self):
         retdata = bytearray()
@@ -173,10 +357,10 @@ class ATT26A(object):
                 if (data & 0x80) == 0x00:
                     self._handle_button_press(ATT26A._shift7_right(data))
                 elif data == MSG_KA:
-                    pass #TODO: maybe detect hardware timeout?
+                    self.keepalive.observe(time.monotonic())
                 elif data == MSG_ACK:
                     self._log.debug("retdata: " + ':'.join('{:02x}'.format(x) for x in retdata))
-                    self.__retq.put(bytes(retdata))
+                    self.__retq.put((time.monotonic(), bytes(retdata)))
                     retdata.clear()
                 else:
                     retdata.append(data)
@@ -187,44 +371,204 @@ class ATT26A(object):
     def _handle_button_press(self, id):
         self._log.info("%s btn %d pressed." % (type(self).__name__, id))
 
-        self.__btnq.put(id)
+        queued = False
+        for rule in self.__reflexes:
+            try:
+                writes = rule.press(id)
+            except Exception as e:
+                self._log.error("Reflex %r failed on button %d: %s", rule, id, e)
+                continue
+            if writes:
+                self.__reflexq.extend(writes)
+                queued = True
+        if queued:
+            self.__reflex_ready.set()
+
+        # Blocking here would stop the receiver thread, and with it the
+        # ACKs of every command, until someone reads the buttons.
+        try:
+            self.__btnq.put_nowait(id)
+        except queue.Full:
+            self.dropped_button_count += 1
+            self._log.warning("Button queue full; dropping press of button %d.", id)
 
     @staticmethod
-    def __prepare_msg_frame(msg):
-        if len(msg) > 15:
-            raise ValueError("msg may not be longer than 15 bytes.")
+    def frame_msg(msg):
+        """Wrap 'msg' in a message frame: append its hash and the 0xFF terminator."""
+        if len(msg) == 0:
+            raise ValueError("Message must be at least one byte long.")
+        if len(msg) >= 16:
+            raise ValueError("Message must be shorter than 16 bytes.")
+        if b'\xFF' in msg:
+            raise ValueError("Message may not contain a byte of value 0xFF.")
         h = 0x7F
         for b in msg[1:]:
             h ^= b
-        return msg + bytes([h]) + b'\xff'
+        return bytes(msg) + bytes([h]) + b'\xff'
+
+    @staticmethod
+    def encode_led_state(state, ledID):
+        """Return the (unframed) message of set_led_state."""
+        if state not in (LED_OFF, LED_BLINK1, LED_BLINK2, LED_ON): #translates to 0-3
+            raise ValueError("state can either be 0x0, 0x8, 0xD, or 0xF, not %s" % hex(state))
+        if ledID >= 120 or ledID < 0:
+            raise ValueError("ledID must be between 0 and 119; not %d." % ledID)
+        return b'\x85' + bytes([0x20 | state, ATT26A._shift7_left(ledID)])
+
+    @staticmethod
+    def encode_led_range_state(start_ledid, states_on_off):
+        """Return the (unframed) message of a single range write.
+
+        Same limits as _set_led_range_state_raw: at most 77 states,
+        and not exactly 71.
+        """
+        if start_ledid > 99 or start_ledid < 0:
+            raise ValueError("start_ledid must be between 0 and 99; not %d" % start_ledid)
+
+        num_leds = len(states_on_off)
+        if num_leds == 0:
+            raise ValueError("states_on_off can not be empty.")
+        if num_leds == 71:
+            raise ValueError("The device does not support setting 71 leds at once. Either send "
+                             "multiple requests, or write 72 or more values.")
+        if num_leds > 77:
+            raise ValueError("Only up to 77 leds may be set at a time, not %d" % num_leds)
+
+        if num_leds != 70:
+            num_leds -= 1
+
+        data = bytearray(math.ceil(len(states_on_off)/7.00))
+        # Top bit always 0, up to 7 leds per byte, high bit to low bit.
+        for i, val in enumerate(states_on_off):
+            data[i//7] |= (bool(val) << (6-(i%7)))
+
+        return b'\x85\x07' + bytes([ATT26A._shift7_left(start_ledid), num_leds]) + data
 
-    def _tx(self, msg):
+    def _tx(self, msg, *, idempotent=False):
+        """Send 'msg' in a message frame and return the data sent back with its ACK.
+
+        The ACK timeout follows the smoothed round trip estimate in
+        'self.rtt'. If 'idempotent' is set, the command is
+        retransmitted up to 'self.max_retries' times when its ACK
+        does not arrive in time.
+        """
         if not self.is_open:
             raise DriverClosedError()
+        return self._tx_frame(ATT26A.frame_msg(msg), idempotent=idempotent)
 
-        if len(msg) == 0:
-            raise ValueError("Message must be at least one byte long.")
-        if len(msg) >= 16:
-            raise ValueError("Message must be shorter than 16 bytes.")
-        if b'\xFF' in msg:
-            raise ValueError("Message may not contain a byte of value 0xFF.")
+    def _tx_frame(self, outmsg, *, idempotent=False):
+        """Like _tx, but for a message already wrapped by frame_msg.
 
-        outmsg = ATT26A.__prepare_msg_frame(msg)
-        self._log.debug("TX:" + ":".join((hex(b)[2:] for b in outmsg)))
+        Lets pre-encoded commands be sent without re-encoding them.
+        The journal is not updated. Queued reflex writes are sent
+        first.
+        """
+        if not self.is_open:
+            raise DriverClosedError()
+        with self.__txlock:
+            if self.__reflexq:
+                self.__send_reflexes()
+            return self.__tx_frame_locked(outmsg, idempotent)
 
-        try:
-            self.__ser.write(outmsg)
-        except serial.SerialTimeoutException as e:
-            raise CommandTimeoutError("Timeout sending message.")
-        except serial.serialutil.SerialException as e:
-            raise Att26AIOError()
+    def __tx_frame_locked(self, outmsg, idempotent):
+        if not self.is_open:
+            raise DriverClosedError()
 
-        try:
-            return self.__retq.get(block=True, timeout=0.1)
-        except queue.Empty:
-            raise CommandTimeoutError("Timeout waiting for response.")
-        except interruptablequeue.QueueInterruptException as e:
-            raise DriverShuttingDownError()
+        if self._log.isEnabledFor(logging.DEBUG):
+            self._log.debug("TX:" + ":".join((hex(b)[2:] for b in outmsg)))
+
+        # Nothing is outstanding, so anything queued is a stale response.
+        self.__discard_responses()
+
+        # Time to shift the frame and its ACK over the wire (or, with a
+        # cost model, the measured per byte cost). Links that are
+        # faster than the 26A (e.g. simulators) bound it by the
+        # quickest round trip seen so far; before the first one, the
+        # wire time alone is the bound.
+        if self.__cost_model is not None:
+            wire = self.__cost_model.transfer_time(len(outmsg))
+        else:
+            wire = rtt.wire_time(len(outmsg) + 1, self.__baudrate())
+        min_rtt = wire if self.rtt.min_rtt is None else min(wire, self.rtt.min_rtt)
+        retries = self.max_retries if idempotent else 0
+        for attempt in range(retries + 1):
+            if attempt:
+                self.retransmit_count += 1
+                self._log.info("Retransmitting %s (attempt %d)", outmsg.hex(), attempt + 1)
+
+            sent = time.monotonic()
+            try:
+                self.__ser.write(outmsg)
+            except serial.SerialTimeoutException as e:
+                raise CommandTimeoutError("Timeout sending message.")
+            except serial.serialutil.SerialException as e:
+                raise Att26AIOError()
+
+            deadline = sent + wire + self.rtt.rto
+            while True:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    stamp, ret = self.__retq.get(block=True, timeout=timeout)
+                except queue.Empty:
+                    break
+                except interruptablequeue.QueueInterruptException as e:
+                    raise DriverShuttingDownError()
+
+                if attempt and stamp - sent < min_rtt:
+                    # Too early to answer this transmission: a late ACK
+                    # of an earlier one.
+                    self.late_ack_count += 1
+                    self._log.debug("Discarding late response %s", ret.hex())
+                    continue
+
+                if attempt:
+                    self.__absorb_late_responses(attempt)
+                else:
+                    # Karn: only unambiguous round trips are sampled.
+                    self.rtt.sample(stamp - sent, wire)
+                return ret
+
+            self.rtt.backoff()
+
+        raise CommandTimeoutError("Timeout waiting for response.")
+
+    def __discard_responses(self):
+        while True:
+            try:
+                self.__retq.get(block=False)
+            except queue.Empty:
+                return
+            except interruptablequeue.QueueInterruptException as e:
+                raise DriverShuttingDownError()
+            self.late_ack_count += 1
+            self._log.debug("Discarding stale response")
+
+    def __absorb_late_responses(self, count):
+        """Wait out ACKs of earlier transmissions of a retransmitted command.
+
+        Any of the 'count' earlier transmissions may still be ACKed.
+        If they were, the ACK must not be matched to the next command.
+        """
+        deadline = time.monotonic() + self.rtt.rto
+        while count:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                return
+            try:
+                self.__retq.get(block=True, timeout=timeout)
+            except queue.Empty:
+                return
+            except interruptablequeue.QueueInterruptException as e:
+                raise DriverShuttingDownError()
+            self.late_ack_count += 1
+            self._log.debug("Discarding late response")
+            count -= 1
+
+    def __baudrate(self):
+        baudrate = getattr(self.__ser, 'baudrate', None)
+        return baudrate if isinstance(baudrate, int) and baudrate > 0 else 10752
 
     def get_btn_press(self, block=True, timeout=None):
         """Read a single button press off of the button event queue.
@@ -232,6 +576,9 @@ class ATT26A(object):
         Currently, the 'block' and 'timeout' parameters are passed
         directly to queue.Queue.get. Consult the appropriate
         documentation for their functions.
+
+        Up to 100 presses are queued; presses arriving while the queue
+        is full are dropped and counted in 'dropped_button_count'.
         """
         try:
             return self.__btnq.get(block=block, timeout=timeout)
@@ -262,28 +609,17 @@ class ATT26A(object):
                 set. Max length 77. Length 71 unsupported.
         """
 
-        if start_ledid > 99 or start_ledid < 0:
-            raise ValueError("start_ledid must be between 0 and 99; not %d" % start_ledid)
-
-        num_leds = len(states_on_off)
-        if num_leds == 0:
-            raise ValueError("states_on_off can not be empty.")
-        if num_leds == 71:
-            raise ValueError("The device does not support setting 71 leds at once. Either send "
-                             "multiple requests, or write 72 or more values.")
-        if num_leds > 77:
-            raise ValueError("Only up to 77 leds may be set at a time, not %d" % num_leds)
-
-        if num_leds != 70:
-            num_leds -= 1
-
-        data = bytearray(math.ceil(len(states_on_off)/7.00))
-        # Top bit always 0, up to 7 leds per byte, high bit to low bit.
-        for i, val in enumerate(states_on_off):
-            data[i//7] |= (bool(val) << (6-(i%7)))
-
-        self._tx(b'\x85\x07' + bytes([ATT26A._shift7_left(start_ledid),
-                                      num_leds]) + data)
+        cache = self.__frame_cache
+        if cache is not None:
+            key = ('range', start_ledid, framecache.pattern_key(states_on_off))
+            outmsg = cache.get(key)
+        if cache is None or outmsg is None:
+            outmsg = ATT26A.frame_msg(ATT26A.encode_led_range_state(start_ledid, states_on_off))
+            if cache is not None:
+                cache.put(key, outmsg, len(outmsg) + len(key[2]))
+        self._tx_frame(outmsg, idempotent=True)
+        if self.__journal is not None:
+            self.__journal.record_led_range_state(start_ledid, states_on_off)
 
     def set_led_range_state(self, start_ledid, states_on_off):
         """Set a range of LEDs on the 26A arbitrarily to ON or OFF (no blink).
@@ -338,14 +674,22 @@ class ATT26A(object):
                 att26a.LED_BLINK2, and att26a.LED_ON.
             ledID (int): ID of the LED to set the state of.
         """
-        if state not in (LED_OFF, LED_BLINK1, LED_BLINK2, LED_ON): #translates to 0-3
-            raise ValueError("state can either be 0x0, 0x8, 0xD, or 0xF, not %s" % hex(state))
-        if ledID >= 120:
-            raise ValueError("ledID must be smaller than 120; not %d." % ledID)
-
-        ret = self._tx(b'\x85' + bytes([0x20 | state, ATT26A._shift7_left(ledID)]))
+        ret = self._tx_frame(self.__encoded_led_state(state, ledID), idempotent=True)
         if ret:
             raise IncorrectResponseError("set_led_state expects no return data, got %s" % ret)
+        if self.__journal is not None:
+            self.__journal.record_led_state(state, ledID)
+
+    def __encoded_led_state(self, state, ledID):
+        cache = self.__frame_cache
+        if cache is not None:
+            key = ('led', state, ledID)
+            outmsg = cache.get(key)
+        if cache is None or outmsg is None:
+            outmsg = ATT26A.frame_msg(ATT26A.encode_led_state(state, ledID))
+            if cache is not None:
+                cache.put(key, outmsg, len(outmsg))
+        return outmsg
 
     def set_led_off(self, ledID):
         """Set an individual LED on the 26A to the OFF state.
@@ -393,9 +737,11 @@ class ATT26A(object):
             enable (bool): Weather to turn factory test mode on.
         """
         if enable:
-            self._tx(b'\x85\x10\x6F')
+            self._tx(b'\x85\x10\x6F', idempotent=True)
         else:
-            self._tx(b'\x85\x30\x4F')
+            self._tx(b'\x85\x30\x4F', idempotent=True)
+        if self.__journal is not None:
+            self.__journal.record_factory_test_mode_enable(enable)
 
     def set_IO_enable(self, enable):
         """Enable or disable the 26A's IO controller (default on after reset).
@@ -415,9 +761,11 @@ class ATT26A(object):
             enable (bool): Weather to enable or disable the IO contoller.
         """
         if enable:
-            self._tx(b'\x85\x40\x3F')
+            self._tx(b'\x85\x40\x3F', idempotent=True)
         else:
-            self._tx(b'\x85\x50\x2F')
+            self._tx(b'\x85\x50\x2F', idempotent=True)
+        if self.__journal is not None:
+            self.__journal.record_IO_enable(enable)
 
     def get_led_status(self, ledID):
         """Set the state of an individual led on the bottom two rows.
@@ -449,6 +797,34 @@ class ATT26A(object):
     def is_open(self):
         return self.__is_open
 
+    @property
+    def frame_cache(self):
+        """The :obj:`att26a.framecache.EncodedFrameCache` of encoded
+        commands (None if disabled). Also used by
+        att26a.framediff.send_frame to cache planned frame updates."""
+        return self.__frame_cache
+
+    @property
+    def baudrate(self):
+        """Baud rate of the serial link (the 26A's 10752 if unknown)."""
+        return self.__baudrate()
+
+    @property
+    def cost_model(self):
+        """The :obj:`att26a.calibration.CostModel` in use, or None."""
+        return self.__cost_model
+
+    @property
+    def command_cost(self):
+        """The cost model as a :obj:`att26a.framediff.CommandCost`
+        for planning frame updates, or None."""
+        return self.__command_cost
+
+    @property
+    def journal(self):
+        """The :obj:`att26a.journal.LedStateJournal` in use, or None."""
+        return self.__journal
+
     @staticmethod
     def _shift7_left(b):
         return ((b << 1) & 0x7E) | ((b & 0x40) >> 6)
@@ -458,7 +834,14 @@ class ATT26A(object):
         return ((b & 0x7E) >> 1) | ((b & 0x01) << 6)
 
     @staticmethod
-    def openSerialPortByName(devname):
+    def openSerialPortByName(devname, tune=False):
+        """Open the serial port of a 26A (a device path or pyserial URL).
+
+        Args:
+            devname (str): Device or URL to open.
+            tune (bool): Apply Linux low latency settings (see
+                att26a.serialtune.tune_port) and log what they changed.
+        """
         try:
             ser = serial.serial_for_url(
                 devname, baudrate=10752, bytesize=serial.EIGHTBITS,
@@ -471,6 +854,9 @@ class ATT26A(object):
             else:
                 ser.write_timeout=0.1
 
+            if tune:
+                from .serialtune import tune_port
+                tune_port(ser, log=logging.getLogger('att26a'))
             return ser
         except serial.serialutil.SerialException as e:
             raise CanNotOpenDeviceError("The 'devname' provided could not be opened: '%s'"%devname)
@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+
+"""Precompiled animations for the AT&T 26A.
+
+compile_animation() diffs consecutive frames with framediff and stores
+the resulting commands fully encoded (framed, hashed, 0xFF terminated)
+with the time each frame is due. AnimationPlayer memory maps the file
+and hands the stored bytes straight to the driver, so playback does
+no encoding at all.
+
+File layout (little endian):
+
+    header   magic 'A26N', version, flags, reserved, frame count,
+             loop frame, loop time (us)
+    index    (time (us), data offset) per record, plus one more entry
+             holding the end of the data
+    data     concatenated framed commands; every command ends in its
+             only 0xFF byte
+
+Animations compiled with 'loop' carry one extra record after the last
+frame that turns it back into the first one, due at the loop time.
+"""
+
+import csv
+import importlib
+import logging
+import mmap
+import os
+import struct
+import time
+
+from . import ATT26A, LED_OFF, LED_BLINK1, LED_BLINK2, LED_ON, LED_MODES
+from . import framediff
+from . import grid
+
+_MAGIC = b'A26N'
+_VERSION = 1
+
+# magic, version, flags, reserved, frame count, loop frame, loop time (us)
+_HEADER = struct.Struct('<4sBBHIIQ')
+_INDEX = struct.Struct('<QI')
+
+FLAG_LOOP = 0x01
+
+# Image strips: 10 pixels wide, 12 rows per frame, laid out like the console.
+STRIP_ROWS = grid.ROWS
+
+MODE_NAMES = {'off': LED_OFF, 'on': LED_ON, 'blink1': LED_BLINK1, 'blink2': LED_BLINK2}
+
+
+def encode_command(cmd):
+    """Return the framed bytes of a framediff command."""
+    if cmd[0] == framediff.CMD_LED:
+        msg = ATT26A.encode_led_state(cmd[1], cmd[2])
+    else:
+        msg = ATT26A.encode_led_range_state(cmd[1], cmd[2])
+    return ATT26A.frame_msg(msg)
+
+
+def compile_animation(frames, path, *, fps=30.0, loop=False, cost=None):
+    """Compile a frame sequence into an animation file.
+
+    The console is assumed to be all OFF when playback starts.
+
+    Args:
+        frames: Iterable of 120 byte frames of att26a.LED_MODES values,
+            shown 1/'fps' seconds apart, or of (seconds, frame) pairs.
+        path (str): File to write.
+        fps (float): Frame rate of frames given without a time.
+        loop (bool): Store the transition from the last frame back to
+            the first, one frame period after the last frame.
+        cost (:obj:`att26a.framediff.CommandCost`, optional): cost model.
+
+    Returns:
+        int: Number of frames compiled.
+    """
+    index = []
+    data = bytearray()
+    shown = bytearray(120)
+    first = None
+    last_time = 0.0
+    period = 1.0 / fps
+
+    for n, item in enumerate(frames):
+        if len(item) == 2:
+            seconds, frame = item
+        else:
+            seconds, frame = n * period, item
+        if len(frame) != 120:
+            raise ValueError("Frame %d holds %d LED modes, not 120." % (n, len(frame)))
+        if seconds < last_time:
+            raise ValueError("Frame %d is due before the frame preceding it." % n)
+        frame = bytes(frame)
+        if first is None:
+            first = frame
+        index.append((int(round(seconds * 1e6)), len(data)))
+        for cmd in framediff.plan_updates(shown, frame, cost=cost):
+            data += encode_command(cmd)
+            framediff.apply_command(shown, cmd)
+        last_time = seconds
+
+    if not index:
+        raise ValueError("An animation needs at least one frame.")
+    count = len(index)
+    flags = 0
+    loop_time = 0
+    if loop:
+        flags |= FLAG_LOOP
+        loop_time = int(round((last_time + period) * 1e6))
+        index.append((loop_time, len(data)))
+        for cmd in framediff.plan_updates(shown, first, cost=cost):
+            data += encode_command(cmd)
+
+    with open(path, 'wb') as f:
+        f.write(_HEADER.pack(_MAGIC, _VERSION, flags, 0, count, 1, loop_time))
+        for entry in index:
+            f.write(_INDEX.pack(*entry))
+        f.write(_INDEX.pack(index[-1][0], len(data)))
+        f.write(data)
+    return count
+
+
+def read_netpbm(path):
+    """Read a PBM/PGM/PPM image (plain or raw).
+
+    Returns:
+        tuple: (width, height, list of gray values scaled to 0-255)
+    """
+    with open(path, 'rb') as f:
+        raw = f.read()
+
+    pos = 0
+    def token():
+        nonlocal pos
+        while True:
+            while pos < len(raw) and raw[pos:pos + 1].isspace():
+                pos += 1
+            if raw[pos:pos + 1] == b'#':
+                while pos < len(raw) and raw[pos:pos + 1] not in (b'\n', b'\r'):
+                    pos += 1
+                continue
+            break
+        start = pos
+        while pos < len(raw) and not raw[pos:pos + 1].isspace():
+            pos += 1
+        return raw[start:pos]
+
+    magic = token()
+    if magic not in (b'P1', b'P2', b'P3', b'P4', b'P5', b'P6'):
+        raise ValueError("%s is not a netpbm image." % path)
+    width, height = int(token()), int(token())
+    maxval = 1 if magic in (b'P1', b'P4') else int(token())
+    channels = 3 if magic in (b'P3', b'P6') else 1
+    count = width * height * channels
+
+    if magic in (b'P1', b'P2', b'P3'):
+        if magic == b'P1':
+            # Plain PBM digits may be run together.
+            digits = bytes(b for b in raw[pos:] if b in b'01')
+            values = [1 - (b - 0x30) for b in digits[:count]]
+        else:
+            values = [int(token()) for _ in range(count)]
+    else:
+        pos += 1 # Single whitespace after the header
+        if magic == b'P4':
+            rowbytes = (width + 7) // 8
+            values = []
+            for y in range(height):
+                row = raw[pos + y * rowbytes:pos + (y + 1) * rowbytes]
+                values += [1 - ((row[x >> 3] >> (7 - (x & 7))) & 1) for x in range(width)]
+        elif maxval < 256:
+            values = list(raw[pos:pos + count])
+        else:
+            values = list(struct.unpack('>%dH' % count, raw[pos:pos + count * 2]))
+    if len(values) != count:
+        raise ValueError("%s is truncated." % path)
+
+    if channels == 3:
+        values = [(299 * values[i] + 587 * values[i + 1] + 114 * values[i + 2]) // 1000
+                  for i in range(0, count, 3)]
+    return width, height, [v * 255 // maxval for v in values]
+
+
+def _gray_to_mode(v):
+    return (LED_OFF, LED_BLINK1, LED_BLINK2, LED_ON)[v >> 6]
+
+def frames_from_image_strip(path):
+    """Yield the frames of a netpbm image strip.
+
+    The strip is 10 pixels wide and 12 rows tall per frame, frames
+    stacked top to bottom. Rows follow the console: LEDs 90-99 on
+    top, 0-9 in row 10, then 100-109 and 110-119. Gray levels 0-63
+    are OFF, 64-127 BLINK1, 128-191 BLINK2 and 192-255 ON.
+    """
+    width, height, pixels = read_netpbm(path)
+    if width != 10 or height % 12:
+        raise ValueError("Image strips are 10 pixels wide and a multiple of 12 tall, not %dx%d."
+                         % (width, height))
+    for top in range(0, height, 12):
+        frame = bytearray(120)
+        for r, row in enumerate(STRIP_ROWS):
+            for c, ledID in enumerate(row):
+                frame[ledID] = _gray_to_mode(pixels[(top + r) * 10 + c])
+        yield bytes(frame)
+
+
+def frames_from_csv(path):
+    """Yield (seconds, frame) pairs from a CSV file.
+
+    Every row holds the time in seconds followed by the 120 LED modes,
+    as numbers (0, 8, 13, 15) or names (off, blink1, blink2, on).
+    Empty rows and rows starting with '#' are skipped.
+    """
+    with open(path, newline='') as f:
+        for line, row in enumerate(csv.reader(f), 1):
+            if not row or row[0].lstrip().startswith('#'):
+                continue
+            if len(row) != 121:
+                raise ValueError("%s:%d: expected 121 fields, got %d." % (path, line, len(row)))
+            frame = bytearray(120)
+            for i, field in enumerate(row[1:]):
+                field = field.strip().lower()
+                mode = MODE_NAMES[field] if field in MODE_NAMES else int(field, 0)
+                if mode not in LED_MODES:
+                    raise ValueError("%s:%d: invalid LED mode %r." % (path, line, field))
+                frame[i] = mode
+            yield float(row[0]), bytes(frame)
+
+
+class AnimationPlayer(object):
+    """Memory mapped animation file.
+
+    Args:
+        path (str): File written by compile_animation.
+        log (:obj:`logging.Logger`, optional): logging object.
+    """
+
+    def __init__(self, path, log=None):
+        self._log = logging.getLogger('att26a') if not log else log
+        with open(path, 'rb') as f:
+            self.__map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, flags, _, frames, loop_frame, loop_time = _HEADER.unpack_from(self.__map)
+        if magic != _MAGIC or version != _VERSION:
+            self.__map.close()
+            raise ValueError("%s is not a version %d animation file." % (path, _VERSION))
+        self.frames = frames
+        self.loops = bool(flags & FLAG_LOOP)
+        self._loop_frame = loop_frame
+        self._loop_time = loop_time
+        self._records = frames + (1 if self.loops else 0)
+        self._data = _HEADER.size + (self._records + 1) * _INDEX.size
+        self.late_frames = 0
+        self.max_lateness = 0.0
+
+    def close(self):
+        if not self.__map.closed:
+            self.__map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def duration(self):
+        """Seconds until the last frame (or, for loops, until the loop restarts)."""
+        if self.loops:
+            return self._loop_time / 1e6
+        return self._record(self.frames - 1)[0] / 1e6
+
+    def _record(self, n):
+        """Return (time in us, data start, data end) of record 'n'."""
+        base = _HEADER.size + n * _INDEX.size
+        stamp, start = _INDEX.unpack_from(self.__map, base)
+        end = _INDEX.unpack_from(self.__map, base + _INDEX.size)[1]
+        return stamp, self._data + start, self._data + end
+
+    def commands(self, n):
+        """Return the framed commands of record 'n' as memoryviews.
+
+        The views point into the mapped file; release them before close().
+        """
+        _, start, end = self._record(n)
+        view = memoryview(self.__map)
+        cmds = []
+        while start < end:
+            stop = self.__map.find(b'\xff', start, end) + 1
+            cmds.append(view[start:stop])
+            start = stop
+        return cmds
+
+    def play(self, driver, *, loop=False, speed=1.0, stop=None, phase_window=None):
+        """Play the animation on 'driver', which must show an all OFF console.
+
+        Frames are sent when due; if the link falls behind, frames are
+        sent late (never skipped, as each one only holds a delta) and
+        counted in 'late_frames'. With 'phase_window', due frames wait
+        for the next window after one of the console's keep-alives.
+
+        Args:
+            driver (:obj:`att26a.ATT26A`): Driver to play on.
+            loop (bool): Repeat until 'stop' is set; needs an animation
+                compiled with 'loop'.
+            speed (float): Playback speed factor.
+            stop (:obj:`threading.Event`, optional): Ends playback.
+            phase_window (tuple, optional): (offset, width) in seconds
+                of the window after each keep-alive in which frames are
+                started (see att26a.keepalive.KeepAliveClock.window_start).
+        """
+        if loop and not self.loops:
+            raise ValueError("The animation was not compiled for looping.")
+        if driver.journal is not None:
+            # Commands sent with _tx_frame are not journaled.
+            driver.journal.invalidate()
+
+        self.late_frames = 0
+        self.max_lateness = 0.0
+        records = range(self._records if loop else self.frames)
+        base = time.monotonic()
+        while True:
+            for n in records:
+                if stop is not None and stop.is_set():
+                    return
+                due = base + self._record(n)[0] / 1e6 / speed
+                delay = due - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                elif delay < -0.001:
+                    self.late_frames += 1
+                    self.max_lateness = max(self.max_lateness, -delay)
+                if phase_window is not None:
+                    driver.keepalive.wait_window(*phase_window)
+                for cmd in self.commands(n):
+                    driver._tx_frame(cmd, idempotent=True)
+            if not loop:
+                return
+            base += self._loop_time / 1e6 / speed
+            records = range(self._loop_frame, self._records)
+
+
+def _load_frames(source):
+    """Frames from an image strip, a CSV file or a 'module:function' generator."""
+    ext = os.path.splitext(source)[1].lower()
+    if ext in ('.pbm', '.pgm', '.ppm', '.pnm'):
+        return frames_from_image_strip(source)
+    if ext == '.csv':
+        return frames_from_csv(source)
+    if ':' in source and not os.path.exists(source):
+        module, func = source.split(':', 1)
+        return getattr(importlib.import_module(module), func)()
+    raise ValueError("Don't know how to read frames from %r." % source)
+
+def main_cli():
+    import argparse
+    from . import CanNotOpenDeviceError
+    from .clihelper import VAction, get_verbose_level
+
+    parser = argparse.ArgumentParser(description='Compile and play AT&T 26A animations')
+    parser.add_argument('-v', nargs='?', action=VAction, dest='verbose', default=0,
+                        help="Provide debug information. More than one v supported")
+    sub = parser.add_subparsers(dest='command', required=True)
+    comp = sub.add_parser('compile', help='Compile frames into an animation file.')
+    comp.add_argument('source', help='Image strip (.pbm/.pgm/.ppm), CSV file, or '
+                      'module:function returning a frame generator.')
+    comp.add_argument('output', help='Animation file to write.')
+    comp.add_argument('--fps', type=float, default=30.0,
+                      help='Frame rate of sources without timestamps.')
+    comp.add_argument('--loop', action='store_true',
+                      help='Make the animation loopable.')
+    play = sub.add_parser('play', help='Play an animation file.')
+    play.add_argument('animation', help='Animation file to play.')
+    play.add_argument('devname', metavar='dev', type=str,
+                      help='the Serial Device that connects to the AT&T 26A.')
+    play.add_argument('--loop', action='store_true', help='Repeat until interrupted.')
+    play.add_argument('--speed', type=float, default=1.0, help='Playback speed factor.')
+    play.add_argument('--phase-window', type=float, nargs=2, default=None,
+                      metavar=('OFFSET_MS', 'WIDTH_MS'),
+                      help='Start frames in this window after each keep-alive.')
+    args = parser.parse_args()
+
+    loglevel = get_verbose_level(args.verbose)
+    logging.basicConfig(level=loglevel)
+    logging.getLogger('att26a').setLevel(loglevel)
+
+    if args.command == 'compile':
+        count = compile_animation(_load_frames(args.source), args.output,
+                                  fps=args.fps, loop=args.loop)
+        print("Compiled %d frames into %s (%d bytes)."
+              % (count, args.output, os.path.getsize(args.output)))
+        return
+
+    with AnimationPlayer(args.animation) as player:
+        try:
+            with ATT26A(args.devname) as driver:
+                player.play(driver, loop=args.loop, speed=args.speed,
+                            phase_window=args.phase_window and tuple(
+                                v / 1000.0 for v in args.phase_window))
+        except CanNotOpenDeviceError as e:
+            print("ERROR:", str(e))
+            exit(1)
+        except KeyboardInterrupt:
+            pass
+        if player.late_frames:
+            print("%d frames late, by up to %.1f ms."
+                  % (player.late_frames, player.max_lateness * 1000))
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+
+"""Benchmark an AT&T 26A, its serial adapter and cabling.
+
+Runs a standard set of workloads and reports throughput, latency
+percentiles and error counts for each. Results can be saved as a
+baseline and later runs compared against it:
+
+    att26a-bench /dev/ttyUSB0 --save-baseline ftdi.json
+    att26a-bench /dev/ttyUSB1 --compare ftdi.json
+"""
+
+import json
+import random
+import time
+
+from . import LED_OFF, LED_BLINK1, LED_BLINK2, LED_ON, LED_MODES
+from . import Att26AProtocolError, DriverClosedError, ButtonTimeoutError
+from . import framediff
+
+BASELINE_VERSION = 1
+
+# Range lengths around the encoding boundaries: 70 is encoded as
+# itself, 71 is unsupported (sent as 70 + 1), 77 is the longest single
+# command and 78 needs two.
+DEFAULT_RANGE_LENGTHS = (1, 7, 8, 35, 69, 70, 71, 72, 76, 77, 78, 100)
+DEFAULT_WORKLOADS = ('single', 'range', 'frame', 'status')
+
+
+def percentile(sorted_samples, pct):
+    """Nearest rank percentile of an already sorted list."""
+    if not sorted_samples:
+        return None
+    rank = max(int(round(pct / 100.0 * len(sorted_samples) + 0.5)) - 1, 0)
+    return sorted_samples[min(rank, len(sorted_samples) - 1)]
+
+
+class WorkloadResult(object):
+    """Latencies and errors of one workload."""
+
+    def __init__(self, name):
+        self.name = name
+        self.latencies = []
+        self.errors = 0
+        self.elapsed = 0.0
+        self.retransmits = 0
+        self.late_acks = 0
+
+    def summary(self):
+        lat = sorted(self.latencies)
+        ops = len(lat) + self.errors
+        def ms(pct):
+            v = percentile(lat, pct)
+            return None if v is None else v * 1000.0
+        return {
+            'ops': ops,
+            'errors': self.errors,
+            'retransmits': self.retransmits,
+            'late_acks': self.late_acks,
+            'ops_per_s': ops / self.elapsed if self.elapsed else 0.0,
+            'p50_ms': ms(50),
+            'p90_ms': ms(90),
+            'p99_ms': ms(99),
+            'max_ms': lat[-1] * 1000.0 if lat else None,
+        }
+
+
+def _run(driver, name, ops):
+    """Time every callable in 'ops'; protocol errors are counted, not raised."""
+    result = WorkloadResult(name)
+    retransmits, late_acks = driver.retransmit_count, driver.late_ack_count
+    start = time.perf_counter()
+    for op in ops:
+        t = time.perf_counter()
+        try:
+            op()
+        except Att26AProtocolError:
+            result.errors += 1
+        else:
+            result.latencies.append(time.perf_counter() - t)
+    result.elapsed = time.perf_counter() - start
+    result.retransmits = driver.retransmit_count - retransmits
+    result.late_acks = driver.late_ack_count - late_acks
+    return result
+
+
+def bench_single(driver, iterations, rng):
+    def op(state, ledID):
+        return lambda: driver.set_led_state(state, ledID)
+    return _run(driver, 'single', [op(rng.choice(LED_MODES), i % 120)
+                                   for i in range(iterations)])
+
+
+def bench_range(driver, iterations, rng, length):
+    def op(start, states):
+        return lambda: driver.set_led_range_state(start, states)
+    return _run(driver, 'range-%d' % length,
+                [op(rng.randrange(100), [rng.random() < 0.5 for _ in range(length)])
+                 for _ in range(iterations)])
+
+
+def bench_frame(driver, iterations, rng):
+    """Random frames mixing all four modes, sent as framediff deltas."""
+    shown = bytearray(120)
+    weights = (LED_OFF,) * 4 + (LED_ON,) * 4 + (LED_BLINK1, LED_BLINK2)
+    def op(target):
+        def send():
+            framediff.send_updates(driver, framediff.plan_updates(shown, target), shown)
+        return send
+    # Start from a known state so 'shown' is accurate.
+    driver.set_led_range_state(0, [False] * 100)
+    for ledID in range(100, 120):
+        driver.set_led_state(LED_OFF, ledID)
+    return _run(driver, 'frame', [op(bytes(rng.choice(weights) for _ in range(120)))
+                                  for _ in range(iterations)])
+
+
+def bench_status(driver, iterations, rng):
+    def op(ledID):
+        return lambda: driver.get_led_status(ledID)
+    return _run(driver, 'status', [op(100 + i % 20) for i in range(iterations)])
+
+
+def bench_buttons(driver, count, rng, timeout=30.0):
+    """Ask the operator to press buttons and echo each press on its LED.
+
+    The 'button_echo' latency runs from get_btn_press returning a press
+    to the ACK of its LED echo; the operator's reaction time and the
+    press's trip to the driver are not included. Wrong or missing
+    presses count as errors.
+    """
+    result = WorkloadResult('button_echo')
+    try:
+        while True:
+            driver.get_btn_press(block=False)
+    except ButtonTimeoutError:
+        pass
+
+    start = time.perf_counter()
+    for btn in rng.sample(range(120), count):
+        driver.set_led_state(LED_BLINK2, btn)
+        print("Press the button next to the blinking LED (%d)..." % btn)
+        pressed = None
+        try:
+            pressed = driver.get_btn_press(timeout=timeout)
+            t = time.perf_counter()
+            driver.set_led_state(LED_ON, pressed)
+            result.latencies.append(time.perf_counter() - t)
+            if pressed != btn:
+                print("  got button %d instead" % pressed)
+                result.errors += 1
+        except ButtonTimeoutError:
+            print("  no press within %.0f seconds" % timeout)
+            result.errors += 1
+        except Att26AProtocolError:
+            result.errors += 1
+        driver.set_led_state(LED_OFF, btn)
+        if pressed is not None and pressed != btn:
+            driver.set_led_state(LED_OFF, pressed)
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+def run_workloads(driver, workloads=DEFAULT_WORKLOADS, iterations=200,
+                  range_lengths=DEFAULT_RANGE_LENGTHS, buttons=0, seed=None):
+    """Run the named workloads and return {name: summary dict}."""
+    rng = random.Random(seed)
+    results = []
+    for workload in workloads:
+        if workload == 'single':
+            results.append(bench_single(driver, iterations, rng))
+        elif workload == 'range':
+            for length in range_lengths:
+                results.append(bench_range(driver, iterations, rng, length))
+        elif workload == 'frame':
+            results.append(bench_frame(driver, iterations, rng))
+        elif workload == 'status':
+            results.append(bench_status(driver, iterations, rng))
+        else:
+            raise ValueError("Unknown workload %r" % workload)
+    if buttons:
+        results.append(bench_buttons(driver, buttons, rng))
+    return {r.name: r.summary() for r in results}
+
+
+def _fmt(value, spec="%8.2f"):
+    return "%8s" % "-" if value is None else spec % value
+
+def format_report(results):
+    lines = ["%-10s %6s %6s %8s %8s %8s %8s %8s %6s" % (
+        "workload", "ops", "errors", "ops/s", "p50 ms", "p90 ms", "p99 ms", "max ms", "retx")]
+    for name, r in results.items():
+        lines.append("%-10s %6d %6d %s %s %s %s %s %6d" % (
+            name, r['ops'], r['errors'], _fmt(r['ops_per_s'], "%8.1f"),
+            _fmt(r['p50_ms']), _fmt(r['p90_ms']), _fmt(r['p99_ms']), _fmt(r['max_ms']),
+            r['retransmits']))
+    return "\n".join(lines)
+
+
+def compare(results, baseline, tolerance=10.0):
+    """Compare results against a baseline.
+
+    A workload regresses if its throughput dropped, or its p99 latency
+    grew, by more than 'tolerance' percent, or if it has errors the
+    baseline did not have.
+
+    Returns:
+        tuple: (report lines, list of regressed workload names)
+    """
+    lines = ["%-10s %10s %10s  %s" % ("workload", "ops/s", "p99", "")]
+    regressed = []
+    for name, r in results.items():
+        b = baseline.get(name)
+        if b is None:
+            lines.append("%-10s %10s %10s  not in baseline" % (name, "-", "-"))
+            continue
+        d_ops = (r['ops_per_s'] / b['ops_per_s'] - 1) * 100 if b['ops_per_s'] else 0.0
+        if r['p99_ms'] is not None and b['p99_ms']:
+            d_p99 = (r['p99_ms'] / b['p99_ms'] - 1) * 100
+        else:
+            d_p99 = 0.0
+        bad = d_ops < -tolerance or d_p99 > tolerance or r['errors'] > b['errors']
+        if bad:
+            regressed.append(name)
+        lines.append("%-10s %+9.1f%% %+9.1f%%  %s" % (name, d_ops, d_p99,
+                                                     "REGRESSED" if bad else "ok"))
+    return lines, regressed
+
+
+def save_baseline(path, devname, results):
+    with open(path, 'w') as f:
+        json.dump({'version': BASELINE_VERSION, 'device': devname,
+                   'time': time.time(), 'results': results}, f, indent=2)
+
+def load_baseline(path):
+    with open(path) as f:
+        data = json.load(f)
+    if data.get('version') != BASELINE_VERSION:
+        raise ValueError("%s is not a version %d baseline." % (path, BASELINE_VERSION))
+    return data['results']
+
+
+def _add_arguments(parser):
+    parser.add_argument('-n', '--iterations', type=int, default=200,
+                        help='Operations per workload.')
+    parser.add_argument('-w', '--workloads', type=str, default=','.join(DEFAULT_WORKLOADS),
+                        help='Comma separated workloads: single, range, frame, status.')
+    parser.add_argument('--lengths', type=str,
+                        default=','.join(str(l) for l in DEFAULT_RANGE_LENGTHS),
+                        help='Comma separated lengths for the range workload.')
+    parser.add_argument('--buttons', type=int, default=0,
+                        help='Number of buttons the operator is prompted to press (reported as '
+                        'button_echo: press read to LED echo ACKed).')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='Random seed, for repeatable workloads.')
+    parser.add_argument('--save-baseline', type=str, default=None, metavar='FILE',
+                        help='Save the results as a baseline.')
+    parser.add_argument('--compare', type=str, default=None, metavar='FILE',
+                        help='Compare the results against a saved baseline.')
+    parser.add_argument('--tolerance', type=float, default=10.0,
+                        help='Percent change counted as a regression when comparing.')
+    parser.add_argument('--tune', action='store_true',
+                        help='Apply Linux low latency serial settings first.')
+    parser.add_argument('--json', action='store_true',
+                        help='Print the results as JSON.')
+
+def bench(devname, args):
+    import att26a
+
+    baseline = load_baseline(args.compare) if args.compare else None
+    with att26a.ATT26A(devname, tune_serial=args.tune) as driver:
+        if driver.serial_tuning is not None and not args.json:
+            print(driver.serial_tuning.format())
+        try:
+            results = run_workloads(
+                driver, [w for w in args.workloads.split(',') if w], args.iterations,
+                [int(l) for l in args.lengths.split(',') if l], args.buttons, args.seed)
+        except DriverClosedError as e:
+            print("ERROR: driver closed during the benchmark:", e)
+            return 1
+        rtt = driver.rtt
+        ka = driver.keepalive.stats()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(format_report(results))
+        print("ACK RTT: srtt %s ms, min %s ms, rto %.2f ms" % (
+            "%.2f" % (rtt.srtt * 1000) if rtt.srtt is not None else "-",
+            "%.2f" % (rtt.min_rtt * 1000) if rtt.min_rtt is not None else "-",
+            rtt.rto * 1000))
+        print("Keep-alive: period %.3f ms (%+.0f ppm), jitter %.3f ms, %d spikes (max %.2f ms), "
+              "%d missed, %d relocks" % (ka['period_ms'], ka['drift_ppm'], ka['jitter_ms'],
+                                         ka['spikes'], ka['max_spike_ms'], ka['missed'],
+                                         ka['relocks']))
+    if args.save_baseline:
+        save_baseline(args.save_baseline, devname, results)
+    if baseline is not None:
+        lines, regressed = compare(results, baseline, args.tolerance)
+        print("\n".join(lines))
+        if regressed:
+            return 2
+    return 0
+
+def main_cli():
+    from .clihelper import setup_standard_demo_cli
+    setup_standard_demo_cli('AT&T 26A benchmark', bench, _add_arguments)
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+
+"""Measure what commands cost on one console and serial adapter.
+
+A calibration sends a shuffled mix of single LED writes, status reads
+and range writes of several lengths, times each one from the call to
+its ACK and fits a cost model to the results: a fixed overhead per
+command type plus a cost per framed byte shared by all types. The
+model is saved as JSON and loaded by the driver at startup:
+
+    att26a-calibrate /dev/ttyUSB0 --out console1.json
+
+    driver = att26a.ATT26A('/dev/ttyUSB0', cost_model='console1.json')
+
+The driver then seeds its ACK timeout from the measured latencies and
+framediff plans frame updates with the measured command costs.
+"""
+
+import json
+import math
+import random
+import time
+
+from . import ATT26A, LED_OFF, LED_MODES, Att26AProtocolError
+from . import rtt
+
+MODEL_VERSION = 1
+
+KIND_LED = 'led'
+KIND_RANGE = 'range'
+KIND_STATUS = 'status'
+
+# One length for every framed message size a range write can have
+# (7 to 17 bytes); 71 is not supported by the device.
+CALIBRATION_RANGE_LENGTHS = (1, 8, 15, 22, 29, 36, 43, 50, 57, 64, 70, 77)
+
+# Samples further than this many (scaled) median absolute deviations
+# above the median of their command are dropped as outliers (the OS or
+# adapter stalled) before fitting.
+OUTLIER_MADS = 5.0
+
+
+def _nbytes(msg):
+    return len(ATT26A.frame_msg(msg))
+
+
+class CostModel(object):
+    """Measured cost of commands on one console.
+
+    The predicted latency of a command is the overhead of its type
+    plus 'per_byte' for every byte of the framed message.
+
+    Args:
+        overhead (dict): Seconds of fixed cost by command type
+            (KIND_LED, KIND_RANGE, KIND_STATUS).
+        per_byte (float): Seconds per framed message byte.
+        baudrate (int): Baud rate the model was measured at.
+        jitter (dict, optional): Per command type 'std' and 'p99' of
+            the latency around the prediction, in seconds.
+        info (dict, optional): Details of the measurement.
+    """
+
+    def __init__(self, overhead, per_byte, baudrate=10752, jitter=None, info=None):
+        self.overhead = dict(overhead)
+        self.per_byte = per_byte
+        self.baudrate = baudrate
+        self.jitter = dict(jitter or {})
+        self.info = dict(info or {})
+
+    def latency(self, kind, nbytes):
+        """Predicted seconds from sending a command to its ACK."""
+        return self.overhead[kind] + self.per_byte * nbytes
+
+    def transfer_time(self, nbytes):
+        """Seconds it takes 'nbytes' framed bytes to get across.
+
+        Never less than the time the bytes need on the wire.
+        """
+        return max(self.per_byte * nbytes, rtt.wire_time(nbytes, self.baudrate))
+
+    @property
+    def max_overhead(self):
+        return max(self.overhead.values())
+
+    @property
+    def max_jitter(self):
+        return max((j['std'] for j in self.jitter.values()), default=0.0)
+
+    def command_cost(self):
+        """Return the model as a :obj:`att26a.framediff.CommandCost`."""
+        from .framediff import CommandCost
+        byte_time = rtt.wire_time(1, self.baudrate)
+        overhead = self.overhead.get(KIND_LED, self.max_overhead)
+        return CommandCost(overhead / byte_time, self.per_byte / byte_time,
+                           self.overhead.get(KIND_RANGE, overhead) / byte_time)
+
+    def as_dict(self):
+        return {'version': MODEL_VERSION, 'overhead': self.overhead,
+                'per_byte': self.per_byte, 'baudrate': self.baudrate,
+                'jitter': self.jitter, 'info': self.info}
+
+    @classmethod
+    def from_dict(cls, data):
+        if data.get('version') != MODEL_VERSION:
+            raise ValueError("Not a version %d cost model." % MODEL_VERSION)
+        return cls(data['overhead'], data['per_byte'], data['baudrate'],
+                   data.get('jitter'), data.get('info'))
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.as_dict(), f, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+    def __repr__(self):
+        return "<CostModel %s per_byte=%.1fus>" % (
+            " ".join("%s=%.2fms" % (k, v * 1000) for k, v in sorted(self.overhead.items())),
+            self.per_byte * 1e6)
+
+
+class Measurement(object):
+    """Raw results of a calibration run.
+
+    'samples' holds (command type, framed bytes, seconds) tuples.
+    """
+
+    def __init__(self):
+        self.samples = []
+        self.errors = 0
+        self.retransmitted = 0
+
+
+def measure(driver, repeats=30, range_lengths=CALIBRATION_RANGE_LENGTHS, warmup=10, seed=None):
+    """Time every kind of command 'repeats' times.
+
+    The commands are sent in random order, so slow drifts (adapter
+    buffers, other load on the host) spread over every command type
+    instead of biasing one of them. Commands that timed out or were
+    retransmitted are counted but not sampled.
+
+    Args:
+        driver (:obj:`att26a.ATT26A`): Driver of the console to measure.
+            LEDs are overwritten with random patterns.
+        repeats (int): Samples of every command type and range length.
+        range_lengths (tuple of int): Range write lengths to measure.
+        warmup (int): Commands sent, and not timed, first.
+        seed (int, optional): Random seed.
+
+    Returns:
+        :obj:`Measurement`
+    """
+    rng = random.Random(seed)
+
+    def led():
+        driver.set_led_state(rng.choice(LED_MODES), rng.randrange(120))
+
+    def status():
+        driver.get_led_status(rng.randrange(100, 120))
+
+    def write_range(length):
+        return lambda: driver.set_led_range_state(
+            rng.randrange(100), [rng.random() < 0.5 for _ in range(length)])
+
+    ops = [(KIND_LED, _nbytes(ATT26A.encode_led_state(LED_OFF, 0)), led),
+           (KIND_STATUS, _nbytes(b'\xA5\x20\x00'), status)]
+    ops += [(KIND_RANGE, _nbytes(ATT26A.encode_led_range_state(0, [False] * length)),
+             write_range(length)) for length in range_lengths]
+    schedule = ops * repeats
+    rng.shuffle(schedule)
+
+    result = Measurement()
+    for _, _, op in rng.sample(ops * warmup, warmup):
+        try:
+            op()
+        except Att26AProtocolError:
+            pass
+    for kind, nbytes, op in schedule:
+        retransmits = driver.retransmit_count
+        start = time.perf_counter()
+        try:
+            op()
+        except Att26AProtocolError:
+            result.errors += 1
+            continue
+        elapsed = time.perf_counter() - start
+        if driver.retransmit_count != retransmits:
+            result.retransmitted += 1
+            continue
+        result.samples.append((kind, nbytes, elapsed))
+    return result
+
+
+def _median(values):
+    values = sorted(values)
+    mid = len(values) // 2
+    return values[mid] if len(values) % 2 else (values[mid - 1] + values[mid]) / 2.0
+
+
+def fit(samples, baudrate=10752):
+    """Fit a CostModel to (command type, framed bytes, seconds) samples.
+
+    Every command type gets its own overhead; the per byte cost is the
+    pooled least squares slope of all types (only range writes vary in
+    length, so they determine it). Outliers are dropped per command
+    type and length first.
+
+    Returns:
+        :obj:`CostModel`
+    """
+    cells = {}
+    for kind, nbytes, seconds in samples:
+        cells.setdefault((kind, nbytes), []).append(seconds)
+    groups = {}
+    rejected = 0
+    for (kind, nbytes), values in cells.items():
+        med = _median(values)
+        limit = med + OUTLIER_MADS * 1.4826 * _median([abs(v - med) for v in values])
+        kept = [v for v in values if v <= limit]
+        rejected += len(values) - len(kept)
+        groups.setdefault(kind, []).extend((nbytes, v) for v in kept)
+    if not groups:
+        raise ValueError("No samples to fit.")
+
+    means = {}
+    sxx = sxy = 0.0
+    for kind, points in groups.items():
+        mx = sum(x for x, _ in points) / len(points)
+        my = sum(y for _, y in points) / len(points)
+        means[kind] = (mx, my)
+        sxx += sum((x - mx) ** 2 for x, _ in points)
+        sxy += sum((x - mx) * (y - my) for x, y in points)
+    per_byte = sxy / sxx if sxx else rtt.wire_time(1, baudrate)
+
+    overhead = {kind: my - per_byte * mx for kind, (mx, my) in means.items()}
+    jitter = {}
+    sse = 0.0
+    npoints = 0
+    for kind, points in groups.items():
+        residuals = sorted(y - overhead[kind] - per_byte * x for x, y in points)
+        sse += sum(r * r for r in residuals)
+        npoints += len(points)
+        jitter[kind] = {
+            'std': math.sqrt(sum(r * r for r in residuals) / max(len(residuals) - 1, 1)),
+            'p99': residuals[min(int(math.ceil(0.99 * len(residuals))) - 1,
+                                 len(residuals) - 1)],
+        }
+
+    dof = npoints - len(groups) - 1
+    stderr = math.sqrt(sse / dof / sxx) if sxx and dof > 0 else None
+    info = {'samples': npoints, 'rejected': rejected, 'per_byte_stderr': stderr,
+            'wire_per_byte': rtt.wire_time(1, baudrate)}
+    return CostModel(overhead, per_byte, baudrate, jitter, info)
+
+
+def calibrate(driver, repeats=30, range_lengths=CALIBRATION_RANGE_LENGTHS, seed=None):
+    """Measure 'driver's console and return the fitted CostModel.
+
+    Every LED is left OFF afterwards.
+    """
+    measurement = measure(driver, repeats, range_lengths, seed=seed)
+    model = fit(measurement.samples, driver.baudrate)
+    model.info.update({'time': time.time(), 'repeats': repeats,
+                       'errors': measurement.errors,
+                       'retransmitted': measurement.retransmitted})
+    driver.set_led_range_state(0, [False] * 100)
+    for ledID in range(100, 120):
+        driver.set_led_state(LED_OFF, ledID)
+    return model
+
+
+def format_model(model):
+    lines = ["%-8s %10s %10s %10s" % ("command", "overhead", "jitter", "p99")]
+    for kind in sorted(model.overhead):
+        j = model.jitter.get(kind, {})
+        lines.append("%-8s %7.3f ms %7.3f ms %7.3f ms" % (
+            kind, model.overhead[kind] * 1000, j.get('std', 0.0) * 1000,
+            j.get('p99', 0.0) * 1000))
+    stderr = model.info.get('per_byte_stderr')
+    lines.append("per byte %7.1f us (+/- %s us; wire %.1f us)" % (
+        model.per_byte * 1e6, "-" if stderr is None else "%.1f" % (stderr * 1e6),
+        rtt.wire_time(1, model.baudrate) * 1e6))
+    lines.append("%d samples, %d outliers, %d errors, %d retransmitted" % (
+        model.info.get('samples', 0), model.info.get('rejected', 0),
+        model.info.get('errors', 0), model.info.get('retransmitted', 0)))
+    return "\n".join(lines)
+
+
+def _add_arguments(parser):
+    parser.add_argument('--out', type=str, default='att26a_cost.json',
+                        help='Cost model file to write.')
+    parser.add_argument('-n', '--repeats', type=int, default=30,
+                        help='Samples of every command type and range length.')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='Random seed, for repeatable command orders.')
+
+def calibrate_cli(devname, args):
+    import att26a
+
+    with att26a.ATT26A(devname) as driver:
+        model = driver.calibrate(args.out, repeats=args.repeats, seed=args.seed)
+    print(format_model(model))
+    print("Saved to", args.out)
+    return 0
+
+def main_cli():
+    from .clihelper import setup_standard_demo_cli
+    setup_standard_demo_cli('AT&T 26A command cost calibration', calibrate_cli, _add_arguments)
+
+if __name__ == "__main__":
+    main_cli()
@@ -28,13 +28,22 @@ class VAction(argparse.Action):
                 self.values = values.count('v')+1
         setattr(args, self.dest, self.values)
 
-def setup_standard_demo_cli(progdesc, demo_function):
+def setup_standard_demo_cli(progdesc, demo_function, add_arguments=None):
+    """Parse the standard demo arguments and run 'demo_function(devname)'.
+
+    If 'add_arguments' is given, it is called with the ArgumentParser
+    to add more arguments, and 'demo_function' is called with the
+    parsed arguments as its second parameter. A true return value of
+    'demo_function' is used as the exit status.
+    """
     from . import CanNotOpenDeviceError
     parser = argparse.ArgumentParser(description=progdesc)
     parser.add_argument('-v', nargs='?', action=VAction, dest='verbose', default=0,
                         help="Provide debug information. More than one v supported")
     parser.add_argument('devname', metavar='dev', type=str,
                         help='the Serial Device that connects to the AT&T 26A.')
+    if add_arguments is not None:
+        add_arguments(parser)
     args = parser.parse_args()
 
     import logging
@@ -43,7 +52,12 @@ def setup_standard_demo_cli(progdesc, demo_function):
     logging.getLogger('att26a').setLevel(loglevel)
 
     try:
-        demo_function(args.devname)
+        if add_arguments is not None:
+            ret = demo_function(args.devname, args)
+        else:
+            ret = demo_function(args.devname)
     except CanNotOpenDeviceError as e:
         print("ERROR:", str(e))
         exit(1)
+    if ret:
+        exit(ret)
@@ -0,0 +1,256 @@
+"""Z-ordered LED layers composited onto a single AT&T 26A.
+
+Each component draws on its own Layer instead of calling the driver
+directly. Layers only remember which LEDs changed; Compositor.tick()
+recomputes those LEDs and sends the cheapest set of commands for what
+actually changed on the device.
+"""
+
+import threading
+
+from . import LED_OFF, LED_ON, LED_MODES
+from . import framediff
+
+
+class Layer(object):
+    """One 120 LED mode buffer with a transparency mask.
+
+    LEDs that were never set (or were cleared) are transparent and
+    show whatever is below them. Layers are created with
+    Compositor.add_layer, and may be drawn on from any thread.
+    """
+
+    def __init__(self, compositor, z):
+        self._compositor = compositor
+        self._z = z
+        self._visible = True
+        self._modes = bytearray(120)
+        self._mask = bytearray(120)
+        self._dirty = set()
+
+    @property
+    def z(self):
+        return self._z
+
+    @z.setter
+    def z(self, value):
+        with self._compositor._lock:
+            self._z = value
+            self._compositor._sort_layers()
+            self._dirty.update(self._opaque())
+
+    @property
+    def visible(self):
+        return self._visible
+
+    @visible.setter
+    def visible(self, value):
+        with self._compositor._lock:
+            if bool(value) != self._visible:
+                self._visible = bool(value)
+                self._dirty.update(self._opaque())
+
+    def _opaque(self):
+        return [i for i in range(120) if self._mask[i]]
+
+    def _set(self, state, ledID):
+        if not self._mask[ledID] or self._modes[ledID] != state:
+            self._mask[ledID] = 1
+            self._modes[ledID] = state
+            self._dirty.add(ledID)
+
+    def set_led_state(self, state, ledID):
+        """Set an LED on this layer to one of the 4 supported states.
+
+        Args:
+            state: (int): att26a.LED_OFF, att26a.LED_BLINK1,
+                att26a.LED_BLINK2, or att26a.LED_ON.
+            ledID (int): ID of the LED to set the state of.
+        """
+        if state not in LED_MODES:
+            raise ValueError("state can either be 0x0, 0x8, 0xD, or 0xF, not %s" % hex(state))
+        if ledID >= 120 or ledID < 0:
+            raise ValueError("ledID must be between 0 and 119; not %d." % ledID)
+
+        with self._compositor._lock:
+            self._set(state, ledID)
+
+    def set_led_range_state(self, start_ledid, states_on_off):
+        """Set a range of LEDs on this layer to ON or OFF.
+
+        Behaves like ATT26A.set_led_range_state: only LEDs 0 to 99 can
+        be set, and ranges running past LED 99 wrap back to LED 0.
+
+        Args:
+            start_ledid (int): ID of first LED in the range.
+            states_on_off (:obj:`list` of :obj:`bool`): List of states
+                to set. Max length 100.
+        """
+        if start_ledid > 99 or start_ledid < 0:
+            raise ValueError("start_ledid must be between 0 and 99; not %d" % start_ledid)
+        if len(states_on_off) > 100:
+            raise ValueError("Only up to 100 leds may be set at a time, not %d"
+                             % len(states_on_off))
+
+        with self._compositor._lock:
+            for i, val in enumerate(states_on_off):
+                self._set(LED_ON if val else LED_OFF, (start_ledid + i) % 100)
+
+    def set_frame(self, modes, mask=None):
+        """Replace the whole layer.
+
+        Args:
+            modes: 120 LED modes.
+            mask (optional): 120 truthy/falsy values, True where the
+                layer is opaque. Defaults to fully opaque.
+        """
+        if len(modes) != 120 or (mask is not None and len(mask) != 120):
+            raise ValueError("modes and mask must hold exactly 120 values.")
+        for state in set(modes):
+            if state not in LED_MODES:
+                raise ValueError("state can either be 0x0, 0x8, 0xD, or 0xF, not %s"
+                                 % hex(state))
+
+        with self._compositor._lock:
+            for i in range(120):
+                if mask is None or mask[i]:
+                    self._set(modes[i], i)
+                elif self._mask[i]:
+                    self._mask[i] = 0
+                    self._dirty.add(i)
+
+    def clear_led(self, ledID):
+        """Make a single LED on this layer transparent."""
+        with self._compositor._lock:
+            if self._mask[ledID]:
+                self._mask[ledID] = 0
+                self._dirty.add(ledID)
+
+    def clear(self):
+        """Make every LED on this layer transparent."""
+        with self._compositor._lock:
+            self._dirty.update(self._opaque())
+            self._mask[:] = bytes(120)
+
+
+class Compositor(object):
+    """Composite z-ordered Layers onto one AT&T 26A.
+
+    Higher 'z' layers are drawn over lower ones; LEDs that no visible
+    layer covers are OFF. Nothing is sent to the device until tick()
+    is called, so components can update their layers at any rate and
+    only the net change is transmitted.
+
+    Args:
+        driver (:obj:`att26a.ATT26A`): Driver of the console to draw on.
+            The console is assumed to be freshly reset (all LEDs OFF).
+        cost (:obj:`att26a.framediff.CommandCost`, optional): cost
+            model used to pick between single LED and range writes.
+            Defaults to the driver's measured cost model, if any.
+    """
+
+    def __init__(self, driver, *, cost=None):
+        self._driver = driver
+        self._cost = cost
+        self._lock = threading.RLock()
+        self._ticklock = threading.Lock()
+        self._layers = []
+        self._pending = set()
+        self._shown = bytearray(120)
+
+    def add_layer(self, z=0):
+        """Create a new, fully transparent layer at height 'z'."""
+        with self._lock:
+            layer = Layer(self, z)
+            self._layers.append(layer)
+            self._sort_layers()
+            return layer
+
+    def remove_layer(self, layer):
+        """Remove 'layer'; whatever it covered is redrawn on the next tick."""
+        with self._lock:
+            self._layers.remove(layer)
+            self._pending.update(layer._opaque())
+            layer._dirty.clear()
+
+    def batch(self):
+        """Context manager grouping layer changes so no tick sees only some of them.
+
+            with compositor.batch():
+                layer.set_led_state(att26a.LED_ON, 3)
+                layer.clear_led(4)
+        """
+        return self._lock
+
+    def _sort_layers(self):
+        # Stable sort keeps layers of equal height in creation order.
+        self._layers.sort(key=lambda l: l._z, reverse=True)
+
+    def invalidate(self):
+        """Forget what is on the device and repaint everything on the next tick."""
+        with self._lock:
+            self._pending.update(range(120))
+            self._shown = None
+
+    @property
+    def shown(self):
+        """Copy of the frame last sent to the device."""
+        with self._lock:
+            return bytes(self._shown) if self._shown is not None else None
+
+    def compose(self, ledIDs=range(120)):
+        """Return the composited modes of 'ledIDs' as a 120 byte frame.
+
+        LEDs not in 'ledIDs' are left OFF in the returned frame.
+        """
+        frame = bytearray(120)
+        with self._lock:
+            layers = [l for l in self._layers if l._visible]
+            for i in ledIDs:
+                for layer in layers:
+                    if layer._mask[i]:
+                        frame[i] = layer._modes[i]
+                        break
+        return frame
+
+    def tick(self):
+        """Send the changes made to any layer since the last tick.
+
+        Only LEDs marked dirty on some layer are recomputed, and only
+        the ones whose composited mode differs from what is on the
+        device are sent.
+
+        Returns:
+            int: The number of commands sent.
+        """
+        with self._ticklock:
+            with self._lock:
+                dirty = self._pending
+                self._pending = set()
+                for layer in self._layers:
+                    if layer._dirty:
+                        dirty |= layer._dirty
+                        layer._dirty = set()
+                if not dirty:
+                    return 0
+
+                if self._shown is None:
+                    self._shown = bytearray(b'\xff' * 120) # Matches no mode
+                shown = bytearray(self._shown)
+                # Range writes may span LEDs that are not dirty, and take
+                # their states from 'target'; those have to stay as shown.
+                target = bytearray(shown)
+                composed = self.compose(dirty)
+                for i in dirty:
+                    target[i] = composed[i]
+
+            cost = self._cost or getattr(self._driver, 'command_cost', None)
+            cmds = framediff.plan_updates(shown, target, dirty, cost=cost)
+            try:
+                framediff.send_updates(self._driver, cmds, shown)
+            finally:
+                with self._lock:
+                    # Whatever did not make it out is retried next tick.
+                    self._pending.update(i for i in dirty if shown[i] != target[i])
+                    self._shown = shown
+            return len(cmds)
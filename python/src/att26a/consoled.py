@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+
+"""Share one AT&T 26A between many local or remote clients.
+
+The daemon owns the console through ATT26A and speaks the protocol in
+att26a.netproto. Clients lease the LEDs they want to draw on; every
+client draws on its own Compositor layer, and one painter thread sends
+the net change of all of them to the device, so clients can update at
+any rate without competing for the serial link. Button presses are
+forwarded to every client subscribed to that button.
+"""
+
+import asyncio
+import logging
+import socket
+import struct
+import threading
+import time
+
+from . import ButtonTimeoutError, DriverClosedError, Att26AError, LED_MODES
+from . import netproto
+from .compositor import Compositor
+
+
+class _Client(asyncio.Protocol):
+    def __init__(self, daemon, client_id):
+        self.daemon = daemon
+        self.client_id = client_id
+        self.transport = None
+        self.layer = None
+        self.leased = set()
+        self.buttons = frozenset()
+        self._reader = netproto.MessageReader()
+
+    def connection_made(self, transport):
+        self.transport = transport
+        sock = transport.get_extra_info('socket')
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.daemon._client_connected(self)
+
+    def data_received(self, data):
+        for msgtype, payload in self._reader.feed(data):
+            try:
+                self.daemon._handle_message(self, msgtype, payload)
+            except (ValueError, struct.error) as e:
+                self.send(netproto.MSG_ERROR, str(e).encode())
+
+    def connection_lost(self, exc):
+        self.daemon._client_lost(self)
+
+    def send(self, msgtype, payload=b''):
+        if not self.transport.is_closing():
+            self.transport.write(netproto.encode(msgtype, payload))
+
+
+class ConsoleDaemon(object):
+    """Serve one AT&T 26A to clients of the att26a.netproto protocol.
+
+    Each LED can be leased by at most one client at a time. Updates to
+    LEDs a client does not hold are ignored, and LEDs nobody holds are
+    OFF. When a client disconnects, its leases are released.
+
+    Args:
+        driver (:obj:`att26a.ATT26A`): Driver of a freshly reset console.
+        address (str): Address to listen on.
+        port (int): TCP port to listen on.
+        log (:obj:`logging.Logger`, optional): logging object.
+    """
+
+    RETRY_DELAY = 0.05 # Seconds before retrying a failed update; doubles per failure.
+    MAX_RETRY_DELAY = 1.0
+    WARN_INTERVAL = 10.0 # Seconds between warnings while updates keep failing.
+
+    def __init__(self, driver, address="", port=netproto.DEFAULT_PORT, log=None):
+        self._log = logging.getLogger('att26aconsoled') if not log else log
+        self.driver = driver
+        self.address = address
+        self.port = port
+        self.compositor = Compositor(driver)
+
+        self._clients = []
+        self._next_id = 1
+        self._owners = [None] * 120
+        self._loop = None
+        self._server = None
+        self._done = None
+
+        self._wake = threading.Event()
+        self._syncs = []
+        self._synclock = threading.Lock()
+        self._running = False
+        self._painter = None
+        self._button_reader = None
+
+    async def serve(self):
+        """Serve clients until stop() is called or the driver closes."""
+        self._loop = asyncio.get_running_loop()
+        self._done = self._loop.create_future()
+        self._server = await self._loop.create_server(
+            self._new_client, self.address or None, self.port, reuse_address=True)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._log.info("Serving console on port %d", self.port)
+
+        self._running = True
+        self._painter = threading.Thread(target=self._painter_func, daemon=True)
+        self._button_reader = threading.Thread(target=self._button_func, daemon=True)
+        self._painter.start()
+        self._button_reader.start()
+        try:
+            await self._done
+        finally:
+            self._running = False
+            self._wake.set()
+            self._server.close()
+            for client in list(self._clients):
+                client.transport.close()
+            await self._server.wait_closed()
+            self._painter.join()
+            self._button_reader.join()
+
+    def stop(self):
+        """Stop serving; may be called from any thread."""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._stop)
+
+    def _stop(self):
+        if self._done is not None and not self._done.done():
+            self._done.set_result(None)
+
+    def _new_client(self):
+        client = _Client(self, self._next_id)
+        self._next_id = (self._next_id % 0xFFFF) + 1
+        return client
+
+    def _client_connected(self, client):
+        self._clients.append(client)
+        client.layer = self.compositor.add_layer()
+        client.send(netproto.MSG_HELLO,
+                    netproto.HELLO.pack(netproto.PROTOCOL_VERSION, client.client_id))
+        self._log.info("Client %d connected from %s", client.client_id,
+                       client.transport.get_extra_info('peername'))
+
+    def _client_lost(self, client):
+        if client in self._clients:
+            self._clients.remove(client)
+        for ledID in client.leased:
+            self._owners[ledID] = None
+        client.leased.clear()
+        self.compositor.remove_layer(client.layer)
+        self._wake.set()
+        self._log.info("Client %d disconnected", client.client_id)
+
+    def _release(self, client, ledIDs):
+        for ledID in ledIDs:
+            if self._owners[ledID] is client:
+                self._owners[ledID] = None
+                client.leased.discard(ledID)
+                client.layer.clear_led(ledID)
+
+    def _handle_message(self, client, msgtype, payload):
+        if msgtype == netproto.MSG_DIFF:
+            changes = netproto.unpack_diff(payload)
+            with self.compositor.batch():
+                for ledID, mode in changes:
+                    if ledID in client.leased:
+                        client.layer.set_led_state(mode, ledID)
+            self._wake.set()
+        elif msgtype == netproto.MSG_FRAME:
+            frame = netproto.unpack_frame(payload)
+            with self.compositor.batch():
+                for ledID in client.leased:
+                    client.layer.set_led_state(frame[ledID], ledID)
+            self._wake.set()
+        elif msgtype == netproto.MSG_SYNC:
+            token = netproto.TOKEN.unpack(payload)[0]
+            with self._synclock:
+                self._syncs.append((client, token))
+            self._wake.set()
+        elif msgtype == netproto.MSG_LEASE:
+            for ledID in netproto.unpack_mask(payload):
+                if self._owners[ledID] is None:
+                    self._owners[ledID] = client
+                    client.leased.add(ledID)
+            client.send(netproto.MSG_LEASED, netproto.pack_mask(client.leased))
+        elif msgtype == netproto.MSG_RELEASE:
+            self._release(client, netproto.unpack_mask(payload))
+            self._wake.set()
+            client.send(netproto.MSG_LEASED, netproto.pack_mask(client.leased))
+        elif msgtype == netproto.MSG_SUBSCRIBE:
+            client.buttons = frozenset(netproto.unpack_mask(payload))
+        elif msgtype == netproto.MSG_QUERY:
+            shown = self.compositor.shown
+            client.send(netproto.MSG_FRAME, netproto.pack_frame(
+                bytes(b if b in LED_MODES else 0 for b in shown) if shown else bytes(120)))
+        else:
+            raise netproto.ProtocolError("Unknown message type 0x%02x" % msgtype)
+
+    def _painter_func(self):
+        delay = self.RETRY_DELAY
+        failures = 0
+        warned = None
+        while self._running:
+            self._wake.wait()
+            self._wake.clear()
+            # Every update received before these SYNCs is visible to this tick.
+            with self._synclock:
+                syncs = self._syncs
+                self._syncs = []
+            try:
+                self.compositor.tick()
+            except DriverClosedError:
+                self._log.error("Driver closed; stopping.")
+                self.stop()
+                break
+            except Att26AError as e:
+                # The frames are not on the device yet; acknowledge the
+                # SYNCs after a tick that gets them there.
+                failures += 1
+                now = time.monotonic()
+                if warned is None or now - warned >= self.WARN_INTERVAL:
+                    self._log.warning("Update failed %d time(s) (%s); retrying.", failures, e)
+                    warned = now
+                with self._synclock:
+                    self._syncs[:0] = syncs
+                time.sleep(delay)
+                delay = min(delay * 2, self.MAX_RETRY_DELAY)
+                self._wake.set()
+                continue
+            if failures:
+                self._log.info("Update succeeded after %d failure(s).", failures)
+                delay = self.RETRY_DELAY
+                failures = 0
+                warned = None
+            if syncs:
+                self._loop.call_soon_threadsafe(self._send_synced, syncs)
+
+    def _send_synced(self, syncs):
+        for client, token in syncs:
+            if client in self._clients:
+                client.send(netproto.MSG_SYNCED, netproto.TOKEN.pack(token))
+
+    def _button_func(self):
+        while self._running:
+            try:
+                btn = self.driver.get_btn_press(timeout=0.1)
+            except ButtonTimeoutError:
+                continue
+            except DriverClosedError:
+                self.stop()
+                break
+            self._loop.call_soon_threadsafe(self._send_button, btn)
+
+    def _send_button(self, btn):
+        payload = bytes((btn,))
+        for client in self._clients:
+            if btn in client.buttons:
+                client.send(netproto.MSG_BUTTON, payload)
+
+
+def main_cli():
+    import argparse
+    from . import ATT26A, CanNotOpenDeviceError
+    from .clihelper import VAction, get_verbose_level
+
+    parser = argparse.ArgumentParser(description='Share one AT&T 26A over the network')
+    parser.add_argument('-v', nargs='?', action=VAction, dest='verbose', default=0,
+                        help="Provide debug information. More than one v supported")
+    parser.add_argument('--port', type=int, default=netproto.DEFAULT_PORT,
+                        help='TCP port to serve clients on.')
+    parser.add_argument('--addr', type=str, default="",
+                        help='Address to serve clients on.')
+    parser.add_argument('devname', metavar='dev', type=str,
+                        help='the Serial Device that connects to the AT&T 26A.')
+    args = parser.parse_args()
+
+    loglevel = get_verbose_level(args.verbose)
+    logging.basicConfig(level=loglevel)
+    logging.getLogger('att26a').setLevel(loglevel)
+    logging.getLogger('att26aconsoled').setLevel(loglevel)
+
+    try:
+        driver = ATT26A(args.devname)
+    except CanNotOpenDeviceError as e:
+        print("ERROR:", str(e))
+        exit(1)
+
+    with driver:
+        daemon = ConsoleDaemon(driver, args.addr, args.port)
+        try:
+            asyncio.run(daemon.serve())
+        except KeyboardInterrupt:
+            pass
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+
+"""Systematically probe the commands a 26A (or its firmware) accepts.
+
+Every probe starts from a freshly reset console showing a known mix of
+LED modes, sends one correctly framed message and records whether it
+was ACKed, what data came back before the ACK and which LEDs or modes
+changed. The results are written as a JSON command table:
+
+    att26a-explore emu --out commands.json
+    att26a-explore /dev/ttyUSB0 --categories 85 --types 00-3f --out real.json
+
+The target 'emu' (or 'emu:PATH' for another image) runs the firmware
+on the 8051 emulator, which sees every LED. A real console only
+reports the modes of LEDs 100-119, which are read back after each
+probe; effects on the other LEDs go unnoticed.
+"""
+
+import hashlib
+import json
+import time
+
+from . import ATT26A, LED_MODES, LED_BLINK1, LED_BLINK2
+
+TABLE_VERSION = 1
+
+# Bytes that restart or end a frame can not appear inside a message.
+_FRAMING = (0x85, 0xA5, 0xFF)
+MAX_PARAMS = 13 # Frames hold at most 15 message bytes: category, type and parameters.
+
+DEFAULT_CATEGORIES = (0x85, 0xA5)
+DEFAULT_TYPES = tuple(t for t in range(256) if t not in _FRAMING)
+# Parameters tried with every category and type: nothing, single
+# bytes (LED IDs and the documented constants), and range write shaped
+# parameters (ID, count, bit fields).
+DEFAULT_PARAMS = (b'', b'\x00', b'\x02', b'\x2F', b'\x7F', b'\x00\x00', b'\x02\x06\x55',
+                  b'\x00\x0D\x55\x2A', b'\x00\x46' + b'\x2A' * 10 + b'\x01',
+                  b'\x00\x01\x02\x03\x04\x05\x06\x07')
+
+# Every LED starts in a mode, cycling through all four, so writing any
+# mode to any LED changes some of them.
+BASELINE = bytes(LED_MODES[(i * 3 + i // 10) % 4] for i in range(120))
+
+
+class ProbeResult(object):
+    """What one message did."""
+
+    def __init__(self, msg):
+        self.msg = bytes(msg)
+        self.acked = False
+        self.data = b''
+        self.buttons = b''
+        self.changed = {} # LED ID: new mode
+        self.flags = {}   # Changed console state: new value
+        self.processing_us = None
+        self.latency_ms = None
+
+    @property
+    def classification(self):
+        if not self.acked:
+            return 'ignored'
+        if self.changed:
+            return 'leds'
+        if self.flags:
+            return 'state'
+        if self.data:
+            return 'reply'
+        return 'ack'
+
+    def as_dict(self):
+        from .firmwaresim import command_name
+        d = {
+            'msg': self.msg.hex(),
+            'category': self.msg[0],
+            'type': self.msg[1],
+            'params': self.msg[2:].hex(),
+            'known_as': command_name(self.msg),
+            'class': self.classification,
+            'ack': self.acked,
+            'data': self.data.hex(),
+            'leds': {str(led): mode for led, mode in sorted(self.changed.items())},
+            'flags': self.flags,
+        }
+        if self.processing_us is not None:
+            d['processing_us'] = round(self.processing_us, 1)
+        if self.latency_ms is not None:
+            d['latency_ms'] = round(self.latency_ms, 3)
+        return d
+
+
+def _parse_response(result, response):
+    """Split received bytes into reply data (before the ACK) and button presses."""
+    for b in response:
+        if b == 0xFF: # Keep alive
+            continue
+        if b == 0xFD:
+            result.acked = True
+            break
+        if b & 0x80:
+            result.data += bytes((b,))
+        else:
+            result.buttons += bytes((b,))
+
+
+class EmulatorTarget(object):
+    """Probe the firmware running on the 8051 emulator.
+
+    Args:
+        firmware (str or bytes, optional): Firmware image or its path.
+        window (float): Emulated seconds to wait for a response.
+    """
+
+    class _Capture(object):
+        def __init__(self):
+            self.data = bytearray()
+
+        def write(self, data):
+            self.data += data
+
+    def __init__(self, firmware=None, window=0.06):
+        from .firmwaresim import Att26aFirmwareSim, load_firmware
+        firmware = load_firmware(firmware)
+        self.firmware = firmware
+        self.window = window
+        self._port = EmulatorTarget._Capture()
+        self.sim = Att26aFirmwareSim(self._port, firmware, threaded=False)
+
+    def describe(self):
+        return {'target': 'emulator', 'full_led_view': True,
+                'firmware_sha256': hashlib.sha256(self.firmware).hexdigest()}
+
+    def _state(self):
+        return {'factory_test': self.sim.factory_test, 'io_enabled': self.sim.io_enabled}
+
+    def probe(self, msg):
+        sim = self.sim
+        sim.reset()
+        sim.run_for(0.005) # Let the firmware initialize.
+        sim.load_led_modes(BASELINE)
+        state = self._state()
+        sim.clear_stats()
+        self._port.data.clear()
+
+        result = ProbeResult(msg)
+        sim._rx(ATT26A.frame_msg(msg))
+        waited = 0.0
+        while waited < self.window and 0xFD not in self._port.data:
+            sim.run_for(0.005)
+            waited += 0.005
+        sim.run_for(0.03) # Let delayed effects show up.
+
+        _parse_response(result, self._port.data)
+        modes = sim.led_modes()
+        result.changed = {i: modes[i] for i in range(120) if modes[i] != BASELINE[i]}
+        result.flags = {k: v for k, v in self._state().items() if state[k] != v}
+        for stats in sim.command_stats().values():
+            result.processing_us = stats['processing']['mean_us']
+            if stats['latency'] is not None:
+                result.latency_ms = stats['latency']['mean_us'] / 1000.0
+        return result
+
+    def close(self):
+        pass
+
+
+class SerialTarget(object):
+    """Probe a console on a serial port.
+
+    Each probe resets the console with DTR, sets LEDs 100-119 to the
+    baseline with documented commands, sends the probe and reads LEDs
+    100-119 back.
+
+    Args:
+        devname (str): Serial device (or pyserial URL) of the console.
+        window (float): Seconds to wait for a response.
+        check_leds (bool): Read LEDs 100-119 back after each probe.
+    """
+
+    def __init__(self, devname, window=0.1, check_leds=True):
+        self.devname = devname
+        self.window = window
+        self.check_leds = check_leds
+        self.ser = ATT26A.openSerialPortByName(devname)
+        self.ser.timeout = 0.01
+
+    def describe(self):
+        return {'target': self.devname, 'full_led_view': False}
+
+    def _exchange(self, msg, window=None):
+        self.ser.reset_input_buffer()
+        self.ser.write(ATT26A.frame_msg(msg))
+        deadline = time.monotonic() + (self.window if window is None else window)
+        response = bytearray()
+        while time.monotonic() < deadline:
+            response += self.ser.read(64)
+            if 0xFD in response:
+                break
+        return response
+
+    def _read_leds(self):
+        modes = {}
+        for led in range(100, 120):
+            response = self._exchange(b'\xA5\x20' + bytes((ATT26A._shift7_left(led),)))
+            data = bytes(b for b in response.split(b'\xFD')[0] if b & 0x80 and b != 0xFF)
+            if data:
+                modes[led] = LED_MODES[(data[0] >> 4) & 0x03]
+        return modes
+
+    def probe(self, msg):
+        self.ser.dtr = False
+        time.sleep(0.1)
+        self.ser.dtr = True
+        time.sleep(0.05)
+        if self.check_leds:
+            for led in range(100, 120):
+                self._exchange(ATT26A.encode_led_state(BASELINE[led], led))
+
+        result = ProbeResult(msg)
+        start = time.monotonic()
+        response = self._exchange(msg)
+        if 0xFD in response:
+            result.latency_ms = (time.monotonic() - start) * 1000.0
+        _parse_response(result, response)
+        if self.check_leds:
+            modes = self._read_leds()
+            result.changed = {led: mode for led, mode in modes.items()
+                              if mode != BASELINE[led]}
+        return result
+
+    def close(self):
+        self.ser.close()
+
+
+def probe_messages(categories=DEFAULT_CATEGORIES, types=DEFAULT_TYPES, params=DEFAULT_PARAMS):
+    """Generate category x type x parameter messages that can be framed.
+
+    Messages containing a framing byte, whose hash would be one, or
+    with more than MAX_PARAMS parameter bytes are skipped.
+    """
+    for category in categories:
+        for msgtype in types:
+            if msgtype in _FRAMING:
+                continue
+            for param in params:
+                if len(param) > MAX_PARAMS:
+                    continue
+                msg = bytes((category, msgtype)) + param
+                if any(b in _FRAMING for b in param) or ATT26A.frame_msg(msg)[-2] in _FRAMING:
+                    continue
+                yield msg
+
+
+def explore(target, messages, progress=None):
+    """Probe every message and return a list of ProbeResults."""
+    results = []
+    for i, msg in enumerate(messages):
+        results.append(target.probe(msg))
+        if progress is not None:
+            progress(i + 1, results[-1])
+    return results
+
+
+def summarize(results):
+    """Group results by category and type.
+
+    Returns:
+        dict: 'commands' maps 'CCTT' (category, type in hex) of every
+        pair with an effect beyond its ACK to the classes its probes
+        fell in; 'bulk_blink_candidates' lists the messages that put
+        more than one LED into a blinking mode.
+    """
+    commands = {}
+    bulk = []
+    for r in results:
+        key = r.msg[:2].hex()
+        classes = commands.setdefault(key, {})
+        classes[r.classification] = classes.get(r.classification, 0) + 1
+        if sum(1 for m in r.changed.values() if m in (LED_BLINK1, LED_BLINK2)) > 1:
+            bulk.append(r.msg.hex())
+    effective = {k: v for k, v in commands.items() if set(v) - {'ack', 'ignored'}}
+    acked = [k for k, v in commands.items() if k not in effective and 'ack' in v]
+    return {'commands': effective, 'ack_only': len(acked),
+            'ignored': len(commands) - len(effective) - len(acked),
+            'bulk_blink_candidates': bulk}
+
+
+def write_table(path, target, results):
+    with open(path, 'w') as f:
+        json.dump({'version': TABLE_VERSION, 'time': time.time(),
+                   'target': target.describe(), 'summary': summarize(results),
+                   'probes': [r.as_dict() for r in results]}, f, indent=1)
+
+
+def _byte_ranges(text):
+    """Parse '85,a5' or '00-3f,70' (hex) into a tuple of byte values."""
+    values = []
+    for part in text.split(','):
+        if '-' in part:
+            lo, hi = part.split('-')
+            values.extend(range(int(lo, 16), int(hi, 16) + 1))
+        elif part:
+            values.append(int(part, 16))
+    return tuple(values)
+
+def _add_arguments(parser):
+    parser.add_argument('--out', type=str, default='att26a_commands.json',
+                        help='Command table to write.')
+    parser.add_argument('--categories', type=str, default='85,a5',
+                        help='Comma separated hex categories.')
+    parser.add_argument('--types', type=str, default='00-ff',
+                        help='Hex message types, as ranges (00-3f) or values.')
+    parser.add_argument('--params', type=str, default=None,
+                        help='Comma separated hex parameter strings (default: a built in set; '
+                        '"-" is no parameters).')
+    parser.add_argument('--window', type=float, default=None,
+                        help='Seconds to wait for each response.')
+    parser.add_argument('--no-led-check', action='store_true',
+                        help='Real consoles: do not read LEDs 100-119 back.')
+
+def explore_cli(devname, args):
+    try:
+        params = DEFAULT_PARAMS if args.params is None else tuple(
+            b'' if p == '-' else bytes.fromhex(p) for p in args.params.split(','))
+    except ValueError as e:
+        print("ERROR: --params must be hex strings:", str(e))
+        return 1
+    too_long = [p.hex() for p in params if len(p) > MAX_PARAMS]
+    if too_long:
+        print("ERROR: messages are shorter than 16 bytes, so parameters can be at most "
+              "%d bytes; not %s." % (MAX_PARAMS, ", ".join(too_long)))
+        return 1
+
+    if devname == 'emu' or devname.startswith('emu:'):
+        try:
+            target = EmulatorTarget(devname[4:] or None, **(
+                {'window': args.window} if args.window else {}))
+        except OSError as e:
+            print("ERROR:", str(e))
+            return 1
+    else:
+        target = SerialTarget(devname, check_leds=not args.no_led_check, **(
+            {'window': args.window} if args.window else {}))
+    messages = list(probe_messages(_byte_ranges(args.categories), _byte_ranges(args.types),
+                                   params))
+
+    def progress(done, result):
+        if result.classification not in ('ack', 'ignored'):
+            print("%-32s %s" % (result.msg.hex(), result.classification))
+        elif done % 100 == 0:
+            print("... %d/%d" % (done, len(messages)))
+    try:
+        results = explore(target, messages, progress)
+    finally:
+        target.close()
+    write_table(args.out, target, results)
+
+    summary = summarize(results)
+    print("%d probes; category/type pairs: %d with effects, %d only ACKed, %d ignored. "
+          "Table: %s" % (len(results), len(summary['commands']), summary['ack_only'],
+                         summary['ignored'], args.out))
+    if summary['bulk_blink_candidates']:
+        print("Messages setting several blink modes:", ", ".join(summary['bulk_blink_candidates']))
+    return 0
+
+def main_cli():
+    from .clihelper import setup_standard_demo_cli
+    setup_standard_demo_cli('AT&T 26A protocol explorer ("emu" probes the firmware emulator)',
+                            explore_cli, _add_arguments)
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,544 @@
+#!/usr/bin/env python3
+
+"""Simulated 26A running the console's own firmware on an emulated 8051.
+
+Unlike Att26aSim, which implements the protocol from its documentation,
+this backend executes firmware/att_26a_adekp.bin instruction by
+instruction. Its responses, their timing, its behavior with back to
+back frames and the LED multiplexing all come from the real firmware,
+and every command's processing time is measured in machine cycles.
+
+The firmware drives the hardware as follows. Timer 0 interrupts every
+1344 cycles and lights one of 12 LED rows: rows 0-7 on P2, rows 8-11
+on P1.0-3. The row's 10 columns are driven low on P0 (columns 0-7) and
+P1.6-7 (columns 8 and 9), and a pulse on P3.2 latches them. LED N is
+in row N // 10, column N % 10. Buttons are scanned every 26.9 ms by
+driving one of 24 lines of P0-P2 high and reading the 5 return lines
+P3.3-7, which a pressed button pulls low.
+"""
+
+import collections
+import logging
+import os
+import sys
+import threading
+import time
+
+import serial
+
+from . import mcs51
+from .simulator import LED_MODES
+
+# 10752 baud with TH1 = 0xFD (the firmware's setting) needs a
+# 12.386304 MHz crystal.
+CLOCK = 12386304
+
+# The firmware image is not part of the package. It is found through
+# FIRMWARE_ENV, or in the firmware directory of a source checkout.
+FIRMWARE_ENV = 'ATT26A_FIRMWARE'
+SOURCE_FIRMWARE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                               '..', '..', '..', 'firmware', 'att_26a_adekp.bin')
+
+def find_firmware(path=None):
+    """Path of the firmware image to run.
+
+    Args:
+        path (str, optional): Explicit path. Defaults to the path in
+            the ATT26A_FIRMWARE environment variable, then to the image
+            in a source checkout.
+
+    Raises:
+        FileNotFoundError: No image was given or found.
+    """
+    if not path:
+        path = os.environ.get(FIRMWARE_ENV)
+    if not path:
+        if not os.path.isfile(SOURCE_FIRMWARE):
+            raise FileNotFoundError(
+                "No 26A firmware image; pass its path or set %s (the image is "
+                "firmware/att_26a_adekp.bin in the source repository)." % FIRMWARE_ENV)
+        path = SOURCE_FIRMWARE
+    elif not os.path.isfile(path):
+        raise FileNotFoundError("26A firmware image %s does not exist." % path)
+    return path
+
+
+def load_firmware(firmware=None):
+    """Return the firmware image 'firmware' (bytes, or a path for find_firmware)."""
+    if isinstance(firmware, (bytes, bytearray)):
+        return bytes(firmware)
+    with open(find_firmware(firmware), 'rb') as f:
+        return f.read()
+
+
+# Firmware RAM.
+_RAM_DISPLAY = 0x3F # Two bytes per row; LED mode bits of columns 0-7.
+_RAM_DISPLAY_HI = 0x57 # Two bytes per 4 rows; columns 8 and 9.
+_RAM_FACTORY_TEST = 0x5D
+_RAM_FLAGS = 0x20
+_FLAG_IO_DISABLED = 0x20
+
+_SERIAL_VECTOR = 0x23
+
+_COMMANDS = {
+    (0x85, 0x07): 'set_led_range_state',
+    (0x85, 0x10): 'factory_test_on',
+    (0x85, 0x30): 'factory_test_off',
+    (0x85, 0x40): 'io_enable',
+    (0x85, 0x50): 'io_disable',
+    (0xA5, 0x20): 'get_led_status',
+}
+
+
+def command_name(msg):
+    """Name of the command in frame 'msg' (without hash and 0xFF)."""
+    if len(msg) >= 2 and msg[0] == 0x85 and msg[1] & 0xF0 == 0x20:
+        return 'set_led_state'
+    return _COMMANDS.get(tuple(msg[:2]), 'unknown')
+
+
+def _led_bits(ledID):
+    """(address of mode bit 1, address of mode bit 0, mask) of an LED."""
+    row, col = divmod(ledID, 10)
+    if col < 8:
+        addr = _RAM_DISPLAY + 2 * row
+        return addr, addr + 1, 1 << col
+    addr = _RAM_DISPLAY_HI + 2 * (row // 4)
+    return addr, addr + 1, 1 << (6 - 2 * (row % 4) + col - 8)
+
+_LED_BITS = tuple(_led_bits(i) for i in range(120))
+
+
+def _button_lines(btn_id):
+    """(port, scan line mask, return line mask) wiring button 'btn_id'."""
+    if btn_id < 100:
+        group, col = divmod(btn_id % 50, 10)
+        scan = col + (10 if btn_id >= 50 else 0)
+    else:
+        scan, group = divmod(btn_id - 100, 5)
+        scan += 20
+    return scan // 8, 1 << (scan % 8), 0x08 << group
+
+_BUTTON_LINES = tuple(_button_lines(i) for i in range(120))
+
+
+class CommandStats(object):
+    """Firmware time spent on one command type.
+
+    'cycles' counts machine cycles spent in the serial interrupt
+    handling the frame's final 0xFF (decoding and executing it, and
+    queuing the response), excluding interrupts nested in it.
+    'latency' counts cycles from the 0xFF arriving to the last response
+    byte (the ACK) leaving the UART.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.cycles = []
+        self.latency = []
+
+    def summary(self, cycle_time):
+        def stats(samples):
+            if not samples:
+                return None
+            return {'mean_us': sum(samples) / len(samples) * cycle_time * 1e6,
+                    'min_us': min(samples) * cycle_time * 1e6,
+                    'max_us': max(samples) * cycle_time * 1e6,
+                    'mean_cycles': sum(samples) / len(samples)}
+        return {'count': self.count, 'processing': stats(self.cycles),
+                'latency': stats(self.latency)}
+
+
+class Att26aFirmwareSim(object):
+    """Simulator backend executing the 26A firmware.
+
+    Serves the same serial devices as Att26aSim (RFC2217SerialAdapter,
+    AsyncRFC2217SerialAdapter, or anything with read, write and
+    in_waiting), and follows the reset line of ports reporting DTR.
+
+    Args:
+        serialdev: Serial port connected to the simulated UART.
+        firmware (str or bytes, optional): Firmware image or its path;
+            defaults to find_firmware()'s (ATT26A_FIRMWARE, then the
+            image in a source checkout).
+        log (:obj:`logging.Logger`, optional): logging object.
+        speed (float, optional): Emulated seconds per wall clock
+            second. None runs the emulator as fast as it can.
+        threaded (bool): Run the emulator and the serial reader in
+            threads. Unthreaded simulators are fed through _rx() and
+            advanced with run_for().
+        clock (int): Crystal frequency in Hz.
+    """
+
+    SLICE = 0.001 # Emulated seconds run between checks of the wall clock.
+
+    def __init__(self, serialdev, firmware=None, log=None, *, speed=1.0, threaded=True,
+                 clock=CLOCK):
+        self._log = logging.getLogger('att26afwsim') if not log else log
+        firmware = load_firmware(firmware)
+
+        self.__ser = serialdev
+        self.speed = speed
+        self.__lock = threading.RLock()
+
+        self.cpu = mcs51.MCS51(firmware, clock, self._log)
+        self.cpu.on_tx = self.__on_tx
+        self.cpu.on_port_write = self.__on_port_write
+        self.cpu.on_rx_read = self.__on_rx_read
+        self.cpu.on_interrupt = self.__on_interrupt
+        self.cpu.on_reti = self.__on_reti
+        self.__slice = int(self.SLICE / self.cpu.cycle_time)
+
+        self.__txbuf = bytearray()
+        self.__row_masks = [0] * 12 # Columns lit in each row.
+        self.__pressed = {} # Held buttons and the cycle they are released at.
+        self.__frame = bytearray()
+        self.__isr_stack = []
+        self.__awaiting_ack = collections.deque()
+        self.__stats = {}
+        self.__commands = 0
+        self.__parity_errors = 0
+
+        self.__in_reset = False
+        self.__running = False
+        self.__runthread = None
+        self.__recvthread = None
+
+        if hasattr(serialdev, 'add_dtr_listener'):
+            serialdev.add_dtr_listener(self._on_dtr)
+
+        if threaded:
+            self.start()
+
+    # -------------------------------------------------------------------
+    # Running
+
+    def start(self):
+        if self.__running:
+            return
+        self.__running = True
+        self.__runthread = threading.Thread(daemon=True, target=self.__runthread_func)
+        self.__runthread.start()
+        self.__recvthread = threading.Thread(daemon=True, target=self.__recvthread_func)
+        self.__recvthread.start()
+
+    def stop(self):
+        self.__running = False
+        if self.__runthread is not None:
+            self.__runthread.join()
+            self.__runthread = None
+
+    def run_for(self, seconds):
+        """Advance an unthreaded simulator by 'seconds' of emulated time."""
+        with self.__lock:
+            if not self.__in_reset:
+                end = self.cpu.cycles + int(seconds / self.cpu.cycle_time)
+                while self.cpu.cycles < end:
+                    self.__run_slice(min(self.__slice, end - self.cpu.cycles))
+        self.__flush()
+
+    def __run_slice(self, cycles):
+        cpu = self.cpu
+        if self.__pressed:
+            self.__release_buttons(cpu.cycles)
+        cpu.run(cycles)
+
+    def __runthread_func(self):
+        self._log.info("Firmware simulator thread STARTING")
+        cycle_time = self.cpu.cycle_time
+        anchor_wall, anchor_cycles = time.monotonic(), self.cpu.cycles
+        while self.__running:
+            with self.__lock:
+                if self.__in_reset:
+                    anchor_cycles = None
+                else:
+                    if anchor_cycles is None:
+                        anchor_wall, anchor_cycles = time.monotonic(), self.cpu.cycles
+                    self.__run_slice(self.__slice)
+                    cycles = self.cpu.cycles
+            try:
+                self.__flush()
+            except serial.serialutil.SerialException as e:
+                self._log.error("Firmware simulator terminating due to exception: '%s'", e)
+                break
+            if anchor_cycles is None:
+                time.sleep(self.SLICE)
+                continue
+            if self.speed:
+                ahead = (cycles - anchor_cycles) * cycle_time / self.speed - \
+                        (time.monotonic() - anchor_wall)
+                if ahead > 0:
+                    time.sleep(ahead)
+                elif ahead < -0.1:
+                    # Fell behind (a loaded host); do not try to catch up.
+                    anchor_wall, anchor_cycles = time.monotonic(), cycles
+        self._log.info("Firmware simulator thread TERMINATING")
+
+    def __recvthread_func(self):
+        ser = self.__ser
+        while self.__running:
+            try:
+                data = ser.read(getattr(ser, 'in_waiting', 0) or 1)
+            except serial.serialutil.SerialException as e:
+                self._log.error("Simulator receiver thread terminating due to exception: '%s'", e)
+                break
+            if data:
+                self._rx(data)
+
+    def _rx(self, data):
+        """Bytes from the host start arriving on the UART now."""
+        if not self.__in_reset:
+            self.cpu.receive(data)
+
+    def __on_tx(self, byte, bit8, cycles):
+        if bit8 == mcs51._PARITY[byte]:
+            self.__parity_errors += 1
+        if byte == 0xFD and self.__awaiting_ack:
+            name, start = self.__awaiting_ack.popleft()
+            self.__stats[name].latency.append(cycles - start)
+        self.__txbuf.append(byte)
+
+    def __flush(self):
+        if self.__txbuf:
+            data = bytes(self.__txbuf)
+            self.__txbuf.clear()
+            self.__ser.write(data)
+
+    # -------------------------------------------------------------------
+    # Reset line
+
+    @property
+    def in_reset(self):
+        """True while the reset line (DTR) holds the 26A in reset."""
+        return self.__in_reset
+
+    def _on_dtr(self, dtr):
+        """Follow the reset line: DTR low holds the 26A in reset."""
+        with self.__lock:
+            if not dtr and not self.__in_reset:
+                self._log.info("Entering reset")
+                self.__in_reset = True
+            elif dtr and self.__in_reset:
+                self._log.info("Leaving reset")
+                self.reset()
+                self.__in_reset = False
+
+    def reset(self):
+        """Restart the firmware, as a pulse on the reset line does."""
+        with self.__lock:
+            self.cpu.reset()
+            self.__txbuf.clear()
+            self.__frame.clear()
+            self.__isr_stack.clear()
+            self.__awaiting_ack.clear()
+            self.__pressed.clear()
+            self.__row_masks = [0] * 12
+            self.cpu.port_input[3] = 0xFF
+
+    # -------------------------------------------------------------------
+    # Buttons
+
+    def press_button(self, btn_id, hold=0.06):
+        """Hold button 'btn_id' down for 'hold' emulated seconds.
+
+        The firmware scans the buttons every 26.9 ms, so shorter
+        presses may be missed.
+        """
+        if not 0 <= btn_id < 120:
+            raise ValueError("btn_id must be between 0 and 119; not %d." % btn_id)
+        with self.__lock:
+            self.__pressed[btn_id] = self.cpu.cycles + int(hold / self.cpu.cycle_time)
+            self.__update_return_lines()
+
+    def send_btn_press(self, btn_id):
+        self.press_button(btn_id)
+
+    def __release_buttons(self, now):
+        released = [b for b, until in self.__pressed.items() if until <= now]
+        for btn in released:
+            del self.__pressed[btn]
+        if released:
+            self.__update_return_lines()
+
+    def __update_return_lines(self):
+        sfr = self.cpu.sfr
+        lines = 0xFF
+        for btn in self.__pressed:
+            port, scan, ret = _BUTTON_LINES[btn]
+            if sfr[mcs51.PORTS[port]] & scan:
+                lines &= ~ret
+        self.cpu.port_input[3] = lines
+
+    # -------------------------------------------------------------------
+    # LED drive
+
+    def __on_port_write(self, port, value, cycles):
+        if port < 3:
+            if self.__pressed:
+                self.__update_return_lines()
+            return
+        if port == 3 and value & 0x04:
+            # Latch pulse: capture the row being driven.
+            sfr = self.cpu.sfr
+            p1 = sfr[mcs51.P1]
+            rows = sfr[mcs51.P2] | (p1 & 0x0F) << 8
+            if rows:
+                cols = (~sfr[mcs51.P0] & 0xFF) | (~p1 & 0xC0) << 2
+                self.__row_masks[rows.bit_length() - 1] = cols
+
+    @property
+    def row_drive(self):
+        """Columns lit in each of the 12 rows when it was last scanned.
+
+        Returns:
+            list: 12 ints; bit N of entry R is LED R * 10 + N.
+        """
+        return list(self.__row_masks)
+
+    def lit(self):
+        """120 bools: whether each LED was lit the last time its row was scanned."""
+        return [bool(self.__row_masks[i // 10] >> (i % 10) & 1) for i in range(120)]
+
+    def led_modes(self):
+        """The LED modes held in the firmware's display memory."""
+        iram = self.cpu.iram
+        return bytes(LED_MODES[(2 if iram[a1] & mask else 0) | (1 if iram[a0] & mask else 0)]
+                     for a1, a0, mask in _LED_BITS)
+
+    def load_led_modes(self, modes):
+        """Write 120 LED modes straight into the display memory."""
+        iram = self.cpu.iram
+        with self.__lock:
+            for (a1, a0, mask), mode in zip(_LED_BITS, modes):
+                index = LED_MODES.index(mode)
+                iram[a1] = iram[a1] | mask if index & 2 else iram[a1] & ~mask
+                iram[a0] = iram[a0] | mask if index & 1 else iram[a0] & ~mask
+
+    def snapshot(self):
+        """Return (LED modes, number of commands processed)."""
+        with self.__lock:
+            return self.led_modes(), self.__commands
+
+    @property
+    def factory_test(self):
+        return self.cpu.iram[_RAM_FACTORY_TEST] != 0
+
+    @property
+    def io_enabled(self):
+        return not self.cpu.iram[_RAM_FLAGS] & _FLAG_IO_DISABLED
+
+    # -------------------------------------------------------------------
+    # Command timing
+
+    def __on_interrupt(self, vector, cycles):
+        self.__isr_stack.append([vector, cycles, 0, None])
+
+    def __on_rx_read(self, byte, cycles):
+        if self.__isr_stack and self.__isr_stack[-1][0] == _SERIAL_VECTOR:
+            self.__isr_stack[-1][3] = byte
+
+    def __on_reti(self, cycles):
+        if not self.__isr_stack:
+            return
+        vector, start, nested, byte = self.__isr_stack.pop()
+        spent = cycles - start - nested
+        if self.__isr_stack:
+            self.__isr_stack[-1][2] += cycles - start
+        if byte is None:
+            return
+        frame = self.__frame
+        if byte in (0x85, 0xA5):
+            frame[:] = (byte,)
+        elif byte != 0xFF:
+            frame.append(byte)
+        elif frame:
+            h = 0x7F
+            for b in frame[1:]:
+                h ^= b
+            name = command_name(frame) if h == 0 else 'bad_hash'
+            stats = self.__stats.get(name)
+            if stats is None:
+                stats = self.__stats[name] = CommandStats(name)
+            stats.count += 1
+            stats.cycles.append(spent)
+            if h == 0:
+                self.__awaiting_ack.append((name, start))
+                self.__commands += 1
+            frame.clear()
+
+    def command_stats(self):
+        """Firmware processing time and ACK latency, by command type.
+
+        Returns:
+            dict: {command name: CommandStats.summary()}
+        """
+        with self.__lock:
+            return {name: s.summary(self.cpu.cycle_time) for name, s in self.__stats.items()}
+
+    def clear_stats(self):
+        with self.__lock:
+            self.__stats.clear()
+            self.__awaiting_ack.clear()
+
+    @property
+    def parity_errors(self):
+        """Bytes the firmware sent with a wrong parity bit."""
+        return self.__parity_errors
+
+
+def format_stats(stats):
+    lines = ["%-22s %6s %12s %12s %12s" % ("command", "count", "proc us", "max us",
+                                            "ack lat ms")]
+    for name, s in sorted(stats.items()):
+        proc, lat = s['processing'], s['latency']
+        lines.append("%-22s %6d %12.1f %12.1f %12s" % (
+            name, s['count'], proc['mean_us'], proc['max_us'],
+            "%.2f" % (lat['mean_us'] / 1000) if lat else "-"))
+    return "\n".join(lines)
+
+
+def main_cli():
+    import argparse
+    from .clihelper import VAction, get_verbose_level
+    from .serial_adapter import RFC2217SerialAdapter
+
+    parser = argparse.ArgumentParser(
+        description='AT&T 26A simulator running the console firmware')
+    parser.add_argument('--port', type=int, nargs='?', default=7778,
+                        help='Port to host rfc2217 server.')
+    parser.add_argument('--addr', type=str, default="localhost",
+                        help='Address to host rfc2217 server.')
+    parser.add_argument('--firmware', type=str, default=None,
+                        help='Firmware image (default: $%s, or the one in the source tree).'
+                        % FIRMWARE_ENV)
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help='Emulated seconds per second; 0 runs as fast as possible.')
+    parser.add_argument('-v', nargs='?', action=VAction, dest='verbose', default=0,
+                        help="Provide debug information. More than one v supported")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=get_verbose_level(args.verbose))
+
+    try:
+        firmware = load_firmware(args.firmware)
+    except OSError as e:
+        print("ERROR:", str(e))
+        sys.exit(1)
+    adapter = RFC2217SerialAdapter(args.addr, args.port)
+    sim = Att26aFirmwareSim(adapter, firmware, speed=args.speed or None)
+    print("Serving rfc2217://%s:%d; ^C prints command timings and exits." %
+          (args.addr, args.port))
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    sim.stop()
+    adapter.close()
+    print(format_stats(sim.command_stats()))
+    if sim.parity_errors:
+        print("Bytes sent with bad parity: %d" % sim.parity_errors)
+
+if __name__ == "__main__":
+    main_cli()
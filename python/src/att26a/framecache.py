@@ -0,0 +1,84 @@
+"""Bounded LRU cache of encoded commands and planned frame updates.
+
+Animations and status pages tend to show the same frames over and
+over; caching their wire bytes (and the commands planned to reach
+them) lets repeats skip validation, bit packing, hashing and planning.
+The cache is bounded by the bytes it holds rather than its entry count,
+so its memory use stays predictable however big the entries are.
+"""
+
+import threading
+from collections import OrderedDict
+
+# Rough per entry bookkeeping cost (dict slot, tuple key, counters).
+ENTRY_OVERHEAD = 64
+
+
+class EncodedFrameCache(object):
+    """Thread safe LRU cache with byte size accounting.
+
+    Args:
+        max_bytes (int): Upper bound of the accounted size of all
+            entries; least recently used entries are evicted beyond it.
+    """
+
+    def __init__(self, max_bytes=65536):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def bytes(self):
+        """Accounted size of all entries."""
+        return self._bytes
+
+    def get(self, key):
+        """Return the value cached for 'key' and mark it used, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, size):
+        """Cache 'value', accounted as 'size' bytes plus ENTRY_OVERHEAD."""
+        size += ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __repr__(self):
+        return "<EncodedFrameCache entries=%d bytes=%d/%d hits=%d misses=%d>" % (
+            len(self._entries), self._bytes, self.max_bytes, self.hits, self.misses)
+
+
+def pattern_key(states_on_off):
+    """Hashable, compact form of a list of ON/OFF states."""
+    try:
+        return bytes(states_on_off)
+    except (TypeError, ValueError):
+        return bytes(bool(v) for v in states_on_off)
@@ -0,0 +1,217 @@
+"""Turn the difference between two 120 LED frames into driver commands.
+
+A frame is any indexable sequence of 120 LED modes (att26a.LED_OFF,
+att26a.LED_BLINK1, att26a.LED_BLINK2 or att26a.LED_ON); a 120 byte
+bytearray is the usual representation.
+
+The planner picks between single LED writes ('852X') and range
+writes ('8507') so that the total cost of the update is as small as
+possible. Range writes can only express ON and OFF, only cover LEDs
+0-99 (wrapping from 99 back to 0), are limited to 77 LEDs and can not
+be 71 LEDs long.
+"""
+
+from . import LED_OFF, LED_ON
+
+CMD_LED = 'led'
+CMD_RANGE = 'range'
+
+MAX_RANGE_LEN = 77
+
+
+class CommandCost(object):
+    """Relative cost of one command, measured in wire byte times.
+
+    Every command costs a fixed 'overhead' (ACK turnaround, USB
+    latency) plus 'per_byte' for each byte of the framed message.
+    Measured models (see att26a.calibration) may give range writes
+    their own overhead.
+
+    Args:
+        overhead (float): Fixed cost of any command.
+        per_byte (float): Cost of each framed byte.
+        range_overhead (float, optional): Fixed cost of range writes,
+            if it differs from 'overhead'.
+    """
+
+    def __init__(self, overhead=8.0, per_byte=1.0, range_overhead=None):
+        self.overhead = overhead
+        self.per_byte = per_byte
+        self.range_overhead = overhead if range_overhead is None else range_overhead
+
+    @property
+    def key(self):
+        """Hashable identity of the model, for caching plans."""
+        return (self.overhead, self.per_byte, self.range_overhead)
+
+    def led(self):
+        """Cost of a single 'set_led_state' command."""
+        return self.overhead + 5 * self.per_byte
+
+    def range(self, num_leds):
+        """Cost of a single range write of 'num_leds' LEDs."""
+        return self.range_overhead + (6 + (num_leds + 6) // 7) * self.per_byte
+
+
+DEFAULT_COST = CommandCost()
+
+
+def plan_updates(current, target, changed=None, cost=None):
+    """Plan the cheapest list of commands turning 'current' into 'target'.
+
+    Args:
+        current: Frame currently shown on the device.
+        target: Frame that should be shown on the device.
+        changed (iterable of int, optional): LED IDs that may differ.
+            LEDs not listed are assumed equal. Defaults to all 120.
+        cost (:obj:`CommandCost`, optional): cost model to optimize.
+
+    Returns:
+        list of commands. Each command is either
+        (CMD_LED, state, ledID) or (CMD_RANGE, start_ledid, states_on_off),
+        matching the arguments of ATT26A.set_led_state and
+        ATT26A.set_led_range_state.
+    """
+    if cost is None:
+        cost = DEFAULT_COST
+    if changed is None:
+        changed = range(120)
+
+    cmds = []
+    main = set()
+    for i in changed:
+        if current[i] == target[i]:
+            continue
+        if i < 100 and target[i] in (LED_OFF, LED_ON):
+            main.add(i)
+        else:
+            cmds.append((CMD_LED, target[i], i))
+
+    if main:
+        cmds = _plan_main_grid(main, target, cost) + sorted(cmds, key=lambda c: c[2])
+    else:
+        cmds.sort(key=lambda c: c[2])
+    return cmds
+
+
+def _plan_main_grid(main, target, cost):
+    # LEDs a range write may pass over (they end up ON or OFF anyway).
+    spannable = [target[i] in (LED_OFF, LED_ON) for i in range(100)]
+
+    # Rotate the ring so no range has to cross the start. Right after
+    # a blocking LED is ideal; otherwise after the longest unchanged gap.
+    blockers = [i for i in range(100) if not spannable[i]]
+    if blockers:
+        start = (blockers[0] + 1) % 100
+    else:
+        ordered = sorted(main)
+        gaps = [((ordered[(k + 1) % len(ordered)] - ordered[k]) % 100, ordered[k])
+                for k in range(len(ordered))]
+        start = (max(gaps)[1] + 1) % 100
+    order = [(start + k) % 100 for k in range(100)]
+
+    cost_led = cost.led()
+    best = [0.0] * 101
+    choice = [None] * 101
+    candidates = [] # positions (0 based) of changed LEDs since last blocker
+    for k in range(1, 101):
+        p = order[k - 1]
+        if not spannable[p]:
+            candidates = []
+        if p not in main:
+            best[k] = best[k - 1]
+            continue
+
+        candidates.append(k - 1)
+        best[k] = best[k - 1] + cost_led
+        choice[k] = 0
+        for s in reversed(candidates):
+            length = k - s
+            if length > MAX_RANGE_LEN:
+                break
+            if length == 71:
+                continue
+            c = best[s] + cost.range(length)
+            if c < best[k]:
+                best[k] = c
+                choice[k] = length
+
+    cmds = []
+    k = 100
+    while k > 0:
+        length = choice[k]
+        if length is None:
+            k -= 1
+        elif length == 0:
+            p = order[k - 1]
+            cmds.append((CMD_LED, target[p], p))
+            k -= 1
+        else:
+            s = k - length
+            cmds.append((CMD_RANGE, order[s],
+                         [target[order[j]] == LED_ON for j in range(s, k)]))
+            k = s
+    cmds.reverse()
+    return cmds
+
+
+def apply_command(frame, cmd):
+    """Update 'frame' (a bytearray) the way the device applies 'cmd'."""
+    if cmd[0] == CMD_LED:
+        frame[cmd[2]] = cmd[1]
+    else:
+        start = cmd[1]
+        for i, val in enumerate(cmd[2]):
+            frame[(start + i) % 100] = LED_ON if val else LED_OFF
+
+
+def send_updates(driver, cmds, shown=None):
+    """Send commands produced by 'plan_updates' through an ATT26A driver.
+
+    Args:
+        driver (:obj:`att26a.ATT26A`): Driver to send the commands with.
+        cmds (list): Commands from 'plan_updates'.
+        shown (bytearray, optional): Frame updated after each command
+            the device acknowledged.
+    """
+    for cmd in cmds:
+        if cmd[0] == CMD_LED:
+            driver.set_led_state(cmd[1], cmd[2])
+        else:
+            driver.set_led_range_state(cmd[1], cmd[2])
+        if shown is not None:
+            apply_command(shown, cmd)
+
+
+def send_frame(driver, shown, target, cost=None):
+    """Bring the device from 'shown' to 'target' with the cheapest commands.
+
+    Plans are cached in the driver's frame cache (if it has one), so
+    frames repeated from the same starting point skip planning; the
+    commands themselves are also served from that cache. Without a
+    'cost', the driver's measured cost model is used if it has one.
+
+    Args:
+        driver (:obj:`att26a.ATT26A`): Driver to send the commands with.
+        shown (bytearray): Frame currently shown; updated after each
+            command the device acknowledged.
+        target: Frame that should be shown.
+        cost (:obj:`CommandCost`, optional): cost model to optimize.
+
+    Returns:
+        int: The number of commands sent.
+    """
+    if cost is None:
+        cost = getattr(driver, 'command_cost', None) or DEFAULT_COST
+    cache = getattr(driver, 'frame_cache', None)
+    if cache is None:
+        cmds = plan_updates(shown, target, cost=cost)
+    else:
+        key = ('frame', bytes(shown), bytes(target), cost.key)
+        cmds = cache.get(key)
+        if cmds is None:
+            cmds = plan_updates(shown, target, cost=cost)
+            cache.put(key, cmds, 240 + sum(len(cmd[2]) if cmd[0] == CMD_RANGE else 8
+                                           for cmd in cmds))
+    send_updates(driver, cmds, shown)
+    return len(cmds)
@@ -0,0 +1,143 @@
+"""Address the 26A's LEDs by their position on the panel.
+
+The panel is a grid of 10 columns and 12 rows. Row 0 is the top of the
+main 10x10 grid (LEDs 90-99), row 9 its bottom (LEDs 0-9), and rows 10
+and 11 are the two special rows below it (LEDs 100-109 and 110-119).
+Columns count from the left; LED IDs grow from left to right.
+
+A Grid draws rectangles, rows, columns and images on a console and
+sends each operation as the cheapest mix of range and single LED
+writes framediff can plan, spanning unchanged ON/OFF LEDs and wrapping
+past LED 99 where that saves commands:
+
+    g = grid.Grid(driver)
+    g.fill_rect(2, 2, 6, 6, att26a.LED_ON)
+    g.draw_col(0, att26a.LED_BLINK1)
+
+A drawing call never changes LEDs outside its shape: ranges only span
+LEDs whose mode the Grid knows, from its 'shown' frame, a valid
+journal, or earlier drawing.
+"""
+
+from . import LED_OFF, LED_MODES
+from . import framediff
+
+WIDTH = 10
+HEIGHT = 12
+MAIN_ROWS = 10
+
+UNKNOWN = 0xFF # Mode of LEDs whose state is not known; matches no mode.
+
+# LED IDs of every row, top to bottom.
+ROWS = [list(range(row * 10, row * 10 + 10)) for row in range(MAIN_ROWS - 1, -1, -1)] + \
+       [list(range(100, 110)), list(range(110, 120))]
+
+
+def led_id(x, y):
+    """ID of the LED in column 'x' of row 'y'."""
+    if not (0 <= x < WIDTH and 0 <= y < HEIGHT):
+        raise ValueError("(%d, %d) is not on the %dx%d panel." % (x, y, WIDTH, HEIGHT))
+    return ROWS[y][x]
+
+
+def position(ledID):
+    """(column, row) of LED 'ledID'."""
+    if ledID >= 120 or ledID < 0:
+        raise ValueError("ledID must be between 0 and 119; not %d." % ledID)
+    if ledID < 100:
+        return ledID % 10, MAIN_ROWS - 1 - ledID // 10
+    return ledID % 10, MAIN_ROWS + (ledID - 100) // 10
+
+
+def rect_ids(x, y, w, h):
+    """IDs of the LEDs in a rectangle, clipped to the panel."""
+    if w < 0 or h < 0:
+        raise ValueError("A rectangle can not be %dx%d." % (w, h))
+    return [ROWS[row][col] for row in range(max(y, 0), min(y + h, HEIGHT))
+            for col in range(max(x, 0), min(x + w, WIDTH))]
+
+
+def blit_modes(x, y, image):
+    """Map the LEDs covered by 'image' placed at ('x', 'y') to their modes.
+
+    'image' is a sequence of rows of modes; None is transparent.
+    Pixels off the panel are clipped.
+    """
+    modes = {}
+    for dy, line in enumerate(image):
+        row = y + dy
+        if not 0 <= row < HEIGHT:
+            continue
+        for dx, mode in enumerate(line):
+            col = x + dx
+            if mode is None or not 0 <= col < WIDTH:
+                continue
+            if mode not in LED_MODES:
+                raise ValueError("mode can either be 0x0, 0x8, 0xD, or 0xF, not %s" % hex(mode))
+            modes[ROWS[row][col]] = mode
+    return modes
+
+
+class Grid(object):
+    """Draw on a 26A in panel coordinates.
+
+    Args:
+        driver (:obj:`att26a.ATT26A`): Driver of the console to draw on.
+        shown (optional): Frame the console shows. Defaults to the
+            driver's journal if it is valid, else UNKNOWN for every LED
+            until it is drawn.
+        cost (:obj:`att26a.framediff.CommandCost`, optional): cost
+            model. Defaults to the driver's measured cost model, if any.
+    """
+
+    def __init__(self, driver, shown=None, cost=None):
+        self.driver = driver
+        if shown is None:
+            journal = getattr(driver, 'journal', None)
+            shown = journal.modes if journal is not None and journal.valid \
+                else bytes((UNKNOWN,)) * 120
+        self.shown = bytearray(shown)
+        self.cost = cost
+
+    def plan(self, modes):
+        """Commands that set the LEDs in 'modes' ({ledID: mode}), without sending them."""
+        target = bytearray(self.shown)
+        for ledID, mode in modes.items():
+            target[ledID] = mode
+        cost = self.cost or getattr(self.driver, 'command_cost', None)
+        return framediff.plan_updates(self.shown, target, modes.keys(), cost=cost)
+
+    def draw(self, modes):
+        """Set the LEDs in 'modes' ({ledID: mode}).
+
+        Returns:
+            int: The number of commands sent.
+        """
+        cmds = self.plan(modes)
+        framediff.send_updates(self.driver, cmds, self.shown)
+        return len(cmds)
+
+    def _fill(self, ids, mode):
+        if mode not in LED_MODES:
+            raise ValueError("mode can either be 0x0, 0x8, 0xD, or 0xF, not %s" % hex(mode))
+        return self.draw(dict.fromkeys(ids, mode))
+
+    def fill_rect(self, x, y, w, h, mode):
+        """Set every LED of a 'w' by 'h' rectangle with its top left at ('x', 'y')."""
+        return self._fill(rect_ids(x, y, w, h), mode)
+
+    def draw_row(self, y, mode, x=0, length=WIDTH):
+        """Set 'length' LEDs of row 'y', starting at column 'x'."""
+        return self._fill(rect_ids(x, y, length, 1), mode)
+
+    def draw_col(self, x, mode, y=0, length=HEIGHT):
+        """Set 'length' LEDs of column 'x', starting at row 'y'."""
+        return self._fill(rect_ids(x, y, 1, length), mode)
+
+    def blit(self, x, y, image):
+        """Draw 'image' (rows of modes, None transparent) with its top left at ('x', 'y')."""
+        return self.draw(blit_modes(x, y, image))
+
+    def clear(self, mode=LED_OFF):
+        """Set every LED to 'mode'."""
+        return self.fill_rect(0, 0, WIDTH, HEIGHT, mode)
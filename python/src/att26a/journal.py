@@ -0,0 +1,128 @@
+"""Persistent, memory mapped record of the LED state of a 26A.
+
+The driver updates the journal after every command the 26A
+acknowledges. Because the journal lives in a memory mapped file, it
+survives the driver's process exiting (or crashing), and lets a new
+process attach to a running console without resetting it.
+"""
+
+import mmap
+import os
+import struct
+
+from . import LED_OFF, LED_ON, LED_MODES
+
+_MAGIC = b'A26J'
+_VERSION = 1
+
+# magic, version, flags, reserved, sequence number
+_HEADER = struct.Struct('<4sBBHI')
+_SIZE = _HEADER.size + 120
+
+FLAG_VALID = 0x01
+FLAG_FACTORY_TEST = 0x02
+FLAG_IO_DISABLED = 0x04
+
+
+class LedStateJournal(object):
+    """Memory mapped record of the state last acknowledged by a 26A.
+
+    A journal is 'valid' once the driver reset the console it belongs
+    to; only a valid journal describes what the console is showing.
+    Files that are missing or not recognised are (re)initialized as
+    an invalid, all OFF journal.
+
+    Args:
+        path (str): Location of the journal file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size != _SIZE:
+                os.ftruncate(fd, _SIZE)
+            self.__map = mmap.mmap(fd, _SIZE)
+        finally:
+            os.close(fd)
+
+        magic, version, flags, _, _ = _HEADER.unpack_from(self.__map)
+        if magic != _MAGIC or version != _VERSION or \
+           any(b not in LED_MODES for b in self.__map[_HEADER.size:]):
+            self.__map[:] = bytes(_SIZE)
+            _HEADER.pack_into(self.__map, 0, _MAGIC, _VERSION, 0, 0, 0)
+
+    def close(self):
+        if not self.__map.closed:
+            self.__map.flush()
+            self.__map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __flags(self):
+        return self.__map[5]
+
+    def __set_flag(self, flag, value):
+        if value:
+            self.__map[5] |= flag
+        else:
+            self.__map[5] &= ~flag & 0xFF
+        self.__bump()
+
+    def __bump(self):
+        seq, = struct.unpack_from('<I', self.__map, 8)
+        struct.pack_into('<I', self.__map, 8, (seq + 1) & 0xFFFFFFFF)
+
+    @property
+    def valid(self):
+        """True if the journal describes the console's current state."""
+        return bool(self.__flags() & FLAG_VALID)
+
+    @property
+    def sequence(self):
+        """Number of updates recorded (wraps at 2**32)."""
+        return struct.unpack_from('<I', self.__map, 8)[0]
+
+    @property
+    def modes(self):
+        """Copy of the 120 recorded LED modes."""
+        return bytes(self.__map[_HEADER.size:])
+
+    @property
+    def factory_test(self):
+        return bool(self.__flags() & FLAG_FACTORY_TEST)
+
+    @property
+    def io_enabled(self):
+        return not self.__flags() & FLAG_IO_DISABLED
+
+    def get_led_state(self, ledID):
+        return self.__map[_HEADER.size + ledID]
+
+    def record_reset(self):
+        """Record a power on reset: everything OFF, IO on, factory test off."""
+        self.__map[_HEADER.size:] = bytes(120)
+        self.__map[5] = FLAG_VALID
+        self.__bump()
+
+    def invalidate(self):
+        self.__set_flag(FLAG_VALID, False)
+
+    def record_led_state(self, state, ledID):
+        self.__map[_HEADER.size + ledID] = state
+        self.__bump()
+
+    def record_led_range_state(self, start_ledid, states_on_off):
+        for i, val in enumerate(states_on_off):
+            self.__map[_HEADER.size + (start_ledid + i) % 100] = LED_ON if val else LED_OFF
+        self.__bump()
+
+    def record_factory_test_mode_enable(self, enable):
+        self.__set_flag(FLAG_FACTORY_TEST, enable)
+
+    def record_IO_enable(self, enable):
+        self.__set_flag(FLAG_IO_DISABLED, not enable)
@@ -0,0 +1,173 @@
+"""Track the 26A's scan clock through its keep-alive messages.
+
+The 26A sends a keep-alive (0xFF) every 240 ticks of its display scan
+timer, about every 26 ms. The driver timestamps each one on arrival,
+and a KeepAliveClock follows their period and phase on the host's
+monotonic clock with a second order phase locked loop. Writes can then
+be started at a consistent point of the device's cycle (right after a
+keep-alive) instead of at a random one.
+
+Keep-alives only ever arrive late (USB adapters deliver bytes in
+batches, the host schedules the receiver thread late), so arrivals
+much later than predicted are counted as latency spikes and do not
+move the estimate. Early arrivals, or late ones that persist, mean the
+phase moved (e.g. the console was reset) and make the loop relock.
+"""
+
+import threading
+import time
+
+NOMINAL_PERIOD = 0.026
+
+
+class KeepAliveClock(object):
+    """Period and phase estimate of a 26A's keep-alives.
+
+    Args:
+        nominal_period (float): Expected seconds between keep-alives.
+        phase_gain (float): Fraction of each timing error applied to
+            the phase estimate.
+        period_gain (float): Fraction of each timing error applied to
+            the period estimate.
+        spike (float): Seconds an arrival may be later than predicted
+            before it counts as a latency spike.
+        lock_after (int): Consecutive accepted keep-alives needed
+            before the estimate is trusted.
+    """
+
+    def __init__(self, nominal_period=NOMINAL_PERIOD, *, phase_gain=0.1, period_gain=0.01,
+                 spike=0.003, lock_after=8):
+        self.nominal_period = nominal_period
+        self.phase_gain = phase_gain
+        self.period_gain = period_gain
+        self.spike = spike
+        self.lock_after = lock_after
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Forget the estimate (e.g. because the console was reset)."""
+        with self._lock:
+            self._period = self.nominal_period
+            self._phase = None  # Predicted time of the last keep-alive
+            self._streak = 0
+            self._rejected = 0
+            self.received = 0
+            self.missed = 0
+            self.spikes = 0
+            self.max_spike = 0.0
+            self.relocks = 0
+            self.jitter = 0.0   # Smoothed absolute timing error
+            self.last = None    # Arrival time of the last keep-alive
+
+    def observe(self, stamp):
+        """Feed the arrival time (time.monotonic()) of a keep-alive."""
+        with self._lock:
+            self.received += 1
+            self.last = stamp
+            if self._phase is None:
+                self._phase = stamp
+                return
+
+            periods = max(int(round((stamp - self._phase) / self._period)), 1)
+            error = stamp - (self._phase + periods * self._period)
+            self._phase += periods * self._period
+            if self._streak:
+                self.missed += periods - 1
+
+            if abs(error) > self.spike:
+                locked = self._streak >= self.lock_after
+                if error > 0 and locked:
+                    self.spikes += 1
+                    self.max_spike = max(self.max_spike, error)
+                self._rejected += 1
+                # Early arrivals can not be explained by latency, and
+                # spikes do not last long: either way the phase moved.
+                if not locked or self._rejected >= (2 if error < 0 else 8):
+                    if self._streak:
+                        self.relocks += 1
+                    self._phase = stamp
+                    self._period = self.nominal_period
+                    self._streak = 0
+                    self._rejected = 0
+                return
+
+            self._rejected = 0
+            self._streak += 1
+            self._phase += self.phase_gain * error
+            self._period += self.period_gain * error / periods
+            self.jitter += 0.0625 * (abs(error) - self.jitter)
+
+    @property
+    def locked(self):
+        """True once the estimate followed enough keep-alives."""
+        return self._streak >= self.lock_after
+
+    @property
+    def period(self):
+        """Estimated seconds between keep-alives."""
+        return self._period
+
+    @property
+    def drift_ppm(self):
+        """Deviation of the estimated period from the nominal one, in ppm.
+
+        Includes the difference between the console's crystal and the
+        host's clock.
+        """
+        return (self._period / self.nominal_period - 1.0) * 1e6
+
+    def next_keepalive(self, now=None):
+        """Predicted host time of the first keep-alive after 'now', or None."""
+        with self._lock:
+            if self._phase is None:
+                return None
+            phase, period = self._phase, self._period
+        if now is None:
+            now = time.monotonic()
+        if now < phase:
+            return phase
+        return phase + (int((now - phase) / period) + 1) * period
+
+    def window_start(self, offset=0.001, width=0.005, now=None):
+        """Host time at which a write in the phase window can start.
+
+        The window opens 'offset' seconds after a keep-alive and is
+        'width' seconds long. Returns 'now' while inside a window (or
+        while not locked), else the opening of the next one.
+        """
+        if now is None:
+            now = time.monotonic()
+        if not self.locked:
+            return now
+        last = self.next_keepalive(now) - self._period
+        if last + offset <= now <= last + offset + width:
+            return now
+        if now < last + offset:
+            return last + offset
+        return last + self._period + offset
+
+    def wait_window(self, offset=0.001, width=0.005):
+        """Sleep until the next phase window (see window_start).
+
+        Returns:
+            float: Seconds slept.
+        """
+        now = time.monotonic()
+        delay = self.window_start(offset, width, now) - now
+        if delay > 0:
+            time.sleep(delay)
+            return delay
+        return 0.0
+
+    def stats(self):
+        """Metrics of the clock, suitable for reports."""
+        return {'locked': self.locked, 'period_ms': self._period * 1000.0,
+                'drift_ppm': self.drift_ppm, 'jitter_ms': self.jitter * 1000.0,
+                'received': self.received, 'missed': self.missed, 'spikes': self.spikes,
+                'max_spike_ms': self.max_spike * 1000.0, 'relocks': self.relocks}
+
+    def __repr__(self):
+        return "<KeepAliveClock period=%.4fms drift=%.0fppm jitter=%.3fms %s>" % (
+            self._period * 1000, self.drift_ppm, self.jitter * 1000,
+            "locked" if self.locked else "unlocked")
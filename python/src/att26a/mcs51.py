@@ -0,0 +1,1043 @@
+"""Instruction set emulator of the Intel 8051 (MCS-51) microcontroller.
+
+Emulates the 80C51 core far enough to run the 26A's firmware: the full
+instruction set, both register banks' worth of internal RAM, timers 0
+and 1, the UART and the two level interrupt system. Every instruction
+is predecoded into a closure with its operands bound, so executing it
+is a single call, and instructions are timed in machine cycles (12
+oscillator periods each).
+
+Peripherals are evaluated lazily: timers are brought up to date when
+they are read or written, or when one of them is due to overflow, and
+the main loop only leaves its fast path when the next such event is
+reached. Loops that spin on a bit until an interrupt changes it are
+skipped to the next event.
+"""
+
+import collections
+import logging
+
+# SFR addresses.
+P0 = 0x80
+SP = 0x81
+DPL = 0x82
+DPH = 0x83
+PCON = 0x87
+TCON = 0x88
+TMOD = 0x89
+TL0 = 0x8A
+TL1 = 0x8B
+TH0 = 0x8C
+TH1 = 0x8D
+P1 = 0x90
+SCON = 0x98
+SBUF = 0x99
+P2 = 0xA0
+IE = 0xA8
+P3 = 0xB0
+IP = 0xB8
+PSW = 0xD0
+ACC = 0xE0
+B = 0xF0
+
+PORTS = (P0, P1, P2, P3)
+
+# Interrupt sources in polling order: (vector, IE/IP bit).
+_IRQ_EXT0, _IRQ_TIMER0, _IRQ_EXT1, _IRQ_TIMER1, _IRQ_SERIAL = range(5)
+_VECTORS = (0x03, 0x0B, 0x13, 0x1B, 0x23)
+
+_PARITY = bytes(bin(v).count('1') & 1 for v in range(256))
+
+# Instruction lengths and machine cycles by opcode.
+_LENGTH = bytearray(256)
+_CYCLES = bytearray(256)
+for _op in range(256):
+    if _op in (0x02, 0x12, 0x10, 0x20, 0x30, 0x43, 0x53, 0x63, 0x75, 0x85, 0x90, 0xD5) or \
+       0xB4 <= _op <= 0xBF:
+        _LENGTH[_op] = 3
+    elif _op & 0x1F == 0x01 or _op & 0x1F == 0x11 or \
+         _op in (0x05, 0x15, 0x24, 0x25, 0x34, 0x35, 0x40, 0x42, 0x44, 0x45, 0x50, 0x52,
+                 0x54, 0x55, 0x60, 0x62, 0x64, 0x65, 0x70, 0x72, 0x74, 0x76, 0x77, 0x80,
+                 0x82, 0x86, 0x87, 0x92, 0x94, 0x95, 0xA0, 0xA2, 0xA6, 0xA7, 0xB0, 0xB2,
+                 0xC0, 0xC2, 0xC5, 0xD0, 0xD2, 0xE5, 0xF5) or \
+         0x78 <= _op <= 0x7F or 0x88 <= _op <= 0x8F or 0xA8 <= _op <= 0xAF or \
+         0xD8 <= _op <= 0xDF:
+        _LENGTH[_op] = 2
+    else:
+        _LENGTH[_op] = 1
+
+    if _op in (0x84, 0xA4):
+        _CYCLES[_op] = 4
+    elif _op & 0x0F == 0x01 or \
+         _op in (0x02, 0x12, 0x10, 0x20, 0x30, 0x40, 0x50, 0x60, 0x70, 0x80, 0x22, 0x32,
+                 0x43, 0x53, 0x63, 0x72, 0x73, 0x75, 0x82, 0x83, 0x85, 0x86, 0x87, 0x90,
+                 0x92, 0x93, 0xA0, 0xA3, 0xA6, 0xA7, 0xB0, 0xC0, 0xD0, 0xD5, 0xE0, 0xE2,
+                 0xE3, 0xF0, 0xF2, 0xF3) or \
+         0x88 <= _op <= 0x8F or 0xA8 <= _op <= 0xAF or 0xB4 <= _op <= 0xBF or \
+         0xD8 <= _op <= 0xDF:
+        _CYCLES[_op] = 2
+    else:
+        _CYCLES[_op] = 1
+del _op
+
+
+class MCS51(object):
+    """An 80C51 running a code image.
+
+    Args:
+        code (bytes): Program memory image; addresses past its end read
+            as 0xFF.
+        clock (int): Oscillator frequency in Hz.
+        log (:obj:`logging.Logger`, optional): logging object.
+
+    Attributes:
+        cycles (int): Machine cycles executed since the last reset.
+        port_input (list): Levels driven onto the pins of P0-P3 from
+            outside. A pin reads high only if both its latch and its
+            input are high.
+        on_port_write: Called as f(port, value, cycles) when the latch of
+            P0 (0) to P3 (3) is written.
+        on_tx: Called as f(byte, bit8, cycles) when the UART finished
+            sending a byte; bit8 is the 9th (parity) bit in modes 2
+            and 3.
+        on_rx_read: Called as f(byte, cycles) when the program reads a
+            received byte from SBUF.
+        on_interrupt: Called as f(vector, cycles) when an interrupt is
+            taken.
+        on_reti: Called as f(cycles) when an interrupt routine returns.
+        on_instruction: If set, called as f(pc, cycles) before each
+            instruction; slows the emulator down considerably.
+    """
+
+    def __init__(self, code, clock=12000000, log=None):
+        self._log = logging.getLogger('mcs51') if not log else log
+        self.code = bytes(code) + b'\xFF' * (0x10000 - len(code))
+        self.clock = clock
+        self.iram = bytearray(256)
+        self.sfr = bytearray(256)
+        self.xram = bytearray(0x10000)
+        self.port_input = [0xFF] * 4
+        self.on_port_write = None
+        self.on_tx = None
+        self.on_rx_read = None
+        self.on_interrupt = None
+        self.on_reti = None
+        self.on_instruction = None
+
+        # Machine cycles of one pass through each idle loop, by address.
+        self._spin_cycles = {}
+        # Instructions in the image are decoded up front, anything else
+        # the first time it runs.
+        self._ops = [self._decode(pc) for pc in range(len(code))] + \
+                    [self._lazy_decoder(pc) for pc in range(len(code), 0x10000)]
+        self._op_cycles = bytearray(_CYCLES[b] for b in self.code)
+        self._rx_pending = collections.deque()
+        self.reset()
+
+    @property
+    def cycle_time(self):
+        """Seconds per machine cycle."""
+        return 12.0 / self.clock
+
+    def reset(self):
+        """Apply the reset line: registers to their reset values, PC to 0.
+
+        Internal RAM keeps its contents, like it does on the chip.
+        """
+        sfr = self.sfr
+        sfr[:] = bytes(256)
+        for port in PORTS:
+            sfr[port] = 0xFF
+        sfr[SP] = 0x07
+        self.pc = 0
+        self.cycles = 0
+        self._next_event = 0
+        self._isr_levels = []
+        self._timer_sync = [0, 0]
+        self._timer_next = [None, None]
+        self._sbuf_rx = 0
+        self._tx_queue = collections.deque()
+        self._rx_pending.clear()
+        self._rx_next = None
+        self._rx_last = 0
+        self._irq_hold = False
+        self.rx_overruns = 0
+
+    # -------------------------------------------------------------------
+    # Execution
+
+    def run(self, cycles):
+        """Execute instructions for at least 'cycles' machine cycles."""
+        ops = self._ops
+        opcyc = self._op_cycles
+        end = self.cycles + cycles
+        pc = self.pc
+        trace = self.on_instruction
+        self._end = end
+        if end < self._next_event:
+            self._next_event = end
+        while True:
+            if trace is not None:
+                trace(pc, self.cycles)
+            self.cycles += opcyc[pc]
+            pc = ops[pc]()
+            if pc < 0 or self.cycles >= self._next_event:
+                if pc < 0:
+                    pc = ~pc
+                    # Spinning until an interrupt: skip to the next event.
+                    spin = self._spin_cycles[pc]
+                    self.cycles += max(self._next_event - self.cycles + spin - 1, 0) \
+                        // spin * spin
+                pc = self._events(pc)
+                if self.cycles >= end:
+                    break
+        self.pc = pc
+
+    def step(self):
+        """Execute a single instruction."""
+        self.run(1)
+
+    def _events(self, pc):
+        """Bring the peripherals up to date and take pending interrupts."""
+        now = self.cycles
+        self._sync_timer(0, now)
+        self._sync_timer(1, now)
+        self._serial_events(now)
+        hold = self._irq_hold
+        pc = self._interrupt(pc)
+
+        # After RETI at least one more instruction runs before the next
+        # interrupt is taken.
+        nxt = now + 1 if hold else self._end
+        for t in self._timer_next:
+            if t is not None and t < nxt:
+                nxt = t
+        if self._tx_queue and self._tx_queue[0][0] < nxt:
+            nxt = self._tx_queue[0][0]
+        if self._rx_next is not None and self._rx_next < nxt:
+            nxt = self._rx_next
+        self._next_event = max(nxt, now + 1)
+        return pc
+
+    def _interrupt(self, pc):
+        if self._irq_hold:
+            self._irq_hold = False
+            return pc
+        sfr = self.sfr
+        ie = sfr[IE]
+        if not ie & 0x80:
+            return pc
+        tcon = sfr[TCON]
+        scon = sfr[SCON]
+        flags = ((tcon >> 1) & 1, (tcon >> 5) & 1, (tcon >> 3) & 1, (tcon >> 7) & 1,
+                 1 if scon & 0x03 else 0)
+        level = self._isr_levels[-1] if self._isr_levels else -1
+        ip = sfr[IP]
+        chosen = None
+        for prio in (1, 0):
+            if prio <= level:
+                break
+            for src in range(5):
+                if flags[src] and ie & (1 << src) and ((ip >> src) & 1) == prio:
+                    chosen = src
+                    break
+            if chosen is not None:
+                break
+        if chosen is None:
+            return pc
+        prio = (ip >> chosen) & 1
+        if chosen == _IRQ_TIMER0:
+            sfr[TCON] &= ~0x20
+        elif chosen == _IRQ_TIMER1:
+            sfr[TCON] &= ~0x80
+        elif chosen == _IRQ_EXT0 and tcon & 0x01:
+            sfr[TCON] &= ~0x02
+        elif chosen == _IRQ_EXT1 and tcon & 0x04:
+            sfr[TCON] &= ~0x08
+        self._isr_levels.append(prio)
+        self._push(pc & 0xFF)
+        self._push(pc >> 8)
+        self.cycles += 2 # The hardware generated LCALL.
+        if self.on_interrupt is not None:
+            self.on_interrupt(_VECTORS[chosen], self.cycles)
+        return _VECTORS[chosen]
+
+    def _push(self, value):
+        sp = (self.sfr[SP] + 1) & 0xFF
+        self.sfr[SP] = sp
+        self.iram[sp] = value
+
+    def _pop(self):
+        sp = self.sfr[SP]
+        self.sfr[SP] = (sp - 1) & 0xFF
+        return self.iram[sp]
+
+    def _reti(self):
+        if self._isr_levels:
+            self._isr_levels.pop()
+        self._irq_hold = True
+        self._next_event = 0 # Pending interrupts may be taken soon.
+        if self.on_reti is not None:
+            self.on_reti(self.cycles)
+
+    # -------------------------------------------------------------------
+    # Timers
+
+    def _timer_running(self, n):
+        tcon = self.sfr[TCON]
+        tmod = self.sfr[TMOD] >> (4 * n)
+        if n == 1 and self.sfr[TMOD] & 0x03 == 0x03:
+            # Timer 0 in mode 3 borrows TR1 and TF1.
+            return False
+        if not tcon & (0x10 << (2 * n)) or tmod & 0x04:
+            return False # Stopped, or counting external pulses.
+        if tmod & 0x08 and not self._read_port(P3) & (0x04 << n):
+            return False # Gated by INTn.
+        return True
+
+    def _sync_timer(self, n, now):
+        """Advance timer 'n' to 'now' and schedule its next overflow."""
+        elapsed = now - self._timer_sync[n]
+        self._timer_sync[n] = now
+        self._timer_next[n] = None
+        if not self._timer_running(n):
+            if n == 0 and self.sfr[TMOD] & 0x03 == 0x03:
+                self._sync_split_th0(elapsed)
+            return
+        sfr = self.sfr
+        tl, th = (TL0, TH0) if n == 0 else (TL1, TH1)
+        tf = 0x20 if n == 0 else 0x80
+        mode = (sfr[TMOD] >> (4 * n)) & 0x03
+        if mode == 2 or mode == 3:
+            if mode == 3:
+                self._sync_split_th0(elapsed)
+            reload = th if mode == 2 else None
+            value = sfr[tl] + elapsed
+            if value >= 256:
+                sfr[TCON] |= tf
+                period = 256 - sfr[reload] if reload is not None else 256
+                value = (sfr[reload] if reload is not None else 0) + (value - 256) % period
+            sfr[tl] = value
+            # Timer 1 as a baud rate generator overflows too often to
+            # track every overflow; its flag is only kept up to date.
+            if n == 0 or sfr[IE] & 0x88 == 0x88:
+                self._timer_next[n] = now + 256 - value
+            return
+        if mode == 0:
+            value = (sfr[th] << 5 | (sfr[tl] & 0x1F)) + elapsed
+            size = 0x2000
+        else:
+            value = (sfr[th] << 8 | sfr[tl]) + elapsed
+            size = 0x10000
+        if value >= size:
+            sfr[TCON] |= tf
+            value %= size
+        if mode == 0:
+            sfr[th] = value >> 5
+            sfr[tl] = (sfr[tl] & 0xE0) | (value & 0x1F)
+        else:
+            sfr[th] = value >> 8
+            sfr[tl] = value & 0xFF
+        self._timer_next[n] = now + size - value
+
+    def _sync_split_th0(self, elapsed):
+        # In mode 3, TH0 is an 8 bit timer run by TR1 that sets TF1.
+        sfr = self.sfr
+        if sfr[TCON] & 0x40:
+            value = sfr[TH0] + elapsed
+            if value >= 256:
+                sfr[TCON] |= 0x80
+            sfr[TH0] = value & 0xFF
+
+    def _timer1_overflow_cycles(self):
+        """Machine cycles between timer 1 overflows, as used by the UART."""
+        sfr = self.sfr
+        mode = (sfr[TMOD] >> 4) & 0x03
+        if mode == 2:
+            return 256 - sfr[TH1]
+        if mode == 1:
+            return 0x10000 - (sfr[TH1] << 8 | sfr[TL1])
+        if mode == 0:
+            return 0x2000 - (sfr[TH1] << 5 | (sfr[TL1] & 0x1F))
+        return 256
+
+    # -------------------------------------------------------------------
+    # UART
+
+    def byte_cycles(self):
+        """Machine cycles the UART takes to shift one byte in its current mode."""
+        sfr = self.sfr
+        mode = sfr[SCON] >> 6
+        smod = sfr[PCON] >> 7
+        if mode == 0:
+            return 8
+        if mode == 2:
+            return 11 * (64 >> smod) // 12
+        bits = 10 if mode == 1 else 11
+        return bits * (32 >> smod) * self._timer1_overflow_cycles()
+
+    def receive(self, data, at=None):
+        """Queue bytes arriving on RXD.
+
+        May be called from any thread. The bytes arrive back to back,
+        one byte time apart, starting no earlier than cycle 'at' (by
+        default the current cycle count).
+        """
+        stamp = self.cycles if at is None else at
+        for b in data:
+            self._rx_pending.append((stamp, b))
+        self._next_event = 0
+
+    @property
+    def rx_waiting(self):
+        """Bytes queued by receive() that have not arrived yet."""
+        return len(self._rx_pending) + (self._rx_next is not None)
+
+    def _serial_events(self, now):
+        sfr = self.sfr
+        txq = self._tx_queue
+        while txq and txq[0][0] <= now:
+            _, byte, bit8 = txq.popleft()
+            sfr[SCON] |= 0x02 # TI
+            if self.on_tx is not None:
+                self.on_tx(byte, bit8, now)
+        while True:
+            if self._rx_next is None:
+                if not self._rx_pending:
+                    break
+                stamp, byte = self._rx_pending[0]
+                self._rx_next = max(stamp, self._rx_last) + self.byte_cycles()
+            if self._rx_next > now:
+                break
+            stamp, byte = self._rx_pending.popleft()
+            self._rx_last = self._rx_next
+            self._rx_next = None
+            scon = sfr[SCON]
+            if not scon & 0x10:
+                continue # Receiver disabled.
+            if scon & 0x01:
+                self.rx_overruns += 1
+                continue
+            # The 26A line uses odd parity, received as the 9th bit.
+            rb8 = 0 if _PARITY[byte] else 0x04
+            if scon & 0x20 and not rb8:
+                continue # Multiprocessor mode ignores data bytes.
+            self._sbuf_rx = byte
+            sfr[SCON] = (scon & ~0x04) | rb8 | 0x01
+
+    def _write_sbuf(self, value):
+        sfr = self.sfr
+        start = max(self.cycles, self._tx_queue[-1][0] if self._tx_queue else 0)
+        self._tx_queue.append((start + self.byte_cycles(), value, (sfr[SCON] >> 3) & 1))
+        self._next_event = 0
+
+    # -------------------------------------------------------------------
+    # Memory
+
+    def _read_port(self, port):
+        return self.sfr[port] & self.port_input[(port >> 4) - 8]
+
+    def read_direct(self, addr):
+        """Read a directly addressed byte the way MOV A,direct does."""
+        if addr < 0x80:
+            return self.iram[addr]
+        if addr in (P0, P1, P2, P3):
+            return self._read_port(addr)
+        if addr == PSW:
+            return (self.sfr[PSW] & 0xFE) | _PARITY[self.sfr[ACC]]
+        if addr == SBUF:
+            if self.on_rx_read is not None:
+                self.on_rx_read(self._sbuf_rx, self.cycles)
+            return self._sbuf_rx
+        if addr in (TCON, TL0, TH0, TL1, TH1):
+            self._sync_timer(0, self.cycles)
+            self._sync_timer(1, self.cycles)
+        return self.sfr[addr]
+
+    def _read_latch(self, addr):
+        """Read for read-modify-write instructions: ports return their latch."""
+        if addr in (P0, P1, P2, P3):
+            return self.sfr[addr]
+        return self.read_direct(addr)
+
+    def write_direct(self, addr, value):
+        if addr < 0x80:
+            self.iram[addr] = value
+            return
+        sfr = self.sfr
+        if addr == SBUF:
+            self._write_sbuf(value)
+            return
+        if addr in (TCON, TMOD, TL0, TH0, TL1, TH1):
+            self._sync_timer(0, self.cycles)
+            self._sync_timer(1, self.cycles)
+            sfr[addr] = value
+            # Restart the timers' bookkeeping with the new settings.
+            self._sync_timer(0, self.cycles)
+            self._sync_timer(1, self.cycles)
+            self._next_event = 0
+            return
+        sfr[addr] = value
+        if addr in (P0, P1, P2, P3):
+            if self.on_port_write is not None:
+                self.on_port_write((addr >> 4) - 8, value, self.cycles)
+        elif addr in (IE, IP, SCON, PCON):
+            self._next_event = 0
+
+    # -------------------------------------------------------------------
+    # Decoding
+
+    def _lazy_decoder(self, pc):
+        def decode_and_run():
+            fn = self._ops[pc] = self._decode(pc)
+            return fn()
+        return decode_and_run
+
+    def _getter(self, addr, latch=False):
+        """Closure reading direct address 'addr'."""
+        iram, sfr = self.iram, self.sfr
+        if addr < 0x80:
+            return lambda: iram[addr]
+        if addr in (P0, P1, P2, P3, PSW, SBUF, TCON, TL0, TH0, TL1, TH1):
+            read = self._read_latch if latch else self.read_direct
+            return lambda: read(addr)
+        return lambda: sfr[addr]
+
+    def _setter(self, addr):
+        """Closure writing direct address 'addr'."""
+        iram = self.iram
+        if addr < 0x80:
+            def set_iram(v):
+                iram[addr] = v
+            return set_iram
+        if addr in (ACC, B, SP, DPL, DPH, PSW):
+            sfr = self.sfr
+            def set_sfr(v):
+                sfr[addr] = v
+            return set_sfr
+        write = self.write_direct
+        return lambda v: write(addr, v)
+
+    def _bit_getter(self, bit, latch=False):
+        if bit < 0x80:
+            iram, addr, mask = self.iram, 0x20 + (bit >> 3), 1 << (bit & 7)
+            return lambda: 1 if iram[addr] & mask else 0
+        get, mask = self._getter(bit & 0xF8, latch), 1 << (bit & 7)
+        return lambda: 1 if get() & mask else 0
+
+    def _bit_setter(self, bit):
+        mask = 1 << (bit & 7)
+        if bit < 0x80:
+            iram, addr = self.iram, 0x20 + (bit >> 3)
+            def set_iram_bit(v):
+                if v:
+                    iram[addr] |= mask
+                else:
+                    iram[addr] &= ~mask
+            return set_iram_bit
+        addr = bit & 0xF8
+        get, put = self._getter(addr, latch=True), self._setter(addr)
+        return lambda v: put(get() | mask if v else get() & ~mask)
+
+    def _idle_loop(self, pc, dest):
+        """Return ~dest if jumping from 'pc' back to 'dest' spins on NOPs."""
+        if dest > pc or any(self.code[dest:pc]):
+            return dest
+        self._spin_cycles[dest] = (pc - dest) + _CYCLES[self.code[pc]]
+        return ~dest
+
+    def _decode(self, pc):
+        """Build the closure executing the instruction at 'pc'.
+
+        Every closure returns the address of the next instruction, or
+        its one's complement if the instruction is a loop waiting on
+        itself for an interrupt.
+        """
+        code, iram, sfr = self.code, self.iram, self.sfr
+        op = code[pc]
+        length = _LENGTH[op]
+        nxt = (pc + length) & 0xFFFF
+        a1 = code[(pc + 1) & 0xFFFF]
+        a2 = code[(pc + 2) & 0xFFFF]
+        rel1 = (nxt + (a1 - 256 if a1 > 127 else a1)) & 0xFFFF
+        rel2 = (nxt + (a2 - 256 if a2 > 127 else a2)) & 0xFFFF
+        lo = op & 0x0F
+        hi = op & 0xF0
+        n = op & 0x07
+        i = op & 0x01
+        push, pop = self._push, self._pop
+
+        # Operand accessors for the regular ALU columns (x4: #imm,
+        # x5: direct, x6-x7: @Ri, x8-xF: Rn).
+        def source():
+            if lo == 4:
+                return lambda: a1
+            if lo == 5:
+                return self._getter(a1)
+            if lo in (6, 7):
+                return lambda: iram[iram[(sfr[PSW] & 0x18) | i]]
+            return lambda: iram[(sfr[PSW] & 0x18) | n]
+
+        def target():
+            """(getter, setter) of the operand of INC/DEC/XCH/MOV columns."""
+            if lo == 5:
+                return self._getter(a1, latch=True), self._setter(a1)
+            if lo in (6, 7):
+                def get_ind():
+                    return iram[iram[(sfr[PSW] & 0x18) | i]]
+                def set_ind(v):
+                    iram[iram[(sfr[PSW] & 0x18) | i]] = v
+                return get_ind, set_ind
+            def get_reg():
+                return iram[(sfr[PSW] & 0x18) | n]
+            def set_reg(v):
+                iram[(sfr[PSW] & 0x18) | n] = v
+            return get_reg, set_reg
+
+        if op == 0x00: # NOP
+            return lambda: nxt
+
+        if op & 0x1F == 0x01: # AJMP addr11
+            dest = self._idle_loop(pc, (nxt & 0xF800) | ((op & 0xE0) << 3) | a1)
+            return lambda: dest
+        if op & 0x1F == 0x11: # ACALL addr11
+            dest = (nxt & 0xF800) | ((op & 0xE0) << 3) | a1
+            def acall():
+                push(nxt & 0xFF)
+                push(nxt >> 8)
+                return dest
+            return acall
+        if op == 0x02: # LJMP addr16
+            dest = self._idle_loop(pc, a1 << 8 | a2)
+            return lambda: dest
+        if op == 0x12: # LCALL addr16
+            dest = a1 << 8 | a2
+            def lcall():
+                push(nxt & 0xFF)
+                push(nxt >> 8)
+                return dest
+            return lcall
+        if op == 0x22 or op == 0x32: # RET, RETI
+            reti = self._reti if op == 0x32 else None
+            def ret():
+                hi_ = pop()
+                if reti is not None:
+                    reti()
+                return hi_ << 8 | pop()
+            return ret
+        if op == 0x73: # JMP @A+DPTR
+            return lambda: (sfr[ACC] + (sfr[DPH] << 8 | sfr[DPL])) & 0xFFFF
+        if op == 0x80: # SJMP rel
+            dest = self._idle_loop(pc, rel1)
+            return lambda: dest
+
+        if op == 0x03: # RR A
+            def rr():
+                a = sfr[ACC]
+                sfr[ACC] = (a >> 1) | ((a & 1) << 7)
+                return nxt
+            return rr
+        if op == 0x13: # RRC A
+            def rrc():
+                a = sfr[ACC]
+                psw = sfr[PSW]
+                sfr[ACC] = (a >> 1) | (psw & 0x80)
+                sfr[PSW] = (psw & 0x7F) | ((a & 1) << 7)
+                return nxt
+            return rrc
+        if op == 0x23: # RL A
+            def rl():
+                a = sfr[ACC]
+                sfr[ACC] = ((a << 1) & 0xFF) | (a >> 7)
+                return nxt
+            return rl
+        if op == 0x33: # RLC A
+            def rlc():
+                a = sfr[ACC]
+                psw = sfr[PSW]
+                sfr[ACC] = ((a << 1) & 0xFF) | (psw >> 7)
+                sfr[PSW] = (psw & 0x7F) | (a & 0x80)
+                return nxt
+            return rlc
+        if op == 0xC4: # SWAP A
+            def swap():
+                a = sfr[ACC]
+                sfr[ACC] = ((a << 4) & 0xF0) | (a >> 4)
+                return nxt
+            return swap
+        if op == 0xE4: # CLR A
+            def clr_a():
+                sfr[ACC] = 0
+                return nxt
+            return clr_a
+        if op == 0xF4: # CPL A
+            def cpl_a():
+                sfr[ACC] ^= 0xFF
+                return nxt
+            return cpl_a
+        if op == 0xD4: # DA A
+            def da():
+                a = sfr[ACC]
+                psw = sfr[PSW]
+                if (a & 0x0F) > 9 or psw & 0x40:
+                    a += 6
+                    if a > 0xFF:
+                        psw |= 0x80
+                if (a & 0x1F0) > 0x90 or psw & 0x80:
+                    a += 0x60
+                    if a > 0xFF:
+                        psw |= 0x80
+                sfr[ACC] = a & 0xFF
+                sfr[PSW] = psw
+                return nxt
+            return da
+        if op == 0x84: # DIV AB
+            def div():
+                a, b = sfr[ACC], sfr[B]
+                psw = sfr[PSW] & 0x7B
+                if b == 0:
+                    sfr[PSW] = psw | 0x04
+                else:
+                    sfr[ACC], sfr[B] = divmod(a, b)
+                    sfr[PSW] = psw
+                return nxt
+            return div
+        if op == 0xA4: # MUL AB
+            def mul():
+                r = sfr[ACC] * sfr[B]
+                sfr[ACC] = r & 0xFF
+                sfr[B] = r >> 8
+                sfr[PSW] = (sfr[PSW] & 0x7B) | (0x04 if r > 0xFF else 0)
+                return nxt
+            return mul
+
+        if op == 0x04: # INC A
+            def inc_a():
+                sfr[ACC] = (sfr[ACC] + 1) & 0xFF
+                return nxt
+            return inc_a
+        if op == 0x14: # DEC A
+            def dec_a():
+                sfr[ACC] = (sfr[ACC] - 1) & 0xFF
+                return nxt
+            return dec_a
+        if hi in (0x00, 0x10) and lo >= 5: # INC/DEC direct, @Ri, Rn
+            get, put = target()
+            delta = 1 if hi == 0x00 else 0xFF
+            if lo >= 8:
+                def inc_reg():
+                    r = (sfr[PSW] & 0x18) | n
+                    iram[r] = (iram[r] + delta) & 0xFF
+                    return nxt
+                return inc_reg
+            def inc():
+                put((get() + delta) & 0xFF)
+                return nxt
+            return inc
+        if op == 0xA3: # INC DPTR
+            def inc_dptr():
+                dpl = sfr[DPL] + 1
+                if dpl > 0xFF:
+                    sfr[DPH] = (sfr[DPH] + 1) & 0xFF
+                sfr[DPL] = dpl & 0xFF
+                return nxt
+            return inc_dptr
+
+        if op in (0x10, 0x20, 0x30): # JBC, JB, JNB bit,rel
+            test = self._bit_getter(a1, latch=(op == 0x10))
+            if op == 0x10:
+                clear = self._bit_setter(a1)
+                def jbc():
+                    if test():
+                        clear(0)
+                        return rel2
+                    return nxt
+                return jbc
+            spin = self._idle_loop(pc, rel2)
+            if op == 0x20:
+                return lambda: spin if test() else nxt
+            return lambda: nxt if test() else spin
+        if op in (0x40, 0x50): # JC, JNC rel
+            if op == 0x40:
+                return lambda: rel1 if sfr[PSW] & 0x80 else nxt
+            return lambda: nxt if sfr[PSW] & 0x80 else rel1
+        if op in (0x60, 0x70): # JZ, JNZ rel
+            if op == 0x60:
+                return lambda: nxt if sfr[ACC] else rel1
+            return lambda: rel1 if sfr[ACC] else nxt
+
+        if hi in (0x20, 0x30, 0x90) and lo >= 4: # ADD, ADDC, SUBB
+            get = source()
+            if hi == 0x90:
+                def subb():
+                    a, b = sfr[ACC], get()
+                    psw = sfr[PSW]
+                    c = psw >> 7
+                    r = a - b - c
+                    flags = (0x80 if r < 0 else 0) | \
+                            (0x40 if (a & 0x0F) - (b & 0x0F) - c < 0 else 0) | \
+                            (0x04 if (a ^ b) & (a ^ r) & 0x80 else 0)
+                    sfr[ACC] = r & 0xFF
+                    sfr[PSW] = (psw & 0x3B) | flags
+                    return nxt
+                return subb
+            with_carry = hi == 0x30
+            def add():
+                a, b = sfr[ACC], get()
+                psw = sfr[PSW]
+                c = psw >> 7 if with_carry else 0
+                r = a + b + c
+                flags = (0x80 if r > 0xFF else 0) | \
+                        (0x40 if (a & 0x0F) + (b & 0x0F) + c > 0x0F else 0) | \
+                        (0x04 if (a ^ r) & (b ^ r) & 0x80 else 0)
+                sfr[ACC] = r & 0xFF
+                sfr[PSW] = (psw & 0x3B) | flags
+                return nxt
+            return add
+
+        if hi in (0x40, 0x50, 0x60) and lo >= 2: # ORL, ANL, XRL
+            if hi == 0x40:
+                fn = int.__or__
+            elif hi == 0x50:
+                fn = int.__and__
+            else:
+                fn = int.__xor__
+            if lo == 2 or lo == 3: # direct,A / direct,#imm
+                get, put = self._getter(a1, latch=True), self._setter(a1)
+                if lo == 2:
+                    def logic_dir_a():
+                        put(fn(get(), sfr[ACC]))
+                        return nxt
+                    return logic_dir_a
+                def logic_dir_imm():
+                    put(fn(get(), a2))
+                    return nxt
+                return logic_dir_imm
+            get = source()
+            def logic_a():
+                sfr[ACC] = fn(sfr[ACC], get())
+                return nxt
+            return logic_a
+
+        if op in (0x72, 0x82, 0xA0, 0xB0): # ORL/ANL C,bit and C,/bit
+            test = self._bit_getter(a1)
+            invert = 1 if op in (0xA0, 0xB0) else 0
+            if op in (0x72, 0xA0):
+                def orl_c():
+                    if test() ^ invert:
+                        sfr[PSW] |= 0x80
+                    return nxt
+                return orl_c
+            def anl_c():
+                if not test() ^ invert:
+                    sfr[PSW] &= 0x7F
+                return nxt
+            return anl_c
+        if op == 0xA2: # MOV C,bit
+            test = self._bit_getter(a1)
+            def mov_c_bit():
+                sfr[PSW] = (sfr[PSW] & 0x7F) | (0x80 if test() else 0)
+                return nxt
+            return mov_c_bit
+        if op == 0x92: # MOV bit,C
+            put = self._bit_setter(a1)
+            def mov_bit_c():
+                put(sfr[PSW] & 0x80)
+                return nxt
+            return mov_bit_c
+        if op in (0xB2, 0xC2, 0xD2): # CPL, CLR, SETB bit
+            if op == 0xB2:
+                test, put = self._bit_getter(a1, latch=True), self._bit_setter(a1)
+                def cpl_bit():
+                    put(not test())
+                    return nxt
+                return cpl_bit
+            put, value = self._bit_setter(a1), op == 0xD2
+            def set_bit():
+                put(value)
+                return nxt
+            return set_bit
+        if op in (0xB3, 0xC3, 0xD3): # CPL, CLR, SETB C
+            if op == 0xB3:
+                def cpl_c():
+                    sfr[PSW] ^= 0x80
+                    return nxt
+                return cpl_c
+            if op == 0xC3:
+                def clr_c():
+                    sfr[PSW] &= 0x7F
+                    return nxt
+                return clr_c
+            def setb_c():
+                sfr[PSW] |= 0x80
+                return nxt
+            return setb_c
+
+        if op == 0x74: # MOV A,#imm
+            def mov_a_imm():
+                sfr[ACC] = a1
+                return nxt
+            return mov_a_imm
+        if op == 0xE5 or 0xE6 <= op <= 0xEF: # MOV A,direct/@Ri/Rn
+            get = source()
+            def mov_a():
+                sfr[ACC] = get()
+                return nxt
+            return mov_a
+        if op == 0x75: # MOV direct,#imm
+            put = self._setter(a1)
+            def mov_dir_imm():
+                put(a2)
+                return nxt
+            return mov_dir_imm
+        if op in (0x76, 0x77) or 0x78 <= op <= 0x7F: # MOV @Ri/Rn,#imm
+            _, put = target()
+            def mov_imm():
+                put(a1)
+                return nxt
+            return mov_imm
+        if op == 0x85: # MOV direct,direct (source first)
+            get, put = self._getter(a1), self._setter(a2)
+            def mov_dir_dir():
+                put(get())
+                return nxt
+            return mov_dir_dir
+        if 0x86 <= op <= 0x8F: # MOV direct,@Ri/Rn
+            get = source()
+            put = self._setter(a1)
+            def mov_dir():
+                put(get())
+                return nxt
+            return mov_dir
+        if 0xA6 <= op <= 0xAF: # MOV @Ri/Rn,direct
+            get = self._getter(a1)
+            _, put = target()
+            def mov_from_dir():
+                put(get())
+                return nxt
+            return mov_from_dir
+        if op == 0xF5: # MOV direct,A
+            put = self._setter(a1)
+            def mov_dir_a():
+                put(sfr[ACC])
+                return nxt
+            return mov_dir_a
+        if 0xF6 <= op <= 0xFF: # MOV @Ri/Rn,A
+            if op >= 0xF8:
+                def mov_reg_a():
+                    iram[(sfr[PSW] & 0x18) | n] = sfr[ACC]
+                    return nxt
+                return mov_reg_a
+            _, put = target()
+            def mov_ind_a():
+                put(sfr[ACC])
+                return nxt
+            return mov_ind_a
+        if op == 0x90: # MOV DPTR,#imm16
+            def mov_dptr():
+                sfr[DPH] = a1
+                sfr[DPL] = a2
+                return nxt
+            return mov_dptr
+        if op in (0x83, 0x93): # MOVC A,@A+PC / @A+DPTR
+            if op == 0x83:
+                def movc_pc():
+                    sfr[ACC] = code[(nxt + sfr[ACC]) & 0xFFFF]
+                    return nxt
+                return movc_pc
+            def movc_dptr():
+                sfr[ACC] = code[(sfr[DPH] << 8 | sfr[DPL]) + sfr[ACC] & 0xFFFF]
+                return nxt
+            return movc_dptr
+        if op in (0xE0, 0xE2, 0xE3, 0xF0, 0xF2, 0xF3): # MOVX
+            xram = self.xram
+            if op & 0x0F == 0:
+                def addr():
+                    return sfr[DPH] << 8 | sfr[DPL]
+            else:
+                def addr():
+                    return sfr[P2] << 8 | iram[(sfr[PSW] & 0x18) | i]
+            if hi == 0xE0:
+                def movx_read():
+                    sfr[ACC] = xram[addr()]
+                    return nxt
+                return movx_read
+            def movx_write():
+                xram[addr()] = sfr[ACC]
+                return nxt
+            return movx_write
+
+        if op == 0xC0: # PUSH direct
+            get = self._getter(a1)
+            def push_dir():
+                push(get())
+                return nxt
+            return push_dir
+        if op == 0xD0: # POP direct
+            put = self._setter(a1)
+            def pop_dir():
+                put(pop())
+                return nxt
+            return pop_dir
+        if op == 0xC5 or 0xC6 <= op <= 0xCF: # XCH A,direct/@Ri/Rn
+            get, put = target()
+            def xch():
+                a = sfr[ACC]
+                sfr[ACC] = get()
+                put(a)
+                return nxt
+            return xch
+        if op in (0xD6, 0xD7): # XCHD A,@Ri
+            get, put = target()
+            def xchd():
+                a, v = sfr[ACC], get()
+                sfr[ACC] = (a & 0xF0) | (v & 0x0F)
+                put((v & 0xF0) | (a & 0x0F))
+                return nxt
+            return xchd
+
+        if 0xB4 <= op <= 0xBF: # CJNE
+            if op == 0xB4:
+                get, value = (lambda: sfr[ACC]), a1
+            elif op == 0xB5:
+                get, value, getv = (lambda: sfr[ACC]), None, self._getter(a1)
+            else:
+                get, _ = target()
+                value = a1
+            if op == 0xB5:
+                def cjne_dir():
+                    a, b = get(), getv()
+                    sfr[PSW] = (sfr[PSW] & 0x7F) | (0x80 if a < b else 0)
+                    return rel2 if a != b else nxt
+                return cjne_dir
+            if op >= 0xB8:
+                def cjne_reg():
+                    a = iram[(sfr[PSW] & 0x18) | n]
+                    sfr[PSW] = (sfr[PSW] & 0x7F) | (0x80 if a < value else 0)
+                    return rel2 if a != value else nxt
+                return cjne_reg
+            def cjne():
+                a = get()
+                sfr[PSW] = (sfr[PSW] & 0x7F) | (0x80 if a < value else 0)
+                return rel2 if a != value else nxt
+            return cjne
+        if op == 0xD5: # DJNZ direct,rel
+            get, put = self._getter(a1, latch=True), self._setter(a1)
+            def djnz_dir():
+                v = (get() - 1) & 0xFF
+                put(v)
+                return rel2 if v else nxt
+            return djnz_dir
+        if 0xD8 <= op <= 0xDF: # DJNZ Rn,rel
+            def djnz_reg():
+                r = (sfr[PSW] & 0x18) | n
+                v = (iram[r] - 1) & 0xFF
+                iram[r] = v
+                return rel1 if v else nxt
+            return djnz_reg
+
+        # 0xA5 is the only opcode left.
+        def reserved():
+            self._log.warning("Reserved opcode 0x%02X at 0x%04X executed as NOP", op, pc)
+            return nxt
+        return reserved
@@ -0,0 +1,225 @@
+"""Client of att26a-consoled.
+
+ConsoleClient mirrors the LED and button calls of ATT26A, but changes
+are buffered locally and sent as one DIFF message by flush(), so a
+dashboard can redraw at any rate and only pays for what changed.
+"""
+
+import logging
+import queue
+import socket
+import threading
+
+from . import LED_OFF, LED_ON, LED_MODES
+from . import DriverClosedError, DriverShuttingDownError, ButtonTimeoutError
+from . import Att26AProtocolError, CommandTimeoutError
+from . import interruptablequeue
+from . import netproto
+
+
+class ConsoleClient(object):
+    """Connection to a console shared by att26a-consoled.
+
+    LEDs must be leased before they can be drawn on; updates to other
+    LEDs are ignored by the daemon.
+
+    Args:
+        host (str): Host running the daemon.
+        port (int): TCP port of the daemon.
+        timeout (float): Seconds to wait for replies from the daemon.
+        log (:obj:`logging.Logger`, optional): logging object.
+    """
+
+    def __init__(self, host="localhost", port=netproto.DEFAULT_PORT, timeout=5.0, log=None):
+        self._log = logging.getLogger('att26anetclient') if not log else log
+        self.timeout = timeout
+        self._sock = socket.create_connection((host, port), timeout=timeout)
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._sock.settimeout(None)
+        self._sendlock = threading.Lock()
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._frame = bytearray(120)
+        self._leased = frozenset()
+        self._next_token = 0
+        self._replies = queue.Queue()
+        self._btnq = interruptablequeue.InterruptableQueue()
+        self._is_open = True
+
+        self._reader = threading.Thread(target=self._reader_func, daemon=True)
+        self._reader.start()
+
+        msgtype, payload = self._wait_reply(netproto.MSG_HELLO)
+        version, self.client_id = netproto.HELLO.unpack(payload)
+        if version != netproto.PROTOCOL_VERSION:
+            self.close()
+            raise Att26AProtocolError("Daemon speaks protocol version %d, not %d."
+                                      % (version, netproto.PROTOCOL_VERSION))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        if self._is_open:
+            self._is_open = False
+            try:
+                self._sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self._reader.join()
+            self._sock.close()
+
+    @property
+    def is_open(self):
+        return self._is_open
+
+    @property
+    def leased(self):
+        """IDs of the LEDs this client holds."""
+        return self._leased
+
+    def _reader_func(self):
+        reader = netproto.MessageReader()
+        try:
+            while True:
+                data = self._sock.recv(4096)
+                if not data:
+                    break
+                for msgtype, payload in reader.feed(data):
+                    if msgtype == netproto.MSG_BUTTON:
+                        self._btnq.put(payload[0])
+                    else:
+                        self._replies.put((msgtype, payload))
+        except OSError as e:
+            if self._is_open:
+                self._log.error("Connection to daemon failed: %s", e)
+        finally:
+            self._is_open = False
+            self._btnq.interrupt_all_consumers()
+            self._replies.put((None, None))
+
+    def _send(self, msgtype, payload=b''):
+        if not self._is_open:
+            raise DriverClosedError("Not connected to the daemon.")
+        with self._sendlock:
+            self._sock.sendall(netproto.encode(msgtype, payload))
+
+    def _wait_reply(self, *msgtypes):
+        while True:
+            try:
+                msgtype, payload = self._replies.get(timeout=self.timeout)
+            except queue.Empty:
+                raise CommandTimeoutError("No reply from the daemon.")
+            if msgtype is None:
+                self._replies.put((None, None))
+                raise DriverShuttingDownError("Connection to the daemon closed.")
+            if msgtype == netproto.MSG_ERROR:
+                raise Att26AProtocolError(payload.decode(errors='replace'))
+            if msgtype in msgtypes:
+                return msgtype, payload
+
+    def lease(self, ledIDs):
+        """Ask for exclusive use of 'ledIDs'.
+
+        LEDs held by other clients are not granted.
+
+        Returns:
+            frozenset: IDs of all LEDs this client now holds.
+        """
+        self._send(netproto.MSG_LEASE, netproto.pack_mask(ledIDs))
+        self._leased = frozenset(netproto.unpack_mask(
+            self._wait_reply(netproto.MSG_LEASED)[1]))
+        return self._leased
+
+    def release(self, ledIDs):
+        """Give 'ledIDs' back; they show whatever the daemon draws there."""
+        self.flush()
+        self._send(netproto.MSG_RELEASE, netproto.pack_mask(ledIDs))
+        self._leased = frozenset(netproto.unpack_mask(
+            self._wait_reply(netproto.MSG_LEASED)[1]))
+        return self._leased
+
+    def subscribe(self, btnIDs):
+        """Receive presses of 'btnIDs' (replacing the previous set)."""
+        self._send(netproto.MSG_SUBSCRIBE, netproto.pack_mask(btnIDs))
+
+    def get_btn_press(self, block=True, timeout=None):
+        """Read a single subscribed button press; see ATT26A.get_btn_press."""
+        try:
+            return self._btnq.get(block=block, timeout=timeout)
+        except queue.Empty as e:
+            raise ButtonTimeoutError()
+        except interruptablequeue.QueueInterruptException as e:
+            raise DriverShuttingDownError()
+
+    def set_led_state(self, state, ledID):
+        """Buffer a state change of one LED until the next flush()."""
+        if state not in LED_MODES:
+            raise ValueError("state can either be 0x0, 0x8, 0xD, or 0xF, not %s" % hex(state))
+        if ledID >= 120 or ledID < 0:
+            raise ValueError("ledID must be between 0 and 119; not %d." % ledID)
+        with self._lock:
+            self._set(state, ledID)
+
+    def _set(self, state, ledID):
+        if self._frame[ledID] != state:
+            self._frame[ledID] = state
+            self._pending[ledID] = state
+
+    def set_led_range_state(self, start_ledid, states_on_off):
+        """Buffer ON/OFF states of a range; wraps past LED 99 like ATT26A."""
+        if start_ledid > 99 or start_ledid < 0:
+            raise ValueError("start_ledid must be between 0 and 99; not %d" % start_ledid)
+        if len(states_on_off) > 100:
+            raise ValueError("Only up to 100 leds may be set at a time, not %d"
+                             % len(states_on_off))
+        with self._lock:
+            for i, val in enumerate(states_on_off):
+                self._set(LED_ON if val else LED_OFF, (start_ledid + i) % 100)
+
+    def set_frame(self, modes):
+        """Buffer a whole 120 LED frame."""
+        if len(modes) != 120:
+            raise ValueError("A frame holds exactly 120 LED modes, not %d." % len(modes))
+        for state in set(modes):
+            if state not in LED_MODES:
+                raise ValueError("state can either be 0x0, 0x8, 0xD, or 0xF, not %s"
+                                 % hex(state))
+        with self._lock:
+            for ledID, state in enumerate(modes):
+                self._set(state, ledID)
+
+    def flush(self):
+        """Send the buffered changes in one message.
+
+        Whichever of a DIFF or a packed FRAME is smaller is sent.
+        """
+        with self._lock:
+            if not self._pending:
+                return
+            if len(self._pending) * 2 > netproto.PACKED_FRAME_LEN:
+                msgtype, payload = netproto.MSG_FRAME, netproto.pack_frame(self._frame)
+            else:
+                msgtype, payload = netproto.MSG_DIFF, netproto.pack_diff(self._pending.items())
+            self._pending.clear()
+        self._send(msgtype, payload)
+
+    def sync(self):
+        """Flush, and wait until the daemon sent everything to the console."""
+        self.flush()
+        with self._lock:
+            token = self._next_token
+            self._next_token = (token + 1) & 0xFFFF
+        self._send(netproto.MSG_SYNC, netproto.TOKEN.pack(token))
+        while True:
+            payload = self._wait_reply(netproto.MSG_SYNCED)[1]
+            if netproto.TOKEN.unpack(payload)[0] == token:
+                return
+
+    def get_frame(self):
+        """Return the 120 LED frame currently shown on the console."""
+        self._send(netproto.MSG_QUERY)
+        return netproto.unpack_frame(self._wait_reply(netproto.MSG_FRAME)[1])
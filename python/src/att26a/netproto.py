@@ -0,0 +1,142 @@
+"""Framed binary protocol spoken between att26a-consoled and its clients.
+
+Every message is a 3 byte header (type, big endian payload length)
+followed by the payload:
+
+    HELLO     s->c  version (B), client id (H)
+    LEASE     c->s  LED mask; asks for exclusive use of those LEDs
+    LEASED    s->c  LED mask of everything the client now holds
+    RELEASE   c->s  LED mask; gives LEDs back
+    FRAME     c->s  packed frame; sets every leased LED
+              s->c  packed frame; reply to QUERY
+    DIFF      c->s  (ledID, mode) byte pairs
+    SUBSCRIBE c->s  button mask; replaces the previous subscription
+    BUTTON    s->c  button id (B)
+    SYNC      c->s  token (H)
+    SYNCED    s->c  token (H); everything sent before SYNC is on the device
+    QUERY     c->s  empty; asks for the frame shown on the device
+    ERROR     s->c  UTF-8 text
+
+Masks are 15 bytes, one bit per LED/button ID, LSB first. Packed
+frames hold 2 bits per LED: the index of its mode in att26a.LED_MODES.
+"""
+
+import struct
+
+from . import LED_MODES
+
+PROTOCOL_VERSION = 1
+DEFAULT_PORT = 7780
+
+MSG_HELLO = 0x01
+MSG_LEASE = 0x02
+MSG_LEASED = 0x03
+MSG_RELEASE = 0x04
+MSG_FRAME = 0x05
+MSG_DIFF = 0x06
+MSG_SUBSCRIBE = 0x07
+MSG_BUTTON = 0x08
+MSG_SYNC = 0x09
+MSG_SYNCED = 0x0A
+MSG_QUERY = 0x0B
+MSG_ERROR = 0x0C
+
+HEADER = struct.Struct('>BH')
+HELLO = struct.Struct('>BH')
+TOKEN = struct.Struct('>H')
+MASK_LEN = 15
+PACKED_FRAME_LEN = 30
+MAX_PAYLOAD = 0xFFFF
+
+class ProtocolError(ValueError):
+    pass
+
+
+def encode(msgtype, payload=b''):
+    """Return the wire form of one message."""
+    if len(payload) > MAX_PAYLOAD:
+        raise ProtocolError("Payload of %d bytes is too long." % len(payload))
+    return HEADER.pack(msgtype, len(payload)) + payload
+
+
+def pack_mask(ids):
+    """Pack LED or button IDs (0-119) into a 15 byte mask."""
+    mask = bytearray(MASK_LEN)
+    for i in ids:
+        if i >= 120 or i < 0:
+            raise ValueError("ID must be between 0 and 119; not %d." % i)
+        mask[i >> 3] |= 1 << (i & 7)
+    return bytes(mask)
+
+
+def unpack_mask(data):
+    """Return the list of IDs set in a 15 byte mask."""
+    if len(data) != MASK_LEN:
+        raise ProtocolError("Masks are %d bytes, not %d." % (MASK_LEN, len(data)))
+    return [i for i in range(120) if data[i >> 3] & (1 << (i & 7))]
+
+
+def pack_frame(modes):
+    """Pack 120 LED modes into 30 bytes."""
+    if len(modes) != 120:
+        raise ValueError("A frame holds exactly 120 LED modes, not %d." % len(modes))
+    out = bytearray(PACKED_FRAME_LEN)
+    for i, mode in enumerate(modes):
+        out[i >> 2] |= LED_MODES.index(mode) << ((i & 3) * 2)
+    return bytes(out)
+
+
+def unpack_frame(data):
+    """Unpack 30 bytes into a 120 byte frame of LED modes."""
+    if len(data) != PACKED_FRAME_LEN:
+        raise ProtocolError("Packed frames are %d bytes, not %d."
+                            % (PACKED_FRAME_LEN, len(data)))
+    return bytearray(LED_MODES[(data[i >> 2] >> ((i & 3) * 2)) & 3] for i in range(120))
+
+
+def pack_diff(changes):
+    """Pack (ledID, mode) pairs."""
+    out = bytearray()
+    for ledID, mode in changes:
+        if ledID >= 120 or ledID < 0:
+            raise ValueError("ledID must be between 0 and 119; not %d." % ledID)
+        if mode not in LED_MODES:
+            raise ValueError("state can either be 0x0, 0x8, 0xD, or 0xF, not %s" % hex(mode))
+        out += bytes((ledID, mode))
+    return bytes(out)
+
+
+def unpack_diff(data):
+    """Return the (ledID, mode) pairs of a DIFF payload."""
+    if len(data) % 2:
+        raise ProtocolError("DIFF payload length must be even, not %d." % len(data))
+    changes = list(zip(data[0::2], data[1::2]))
+    for ledID, mode in changes:
+        if ledID >= 120 or mode not in LED_MODES:
+            raise ProtocolError("Invalid DIFF entry (%d, 0x%x)." % (ledID, mode))
+    return changes
+
+
+class MessageReader(object):
+    """Split a byte stream into (type, payload) messages.
+
+    feed() takes data as it arrives and returns the messages it
+    completed; partial messages are kept for the next call.
+    """
+
+    def __init__(self):
+        self._buf = bytearray()
+
+    def feed(self, data):
+        self._buf += data
+        messages = []
+        pos = 0
+        while len(self._buf) - pos >= HEADER.size:
+            msgtype, length = HEADER.unpack_from(self._buf, pos)
+            end = pos + HEADER.size + length
+            if end > len(self._buf):
+                break
+            messages.append((msgtype, bytes(self._buf[pos + HEADER.size:end])))
+            pos = end
+        del self._buf[:pos]
+        return messages
@@ -0,0 +1,127 @@
+"""Reflex rules: LED changes the driver makes as soon as a button is pressed.
+
+Rules are registered with ATT26A.add_reflex. The driver's receiver
+thread runs them the moment a press arrives and queues the LED writes
+they return ahead of every other command, so the operator sees a
+reaction one serial round trip after the press, however busy the
+application is. Presses are still delivered through get_btn_press.
+
+Every rule maps buttons to LEDs ('leds' defaults to the LED next to
+each button, which has the same ID) and remembers the modes it set;
+rules that depend on them (Toggle, RadioGroup, Cycle) should own their
+LEDs. Rules run on the receiver thread and must not block.
+
+    driver.add_reflex(reflex.Toggle(range(100)))
+    driver.add_reflex(reflex.RadioGroup(range(100, 104)))
+"""
+
+from . import LED_OFF, LED_BLINK1, LED_BLINK2, LED_ON, LED_MODES
+
+
+def _check_modes(**modes):
+    for name, mode in modes.items():
+        if mode not in LED_MODES:
+            raise ValueError("%s can either be 0x0, 0x8, 0xD, or 0xF, not %s" % (name, hex(mode)))
+
+
+class Reflex(object):
+    """Base class of reflex rules.
+
+    Args:
+        buttons (iterable of int): Buttons the rule reacts to.
+        leds (iterable of int, optional): LED of each button, in the
+            same order. Defaults to the buttons' own IDs.
+        initial (int): Mode the rule assumes its LEDs start in.
+    """
+
+    def __init__(self, buttons, leds=None, initial=LED_OFF):
+        self.buttons = tuple(buttons)
+        self.leds = self.buttons if leds is None else tuple(leds)
+        if len(self.leds) != len(self.buttons):
+            raise ValueError("Every button needs exactly one LED.")
+        if initial not in LED_MODES:
+            raise ValueError("initial can either be 0x0, 0x8, 0xD, or 0xF, not %s"
+                             % hex(initial))
+        self.initial = initial
+        self._led_of = dict(zip(self.buttons, self.leds))
+        self.modes = {}
+        self.reset()
+
+    def reset(self):
+        """Forget the modes set so far (the console was reset)."""
+        self.modes = {led: self.initial for led in self.leds}
+
+    def press(self, btn):
+        """Run the rule for a press of 'btn'.
+
+        Returns:
+            list: (state, ledID) writes to send, possibly empty.
+        """
+        led = self._led_of.get(btn)
+        if led is None:
+            return []
+        writes = self._react(led)
+        for state, ledID in writes:
+            self.modes[ledID] = state
+        return writes
+
+    def _react(self, led):
+        """Return the (state, ledID) pairs LED 'led's button asks for."""
+        raise NotImplementedError()
+
+
+class Set(Reflex):
+    """Pressing a button sets its LED to 'state'."""
+
+    def __init__(self, buttons, state=LED_ON, leds=None, initial=LED_OFF):
+        if state not in LED_MODES:
+            raise ValueError("state can either be 0x0, 0x8, 0xD, or 0xF, not %s" % hex(state))
+        self.state = state
+        super(Set, self).__init__(buttons, leds, initial)
+
+    def _react(self, led):
+        return [(self.state, led)]
+
+
+class Toggle(Reflex):
+    """Pressing a button switches its LED between 'on' and 'off'."""
+
+    def __init__(self, buttons, on=LED_ON, off=LED_OFF, leds=None):
+        _check_modes(on=on, off=off)
+        self.on = on
+        self.off = off
+        super(Toggle, self).__init__(buttons, leds, off)
+
+    def _react(self, led):
+        return [(self.off if self.modes[led] == self.on else self.on, led)]
+
+
+class RadioGroup(Reflex):
+    """Pressing a button turns its LED 'on' and the group's others 'off'."""
+
+    def __init__(self, buttons, on=LED_ON, off=LED_OFF, leds=None):
+        _check_modes(on=on, off=off)
+        self.on = on
+        self.off = off
+        super(RadioGroup, self).__init__(buttons, leds, off)
+
+    def _react(self, led):
+        # The new selection goes first; it is what the operator looks at.
+        return [(self.on, led)] + [(self.off, other) for other in self.leds
+                                   if other != led and self.modes[other] != self.off]
+
+
+class Cycle(Reflex):
+    """Pressing a button moves its LED to the next of 'modes'."""
+
+    def __init__(self, buttons, modes=(LED_OFF, LED_ON, LED_BLINK1, LED_BLINK2), leds=None):
+        for mode in modes:
+            if mode not in LED_MODES:
+                raise ValueError("modes can either be 0x0, 0x8, 0xD, or 0xF, not %s" % hex(mode))
+        self.cycle = tuple(modes)
+        super(Cycle, self).__init__(buttons, leds, self.cycle[0])
+
+    def _react(self, led):
+        mode = self.modes[led]
+        i = self.cycle.index(mode) if mode in self.cycle else -1
+        return [(self.cycle[(i + 1) % len(self.cycle)], led)]
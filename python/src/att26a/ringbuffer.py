@@ -0,0 +1,136 @@
+"""Thread safe byte FIFO for serial receive paths.
+
+Producers hand over whole chunks, consumers take as many bytes as they
+want; each side costs one lock round trip per call rather than per
+byte. Consumers wait on a condition variable, and are woken up by
+interrupt() when the port they read from is closed; resume() lets them
+wait again once it is reopened.
+"""
+
+import threading
+import time
+
+class RingBuffer(object):
+    """Growable circular byte buffer with blocking reads.
+
+    Args:
+        capacity (int): Initial size in bytes. The buffer doubles in
+            size whenever a write does not fit, so data is never dropped.
+    """
+
+    def __init__(self, capacity=4096):
+        self._buf = bytearray(capacity)
+        self._start = 0
+        self._size = 0
+        self._interrupted = False
+        self._cond = threading.Condition(threading.Lock())
+
+    @property
+    def in_waiting(self):
+        """Number of bytes that can be read without blocking."""
+        return self._size
+
+    @property
+    def interrupted(self):
+        return self._interrupted
+
+    def write(self, data):
+        """Append 'data' and wake up readers. Never blocks."""
+        n = len(data)
+        if not n:
+            return
+        with self._cond:
+            if self._size + n > len(self._buf):
+                self._grow(self._size + n)
+            buf = self._buf
+            end = (self._start + self._size) % len(buf)
+            first = min(n, len(buf) - end)
+            buf[end:end + first] = data[:first]
+            if first < n:
+                buf[:n - first] = data[first:]
+            self._size += n
+            self._cond.notify_all()
+
+    def _grow(self, needed):
+        capacity = max(len(self._buf), 1)
+        while capacity < needed:
+            capacity *= 2
+        newbuf = bytearray(capacity)
+        self._copy_out(memoryview(newbuf)[:self._size])
+        self._buf = newbuf
+        self._start = 0
+
+    def _copy_out(self, dest):
+        """Copy len(dest) bytes from the front of the buffer (lock held)."""
+        n = len(dest)
+        buf = memoryview(self._buf)
+        first = min(n, len(buf) - self._start)
+        dest[:first] = buf[self._start:self._start + first]
+        if first < n:
+            dest[first:n] = buf[:n - first]
+
+    def _wait(self, size, timeout):
+        """Wait until 'size' bytes are buffered, the timeout expires or
+        the buffer is interrupted (lock held)."""
+        if timeout is None:
+            while self._size < size and not self._interrupted:
+                self._cond.wait()
+        elif timeout > 0:
+            deadline = time.monotonic() + timeout
+            while self._size < size and not self._interrupted:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+    def readinto(self, b, timeout=None):
+        """Read up to len(b) bytes into the writable buffer 'b'.
+
+        Follows pyserial's read semantics: with timeout None, wait for
+        len(b) bytes; with a timeout, return whatever arrived in time;
+        with timeout 0, only take what is already buffered.
+
+        Returns:
+            int: Number of bytes read.
+        """
+        dest = memoryview(b).cast('B')
+        with self._cond:
+            self._wait(len(dest), timeout)
+            n = min(len(dest), self._size)
+            self._copy_out(dest[:n])
+            self._consume(n)
+            return n
+
+    def read(self, size=1, timeout=None):
+        """Read up to 'size' bytes; see readinto for the timeout rules."""
+        with self._cond:
+            self._wait(size, timeout)
+            n = min(size, self._size)
+            buf = memoryview(self._buf)
+            first = min(n, len(buf) - self._start)
+            if first == n:
+                data = bytes(buf[self._start:self._start + n])
+            else:
+                data = b''.join((buf[self._start:], buf[:n - first]))
+            self._consume(n)
+        return data
+
+    def _consume(self, n):
+        self._size -= n
+        self._start = (self._start + n) % len(self._buf) if self._size else 0
+
+    def clear(self):
+        with self._cond:
+            self._start = 0
+            self._size = 0
+
+    def interrupt(self):
+        """Wake up all readers; reads stop waiting until resume()."""
+        with self._cond:
+            self._interrupted = True
+            self._cond.notify_all()
+
+    def resume(self):
+        """Let reads wait again after interrupt() (the port was reopened)."""
+        with self._cond:
+            self._interrupted = False
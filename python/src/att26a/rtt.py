@@ -0,0 +1,88 @@
+"""Smoothed round trip time estimation for command ACKs.
+
+Follows the TCP retransmission timer (RFC 6298): a smoothed round trip
+time (SRTT) and its variation (RTTVAR) are updated from every ACK that
+answers a command sent only once (Karn's algorithm), and the timeout
+is SRTT + 4 * RTTVAR, doubled on every expiry.
+
+Samples exclude the time needed to shift the command and its ACK over
+the wire, so one estimate serves commands of every length.
+"""
+
+import threading
+
+BITS_PER_BYTE = 11 # start + 8 data + parity + stop
+
+
+def wire_time(nbytes, baudrate=10752):
+    """Seconds needed to shift 'nbytes' bytes over the serial line."""
+    return nbytes * BITS_PER_BYTE / float(baudrate)
+
+
+class RttEstimator(object):
+    """Smoothed ACK round trip estimate and retransmission timeout.
+
+    Args:
+        initial_rto (float): Timeout used before the first sample.
+        min_rto (float): Lower bound of the timeout.
+        max_rto (float): Upper bound of the timeout.
+    """
+
+    ALPHA = 1 / 8.0
+    BETA = 1 / 4.0
+
+    def __init__(self, initial_rto=0.1, min_rto=0.005, max_rto=1.0):
+        self.min_rto = min_rto
+        self.max_rto = max_rto
+        self.srtt = None
+        self.rttvar = None
+        self.min_rtt = None
+        self.samples = 0
+        self._rto = initial_rto
+        self._lock = threading.Lock()
+
+    @property
+    def rto(self):
+        """Current retransmission timeout in seconds."""
+        return self._rto
+
+    def sample(self, rtt, wire=0.0):
+        """Feed the round trip time of a command that was only sent once.
+
+        Args:
+            rtt (float): Seconds from sending the command to its ACK.
+            wire (float): Part of 'rtt' spent shifting bytes over the
+                wire; it is not part of the smoothed estimate.
+        """
+        with self._lock:
+            if self.min_rtt is None or rtt < self.min_rtt:
+                self.min_rtt = rtt
+            rtt = max(rtt - wire, 0.0)
+            if self.srtt is None:
+                self.srtt = rtt
+                self.rttvar = rtt / 2
+            else:
+                self.rttvar = (1 - self.BETA) * self.rttvar + self.BETA * abs(self.srtt - rtt)
+                self.srtt = (1 - self.ALPHA) * self.srtt + self.ALPHA * rtt
+            self.samples += 1
+            self._rto = min(max(self.srtt + 4 * self.rttvar, self.min_rto), self.max_rto)
+
+    def seed(self, srtt, rttvar):
+        """Start from a measured estimate instead of 'initial_rto'.
+
+        Only takes effect before the first sample.
+        """
+        with self._lock:
+            if self.samples:
+                return
+            self.srtt = srtt
+            self.rttvar = rttvar
+            self._rto = min(max(srtt + 4 * rttvar, self.min_rto), self.max_rto)
+
+    def backoff(self):
+        """Double the timeout after it expired."""
+        with self._lock:
+            self._rto = min(self._rto * 2, self.max_rto)
+
+    def __repr__(self):
+        return "<RttEstimator srtt=%s rttvar=%s rto=%.4f>" % (self.srtt, self.rttvar, self._rto)
@@ -5,11 +5,11 @@ import socket
 import sys
 import time
 import threading
+import asyncio
 import serial
 import serial.rfc2217
-import queue
 
-from att26a import interruptablequeue
+from att26a import ringbuffer
 
 class RFC2217SerialAdapter(object):
     class FakePort(object):
@@ -98,7 +98,7 @@ class RFC2217SerialAdapter(object):
             return self.realport._dtr
         @dtr.setter
         def dtr(self, value):
-            self.realport._dtr = value
+            self.realport._set_dtr(value)
 
         @property
         def rts(self):
@@ -108,7 +108,7 @@ class RFC2217SerialAdapter(object):
             self.realport._rts = value
 
         def reset_input_buffer(self):
-            pass
+            self.realport.reset_input_buffer()
         def reset_output_buffer(self):
             pass
 
@@ -140,12 +140,14 @@ class RFC2217SerialAdapter(object):
         self._break_condition = False
         self._dtr = False
         self._rts = False
+        self._dtr_listeners = []
 
         self.connection_alive = False
         self.socket = None
         self._write_lock = threading.Lock()
         self.rfc2217 = None
-        self.__reader = interruptablequeue.InterruptableQueue()
+        self.__reader = ringbuffer.RingBuffer()
+        self.timeout = None
 
         self._log = logging.getLogger('RFC2217SerialAdapter') if not log else log
 
@@ -156,8 +158,20 @@ class RFC2217SerialAdapter(object):
     def open(self):
         if not self._is_open:
             self._is_open = True
+            self._resume_readers()
+            # Listen before returning, so close() can always break accept().
+            srv = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            srv.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            try:
+                srv.bind((self._address, self._port))
+                srv.listen(1)
+            except OSError:
+                srv.close()
+                self._is_open = False
+                raise
+            self._log.info("TCP/IP port: {}".format(self._port))
             self.thread_server = threading.Thread(
-                target=self.server_thread, daemon=True
+                target=self.server_thread, args=(srv,), daemon=True
             )
             self.thread_server.start()
 
@@ -174,13 +188,14 @@ class RFC2217SerialAdapter(object):
             # Sync up threads
             self.thread_server.join()
 
-    def server_thread(self):
-        srv = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        srv.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        srv.bind((self._address, self._port))
-        srv.listen(1)
-        self._log.info("TCP/IP port: {}".format(self._port))
+            self._interrupt_readers()
+
+    def server_thread(self, srv):
+        with srv:
+            self._serve(srv)
+        self._log.debug("server_thread dead")
 
+    def _serve(self, srv):
         while self._is_open:
             try:
                 self.socket, addr = srv.accept()
@@ -203,9 +218,7 @@ class RFC2217SerialAdapter(object):
                             if not data:
                                 self._log.debug("Breaking out of recv")
                                 break
-                            data_in = b''.join(self.rfc2217.filter(data))
-                            for b in data_in:
-                                self.__reader.put(b)
+                            self._received(b''.join(self.rfc2217.filter(data)))
                         except socket.error as msg:
                             self._log.error('{}'.format(msg))
                             break
@@ -217,25 +230,45 @@ class RFC2217SerialAdapter(object):
             except socket.error as msg:
                 self._log.error(str(msg))
 
-        self._log.debug("server_thread dead")
-
     def write(self, data):
-        if not self._is_open: raise Exception("Closed")
+        if not self._is_open: raise serial.SerialException("Closed")
         with self._write_lock:
             if self.socket:
                 # escape outgoing data when needed (Telnet IAC (0xff) character)
                 self.socket.sendall(b''.join(self.rfc2217.escape(data)))
 
-    def read(self, length):
-        if not self._is_open: raise Exception("Closed")
-        if length != 1:
-            raise ValueError("multi byte read does not work yet")
-        while True:
-            try:
-                return bytes([self.__reader.get(block=True, timeout=0.3)])
-            except queue.Empty as e:
-                if not self._is_open:
-                    raise Exception("Closed")
+    def _received(self, data):
+        """Queue data from the client for read()."""
+        self.__reader.write(data)
+
+    def _interrupt_readers(self):
+        self.__reader.interrupt()
+
+    def _resume_readers(self):
+        self.__reader.resume()
+
+    def _check_modem_lines(self):
+        if self.rfc2217:
+            self.rfc2217.check_modem_lines()
+
+    def read(self, size=1):
+        """Read up to 'size' bytes, honoring 'self.timeout' like pyserial."""
+        if not self._is_open: raise serial.SerialException("Closed")
+        data = self.__reader.read(size, self.timeout)
+        if not data and not self._is_open:
+            raise serial.SerialException("Closed")
+        return data
+
+    def readinto(self, b):
+        if not self._is_open: raise serial.SerialException("Closed")
+        n = self.__reader.readinto(b, self.timeout)
+        if not n and not self._is_open:
+            raise serial.SerialException("Closed")
+        return n
+
+    @property
+    def in_waiting(self):
+        return self.__reader.in_waiting
 
     @property
     def cts(self):
@@ -243,7 +276,7 @@ class RFC2217SerialAdapter(object):
     @cts.setter
     def cts(self, value):
         self._cts = value
-        self.rfc2217.check_modem_lines()
+        self._check_modem_lines()
 
     @property
     def dsr(self):
@@ -251,7 +284,7 @@ class RFC2217SerialAdapter(object):
     @dsr.setter
     def dsr(self, value):
         self._dsr = value
-        self.rfc2217.check_modem_lines()
+        self._check_modem_lines()
 
     @property
     def ri(self):
@@ -259,7 +292,7 @@ class RFC2217SerialAdapter(object):
     @ri.setter
     def ri(self, value):
         self._ri = value
-        self.rfc2217.check_modem_lines()
+        self._check_modem_lines()
 
     @property
     def cd(self):
@@ -267,7 +300,7 @@ class RFC2217SerialAdapter(object):
     @cd.setter
     def cd(self, value):
         self._cd = value
-        self.rfc2217.check_modem_lines()
+        self._check_modem_lines()
 
     @property
     def baudrate(self):
@@ -304,11 +337,206 @@ class RFC2217SerialAdapter(object):
     def dtr(self):
         return self._dtr
 
+    def _set_dtr(self, value):
+        self._dtr = value
+        for listener in self._dtr_listeners:
+            listener(value)
+
+    def add_dtr_listener(self, listener):
+        """Call 'listener(value)' whenever the client sets DTR."""
+        self._dtr_listeners.append(listener)
+
     @property
     def rts(self):
         return self._rts
 
     def reset_input_buffer(self):
-        pass
+        self.__reader.clear()
     def reset_output_buffer(self):
         pass
+
+
+class AsyncRFC2217SerialAdapter(RFC2217SerialAdapter):
+    """RFC2217 server on an asyncio loop with read-only observer clients.
+
+    The first client to connect controls the port: its data is what
+    read() returns and its settings (e.g. DTR) apply to the port. Every
+    further client is an observer; it receives the same device to host
+    byte stream, and anything it sends other than telnet negotiation
+    is ignored. When the controlling client disconnects, the next
+    client to connect takes over.
+
+    Data from write() is escaped once and the same bytes object is
+    queued on every client's transport, controlling client first.
+    Observers that fall more than 'observer_high_water' bytes behind
+    are disconnected, so they can never hold up the controlling client.
+
+    Args:
+        address (str): Address to listen on.
+        port (int): TCP port; 0 picks a free one (see 'bound_port').
+        log (:obj:`logging.Logger`, optional): logging object.
+        observer_high_water (int): Bytes an observer may have queued.
+    """
+
+    class ObserverPort(object):
+        """Port as seen by observers: settings read through, writes ignored."""
+        def __init__(self, realport):
+            object.__setattr__(self, 'realport', realport)
+
+        def __getattr__(self, name):
+            return getattr(self.realport, name)
+
+        def __setattr__(self, name, value):
+            pass
+
+        def reset_input_buffer(self):
+            pass
+        def reset_output_buffer(self):
+            pass
+
+    class TransportConnection(object):
+        def __init__(self, transport):
+            self.transport = transport
+
+        def write(self, data):
+            """Send telnet negotiation, unescaped. Only called on the loop."""
+            self.transport.write(data)
+
+    class ClientProtocol(asyncio.Protocol):
+        def __init__(self, adapter):
+            self.adapter = adapter
+            self.transport = None
+            self.rfc2217 = None
+
+        def connection_made(self, transport):
+            self.transport = transport
+            sock = transport.get_extra_info('socket')
+            if sock is not None:
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.adapter._client_connected(self)
+
+        def data_received(self, data):
+            data = b''.join(self.rfc2217.filter(data))
+            if data and self is self.adapter._controller:
+                self.adapter._received(data)
+
+        def connection_lost(self, exc):
+            self.adapter._client_lost(self)
+
+    def __init__(self, address="", port=7778, log=None, observer_high_water=65536):
+        self._loop = None
+        self._server = None
+        self._controller = None
+        self._observers = []
+        self.observer_high_water = observer_high_water
+        self.bound_port = None
+        self._server_error = None
+        super().__init__(address, port,
+                         logging.getLogger('AsyncRFC2217SerialAdapter') if not log else log)
+
+    def open(self):
+        if not self._is_open:
+            self._is_open = True
+            self._resume_readers()
+            self._loop = asyncio.new_event_loop()
+            ready = threading.Event()
+            self.thread_server = threading.Thread(
+                target=self.server_thread, args=(ready,), daemon=True
+            )
+            self.thread_server.start()
+            ready.wait()
+            if self._server_error is not None:
+                # The server never started; the thread already exited.
+                self.thread_server.join()
+                self._is_open = False
+                error, self._server_error = self._server_error, None
+                raise error
+
+    def close(self):
+        if self._is_open:
+            self._is_open = False
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self.thread_server.join()
+            self._interrupt_readers()
+
+    def server_thread(self, ready):
+        loop = self._loop
+        asyncio.set_event_loop(loop)
+        try:
+            self._server = loop.run_until_complete(loop.create_server(
+                lambda: AsyncRFC2217SerialAdapter.ClientProtocol(self),
+                self._address or None, self._port, reuse_address=True))
+            self.bound_port = self._server.sockets[0].getsockname()[1]
+            self._log.info("TCP/IP port: {}".format(self.bound_port))
+        except Exception as e:
+            # Raised by open() in the thread that is waiting for us.
+            self._server_error = e
+            loop.close()
+            return
+        finally:
+            ready.set()
+
+        try:
+            loop.run_forever()
+        finally:
+            self._server.close()
+            for client in [self._controller] + self._observers:
+                if client is not None:
+                    client.transport.close()
+            loop.run_until_complete(self._server.wait_closed())
+            loop.close()
+            self._log.debug("server_thread dead")
+
+    @property
+    def observers(self):
+        """Number of connected observer clients."""
+        return len(self._observers)
+
+    def _client_connected(self, client):
+        peer = client.transport.get_extra_info('peername')
+        if self._controller is None:
+            self._controller = client
+            port = RFC2217SerialAdapter.FakePort(self)
+            self._log.info('Controller connected by {}'.format(peer))
+        else:
+            self._observers.append(client)
+            port = AsyncRFC2217SerialAdapter.ObserverPort(self)
+            self._log.info('Observer connected by {}'.format(peer))
+        client.rfc2217 = serial.rfc2217.PortManager(
+            port, AsyncRFC2217SerialAdapter.TransportConnection(client.transport),
+            logger=logging.getLogger('rfc2217.server')
+        )
+
+    def _client_lost(self, client):
+        if client is self._controller:
+            self._controller = None
+            self._log.info('Controller disconnected')
+        elif client in self._observers:
+            self._observers.remove(client)
+            self._log.info('Observer disconnected')
+
+    def write(self, data):
+        if not self._is_open: raise serial.SerialException("Closed")
+        self._loop.call_soon_threadsafe(self._fan_out, data)
+
+    def _fan_out(self, data):
+        # Telnet IAC (0xFF) escaping, done once for every client.
+        data = bytes(data).replace(b'\xff', b'\xff\xff')
+        if self._controller is not None:
+            self._controller.transport.write(data)
+        for observer in list(self._observers):
+            if observer.transport.get_write_buffer_size() > self.observer_high_water:
+                self._log.warning("Observer fell behind; disconnecting it.")
+                self._observers.remove(observer)
+                observer.transport.abort()
+            else:
+                observer.transport.write(data)
+
+    def _check_modem_lines(self):
+        if self._loop is not None and self._is_open:
+            self._loop.call_soon_threadsafe(self._notify_modem_lines)
+
+    def _notify_modem_lines(self):
+        for client in [self._controller] + self._observers:
+            if client is not None:
+                client.rfc2217.check_modem_lines()
@@ -0,0 +1,250 @@
+"""Linux low latency settings for the 26A's serial port.
+
+USB serial adapters buffer received bytes for up to their latency timer
+(16 ms on FTDI chips) before passing them to the host, which usually
+dominates the time a command takes to be ACKed. tune_port lowers what
+the platform lets it lower:
+
+- latency_timer: the USB serial adapter's receive latency timer (sysfs,
+  FTDI and some others; usually needs root or a udev rule).
+- low_latency: ASYNC_LOW_LATENCY via TIOCSSERIAL, so the kernel passes
+  received bytes on immediately.
+- vmin_vtime: VMIN=1, VTIME=0, so a blocking read returns the first
+  byte that arrives. pyserial rewrites both whenever one of its port
+  settings (e.g. 'timeout') changes, so tune after changing those.
+- exclusive: TIOCEXCL, so no other process opens the port meanwhile.
+
+It also works out the baud rate the adapter really uses, since 10752
+baud is not a standard rate and many adapters can only approximate it.
+
+Settings other than 'exclusive' outlive the process. Ports that are not
+local character devices (e.g. rfc2217:// URLs) can not be tuned; every
+setting is then reported as unsupported.
+"""
+
+import errno
+import os
+import struct
+import sys
+
+# Statuses of a setting in a SerialTuning report
+APPLIED = 'applied'
+ALREADY = 'already set'
+UNSUPPORTED = 'unsupported'
+DENIED = 'permission denied'
+FAILED = 'failed'
+
+TARGET_BAUD = 10752
+
+# Baud rate error beyond which 11 bit frames may be misread.
+MAX_BAUD_DEVIATION = 2.0 # percent
+
+_ASYNC_LOW_LATENCY = 1 << 13
+# Offset of 'flags' in struct serial_struct (after type, line, port, irq).
+_SERIAL_FLAGS = struct.Struct('=i')
+_SERIAL_FLAGS_OFFSET = 16
+_SERIAL_STRUCT_SIZE = 128 # Larger than struct serial_struct on any architecture
+
+_TCGETS2 = 0x802C542A
+# c_ospeed in struct termios2 (4 flags, c_line, 19 control chars, c_ispeed).
+_TERMIOS2_OSPEED = struct.Struct('=I')
+_TERMIOS2_OSPEED_OFFSET = 40
+_TERMIOS2_SIZE = 44
+
+
+class SerialTuning(object):
+    """What tune_port changed.
+
+    'results' maps each setting to a (status, detail) tuple;
+    'actual_baud' is the rate the adapter really runs at (None if it
+    could not be determined) and 'baud_deviation' its error from the
+    requested rate in percent.
+    """
+
+    def __init__(self, port):
+        self.port = port
+        self.results = {}
+        self.driver = None
+        self.actual_baud = None
+        self.baud_deviation = None
+
+    def _set(self, setting, status, detail=''):
+        self.results[setting] = (status, detail)
+
+    @property
+    def complete(self):
+        """True if every setting is in effect."""
+        return all(status in (APPLIED, ALREADY) for status, _ in self.results.values())
+
+    def format(self):
+        lines = ["Serial tuning of %s (driver: %s):" % (self.port, self.driver or "unknown")]
+        for setting, (status, detail) in self.results.items():
+            lines.append("  %-14s %s%s" % (setting, status, " (%s)" % detail if detail else ""))
+        if self.actual_baud is not None:
+            lines.append("  %-14s %.1f (%+.3f%% from requested)" % (
+                'baud rate', self.actual_baud, self.baud_deviation))
+        else:
+            lines.append("  %-14s unknown" % 'baud rate')
+        return "\n".join(lines)
+
+    def __repr__(self):
+        return "<SerialTuning %s %s>" % (self.port, "complete" if self.complete else "partial")
+
+
+def _status_of(e):
+    if e.errno in (errno.EACCES, errno.EPERM, errno.EROFS):
+        return DENIED
+    if e.errno in (errno.ENOTTY, errno.EINVAL, errno.ENOENT, errno.ENOSYS):
+        return UNSUPPORTED
+    return FAILED
+
+
+def _sysfs_device(port):
+    """sysfs directory of the tty behind 'port' (e.g. /dev/ttyUSB0), or None."""
+    name = os.path.basename(os.path.realpath(port))
+    path = os.path.join('/sys/class/tty', name, 'device')
+    return path if os.path.isdir(path) else None
+
+
+def _tune_latency_timer(report, device, value):
+    path = device and os.path.join(device, 'latency_timer')
+    if path is None or not os.path.exists(path):
+        report._set('latency_timer', UNSUPPORTED, "no latency_timer in sysfs")
+        return
+    try:
+        with open(path) as f:
+            current = int(f.read())
+    except (OSError, ValueError) as e:
+        report._set('latency_timer', FAILED, str(e))
+        return
+    if current <= value:
+        report._set('latency_timer', ALREADY, "%d ms" % current)
+        return
+    try:
+        with open(path, 'w') as f:
+            f.write(str(value))
+        report._set('latency_timer', APPLIED, "%d ms, was %d ms" % (value, current))
+    except OSError as e:
+        report._set('latency_timer', _status_of(e), "still %d ms" % current)
+
+
+def _tune_low_latency(report, fd, fcntl, termios):
+    request = getattr(termios, 'TIOCGSERIAL', 0x541E)
+    buf = bytearray(_SERIAL_STRUCT_SIZE)
+    try:
+        fcntl.ioctl(fd, request, buf)
+        flags, = _SERIAL_FLAGS.unpack_from(buf, _SERIAL_FLAGS_OFFSET)
+        if flags & _ASYNC_LOW_LATENCY:
+            report._set('low_latency', ALREADY)
+            return
+        _SERIAL_FLAGS.pack_into(buf, _SERIAL_FLAGS_OFFSET, flags | _ASYNC_LOW_LATENCY)
+        fcntl.ioctl(fd, getattr(termios, 'TIOCSSERIAL', 0x541F), bytes(buf))
+        report._set('low_latency', APPLIED)
+    except OSError as e:
+        report._set('low_latency', _status_of(e), os.strerror(e.errno))
+
+
+def _tune_vmin_vtime(report, fd, termios):
+    try:
+        attrs = termios.tcgetattr(fd)
+        cc = attrs[6]
+        if cc[termios.VMIN] in (1, b'\x01') and cc[termios.VTIME] in (0, b'\x00'):
+            report._set('vmin_vtime', ALREADY, "VMIN=1 VTIME=0")
+            return
+        cc[termios.VMIN] = 1
+        cc[termios.VTIME] = 0
+        termios.tcsetattr(fd, termios.TCSANOW, attrs)
+        report._set('vmin_vtime', APPLIED, "VMIN=1 VTIME=0")
+    except termios.error as e:
+        report._set('vmin_vtime', FAILED, str(e))
+
+
+def _tune_exclusive(report, fd, fcntl, termios):
+    try:
+        fcntl.ioctl(fd, termios.TIOCEXCL)
+        report._set('exclusive', APPLIED)
+    except OSError as e:
+        report._set('exclusive', _status_of(e), os.strerror(e.errno))
+
+
+def ftdi_baud(baud, clock=3000000):
+    """Rate an FTDI FT232B or later chip runs at when asked for 'baud'.
+
+    Its divisor of the 3 MHz base clock has a 1/8 resolution.
+    """
+    divisor = round(clock * 8.0 / baud) / 8.0
+    return clock / divisor
+
+
+def _measure_baud(report, fd, fcntl, baudrate):
+    actual = None
+    if report.driver == 'ftdi_sio':
+        actual = ftdi_baud(baudrate)
+    else:
+        # Drivers report the rate they set in c_ospeed.
+        buf = bytearray(_TERMIOS2_SIZE)
+        try:
+            fcntl.ioctl(fd, _TCGETS2, buf)
+            actual = _TERMIOS2_OSPEED.unpack_from(buf, _TERMIOS2_OSPEED_OFFSET)[0] or None
+        except OSError:
+            pass
+    if actual is not None:
+        report.actual_baud = float(actual)
+        report.baud_deviation = (actual / float(baudrate) - 1.0) * 100.0
+
+
+def tune_port(ser, *, latency_timer=1, low_latency=True, vmin_vtime=True, exclusive=True,
+              log=None):
+    """Apply low latency settings to an open serial port.
+
+    Args:
+        ser (:obj:`serial.Serial`): Open port of a 26A.
+        latency_timer (int, optional): Receive latency timer in ms to
+            set on USB serial adapters; None leaves it alone.
+        low_latency (bool): Set ASYNC_LOW_LATENCY.
+        vmin_vtime (bool): Make blocking reads return single bytes.
+        exclusive (bool): Deny other processes access to the port.
+        log (:obj:`logging.Logger`, optional): logging object; the
+            report is logged to it.
+
+    Returns:
+        :obj:`SerialTuning`
+    """
+    port = getattr(ser, 'port', None) or str(ser)
+    report = SerialTuning(port)
+    fileno = getattr(ser, 'fileno', None)
+    fd = None
+    if sys.platform.startswith('linux') and fileno is not None:
+        try:
+            fd = fileno()
+        except Exception:
+            fd = None
+    if fd is None:
+        for setting in ('latency_timer', 'low_latency', 'vmin_vtime', 'exclusive'):
+            report._set(setting, UNSUPPORTED, "not a local Linux serial port")
+        return report
+
+    import fcntl
+    import termios
+
+    device = _sysfs_device(port)
+    if device is not None:
+        driver = os.path.join(device, 'driver')
+        if os.path.exists(driver):
+            report.driver = os.path.basename(os.path.realpath(driver))
+    if latency_timer is not None:
+        _tune_latency_timer(report, device, latency_timer)
+    if low_latency:
+        _tune_low_latency(report, fd, fcntl, termios)
+    if vmin_vtime:
+        _tune_vmin_vtime(report, fd, termios)
+    if exclusive:
+        _tune_exclusive(report, fd, fcntl, termios)
+    _measure_baud(report, fd, fcntl, getattr(ser, 'baudrate', TARGET_BAUD))
+
+    if log is not None:
+        log.info("%s", report.format())
+        if report.baud_deviation is not None and abs(report.baud_deviation) > MAX_BAUD_DEVIATION:
+            log.warning("%s runs at %.1f baud, %.2f%% off; the 26A may misread frames.",
+                        port, report.actual_baud, report.baud_deviation)
+    return report
@@ -0,0 +1,238 @@
+"""Memory mapped framebuffer shared by frame producing processes.
+
+The file holds one slot per producer. Each slot is written by a single
+process under a sequence lock: the sequence number is odd while a
+frame is being written and even once it is complete, so readers that
+see the same even number before and after copying a frame know they
+got a whole one. Producers never wait for anything; a FramePresenter
+in the process owning the ATT26A picks up the newest complete frame
+of all slots and sends only what changed.
+
+Put the file on a RAM backed filesystem such as /dev/shm.
+"""
+
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+
+from . import LED_MODES, Att26AError, DriverClosedError
+from . import framediff
+
+_MAGIC = b'A26F'
+_VERSION = 1
+
+# magic, version, slot count, reserved
+_HEADER = struct.Struct('<4sBBH')
+# sequence number, reserved, time stamp (monotonic ns)
+_SLOT = struct.Struct('<IIq')
+_SLOT_SIZE = _SLOT.size + 120
+
+_READ_RETRIES = 16
+
+
+class SharedFramebuffer(object):
+    """Memory mapped file of per producer frame slots.
+
+    The first process to open 'path' creates it with 'slots' slots;
+    later processes use the slot count stored in the file.
+
+    Args:
+        path (str): Location of the framebuffer file.
+        slots (int): Number of producer slots (1-255) when creating.
+    """
+
+    def __init__(self, path, slots=8):
+        if slots < 1 or slots > 255:
+            raise ValueError("slots must be between 1 and 255; not %d." % slots)
+        self.path = path
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            size = os.fstat(fd).st_size
+            if size >= _HEADER.size:
+                header = os.pread(fd, _HEADER.size, 0)
+                magic, version, nslots, _ = _HEADER.unpack(header)
+                if magic == _MAGIC and version == _VERSION and nslots and \
+                   size == _HEADER.size + nslots * _SLOT_SIZE:
+                    slots = nslots
+                else:
+                    size = 0
+            if size != _HEADER.size + slots * _SLOT_SIZE:
+                os.ftruncate(fd, 0)
+                os.ftruncate(fd, _HEADER.size + slots * _SLOT_SIZE)
+                os.pwrite(fd, _HEADER.pack(_MAGIC, _VERSION, slots, 0), 0)
+            self.__map = mmap.mmap(fd, _HEADER.size + slots * _SLOT_SIZE)
+        finally:
+            os.close(fd)
+        self.slots = slots
+
+    def close(self):
+        if not self.__map.closed:
+            self.__map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def producer(self, slot):
+        """Return a FrameProducer writing to 'slot'.
+
+        Every producer must use its own slot; the slot's sequence lock
+        only supports a single writer.
+        """
+        if slot >= self.slots or slot < 0:
+            raise ValueError("slot must be between 0 and %d; not %d." % (self.slots - 1, slot))
+        return FrameProducer(self.__map, _HEADER.size + slot * _SLOT_SIZE)
+
+    def read_slot(self, slot):
+        """Copy the last complete frame of 'slot'.
+
+        Returns:
+            tuple: (sequence number, time stamp in ns, 120 byte frame),
+            or None if the slot never held a frame or its producer is
+            stuck in the middle of a write.
+        """
+        offset = _HEADER.size + slot * _SLOT_SIZE
+        for _ in range(_READ_RETRIES):
+            seq, _, stamp = _SLOT.unpack_from(self.__map, offset)
+            if seq & 1:
+                time.sleep(0)
+                continue
+            frame = self.__map[offset + _SLOT.size:offset + _SLOT_SIZE]
+            seq2, _, stamp = _SLOT.unpack_from(self.__map, offset)
+            if seq == seq2:
+                return (seq, stamp, frame) if seq else None
+        return None
+
+    def latest(self):
+        """Return (slot, sequence number, stamp, frame) of the newest frame, or None."""
+        best = None
+        for slot in range(self.slots):
+            found = self.read_slot(slot)
+            if found is not None and (best is None or found[1] > best[2]):
+                best = (slot,) + found
+        return best
+
+
+class FrameProducer(object):
+    """Writer of one SharedFramebuffer slot. Never blocks."""
+
+    def __init__(self, buf, offset):
+        self.__map = buf
+        self.__offset = offset
+        self.__seq, _, _ = _SLOT.unpack_from(buf, offset)
+        self.__seq += self.__seq & 1 # Recover from a writer that died mid-frame.
+
+    def write(self, modes):
+        """Publish a 120 LED frame of att26a.LED_MODES values."""
+        if len(modes) != 120:
+            raise ValueError("A frame holds exactly 120 LED modes, not %d." % len(modes))
+        for state in set(modes):
+            if state not in LED_MODES:
+                raise ValueError("state can either be 0x0, 0x8, 0xD, or 0xF, not %s"
+                                 % hex(state))
+        offset = self.__offset
+        seq = self.__seq
+        struct.pack_into('<I', self.__map, offset, (seq + 1) & 0xFFFFFFFF)
+        self.__map[offset + _SLOT.size:offset + _SLOT_SIZE] = bytes(modes)
+        struct.pack_into('<q', self.__map, offset + 8, time.monotonic_ns())
+        # Wraps from 0xFFFFFFFE to 2 since 0 means no frame was ever written.
+        seq = (seq + 2) & 0xFFFFFFFF or 2
+        struct.pack_into('<I', self.__map, offset, seq)
+        self.__seq = seq
+
+
+class FramePresenter(object):
+    """Thread sending the newest frame of a SharedFramebuffer to a 26A.
+
+    Args:
+        driver (:obj:`att26a.ATT26A`): Driver of a freshly reset console.
+        framebuffer (:obj:`SharedFramebuffer`): Framebuffer to present.
+        interval (float): Seconds between polls of the framebuffer
+            while no new frame is available.
+        cost (:obj:`att26a.framediff.CommandCost`, optional): cost model.
+        phase_window (tuple, optional): (offset, width) in seconds of
+            the window after each keep-alive in which frames are
+            started (see att26a.keepalive.KeepAliveClock.window_start);
+            None sends frames as soon as they are found.
+        log (:obj:`logging.Logger`, optional): logging object.
+    """
+
+    def __init__(self, driver, framebuffer, *, interval=0.005, cost=None, phase_window=None,
+                 log=None):
+        self._log = logging.getLogger('att26a') if not log else log
+        self.driver = driver
+        self.framebuffer = framebuffer
+        self.interval = interval
+        self.cost = cost
+        self.phase_window = phase_window
+        self.presented = 0
+        self.commands = 0
+        self._shown = bytearray(120)
+        self._last = None
+        self._running = False
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    @property
+    def shown(self):
+        """Copy of the frame last sent to the device."""
+        return bytes(self._shown)
+
+    def start(self):
+        if not self._running:
+            self._running = True
+            self._thread = threading.Thread(target=self._thread_func, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._running:
+            self._running = False
+            self._thread.join()
+
+    def present(self):
+        """Send the newest frame if it was not sent yet.
+
+        Returns:
+            bool: True if a new frame was found.
+        """
+        latest = self.framebuffer.latest()
+        if latest is None or latest[:2] == self._last:
+            return False
+        slot, seq, stamp, frame = latest
+        if any(b not in LED_MODES for b in frame):
+            self._log.warning("Dropping frame with invalid LED modes from slot %d.", slot)
+            self._last = (slot, seq)
+            return True
+        if self.phase_window is not None:
+            self.driver.keepalive.wait_window(*self.phase_window)
+        # _shown tracks every acknowledged command, so a failed frame
+        # is simply diffed again against what made it to the device.
+        sent = framediff.send_frame(self.driver, self._shown, frame, cost=self.cost)
+        self._last = (slot, seq)
+        self.presented += 1
+        self.commands += sent
+        return True
+
+    def _thread_func(self):
+        while self._running:
+            try:
+                if self.present():
+                    continue
+            except DriverClosedError:
+                self._log.error("Driver closed; frame presenter stopping.")
+                self._running = False
+                break
+            except Att26AError as e:
+                self._log.warning("Presenting frame failed (%s); retrying.", e)
+            time.sleep(self.interval)
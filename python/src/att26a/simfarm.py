@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+
+"""Headless farm of simulated AT&T 26A consoles on one asyncio loop.
+
+Every console is an unthreaded Att26aSim served as an RFC2217 port on
+its own TCP port, so drivers connect with 'rfc2217://host:port'. All
+consoles share one keep-alive timer, and can generate synthetic button
+presses. A line based JSON control port reports the state of every
+console and injects button presses:
+
+    {"cmd": "dump"}
+    {"cmd": "press", "console": 3, "btn": 42}
+    {"cmd": "buttons", "console": 3, "rate": 2.5}   (omit console for all)
+    {"cmd": "quit"}
+"""
+
+import asyncio
+import json
+import logging
+import random
+import socket
+
+import serial.rfc2217
+
+from .serial_adapter import RFC2217SerialAdapter
+from .simulator import Att26aSim, KEEPALIVE_PERIOD
+
+
+class FarmConsole(object):
+    """One simulated console and the RFC2217 client connected to it.
+
+    The console is the simulator's serial port, but only for writing:
+    its Att26aSim is unthreaded and never reads, and data from the
+    client is pushed into it by feed() from the event loop.
+    """
+
+    def __init__(self, index, port, log):
+        self.index = index
+        self.port = port
+        self._log = log
+
+        # Modem line state, read and set through RFC2217SerialAdapter.FakePort.
+        self._cts = False
+        self._dsr = False
+        self._ri = False
+        self._cd = False
+        self._baudrate = 10752
+        self._bytesize = 8
+        self._parity = 'O'
+        self._stopbits = 1
+        self._xonxoff = False
+        self._rtscts = False
+        self._break_condition = False
+        self._dtr = False
+        self._rts = False
+        self._dtr_listeners = []
+
+        self.transport = None
+        self.rfc2217 = None
+        self.button_rate = 0.0
+        self.buttons_sent = 0
+        self._button_timer = None
+
+        self.sim = Att26aSim(self, log=log, threaded=False)
+
+    # Serial port interface used by the simulator (write only; see feed).
+    def write(self, data):
+        if self.transport is not None:
+            self.transport.write(b''.join(self.rfc2217.escape(data)))
+
+    def reset_input_buffer(self):
+        pass # Nothing is buffered; feed() hands data straight to the simulator.
+
+    def _set_dtr(self, value):
+        self._dtr = value
+        for listener in self._dtr_listeners:
+            listener(value)
+
+    def add_dtr_listener(self, listener):
+        self._dtr_listeners.append(listener)
+
+    # Connection interface used by the RFC2217 PortManager.
+    class _TelnetConnection(object):
+        def __init__(self, console):
+            self.console = console
+
+        def write(self, data):
+            if self.console.transport is not None:
+                self.console.transport.write(data)
+
+    def attach(self, transport):
+        self.transport = transport
+        self.rfc2217 = serial.rfc2217.PortManager(
+            RFC2217SerialAdapter.FakePort(self),
+            FarmConsole._TelnetConnection(self),
+            logger=logging.getLogger('rfc2217.server') if
+                self._log.isEnabledFor(logging.DEBUG) else None)
+
+    def detach(self):
+        self.transport = None
+        self.rfc2217 = None
+
+    def feed(self, data):
+        self.sim._rx(b''.join(self.rfc2217.filter(data)))
+
+    def press(self, btn_id):
+        if self.transport is not None:
+            self.sim.send_btn_press(btn_id)
+            self.buttons_sent += 1
+
+    def state(self):
+        leds, changes = self.sim.snapshot()
+        return {
+            'console': self.index,
+            'port': self.port,
+            'connected': self.transport is not None,
+            'in_reset': self.sim.in_reset,
+            'factory_test': self.sim.factory_test,
+            'io_enabled': self.sim.io_enabled,
+            'changes': changes,
+            'buttons_sent': self.buttons_sent,
+            'leds': leds.hex(),
+        }
+
+
+class _ConsoleProtocol(asyncio.Protocol):
+    def __init__(self, console):
+        self.console = console
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        if self.console.transport is not None:
+            self.console._log.warning("Console %d already has a client; refusing another.",
+                                      self.console.index)
+            transport.close()
+            return
+        transport.get_extra_info('socket').setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.console.attach(transport)
+        self.console._log.info("Console %d connected", self.console.index)
+
+    def data_received(self, data):
+        if self.console.transport is self.transport:
+            self.console.feed(data)
+
+    def connection_lost(self, exc):
+        if self.console.transport is self.transport:
+            self.console.detach()
+            self.console._log.info("Console %d disconnected", self.console.index)
+
+
+class SimFarm(object):
+    """Host 'count' simulated consoles on consecutive TCP ports.
+
+    Args:
+        count (int): Number of consoles.
+        base_port (int): TCP port of console 0; console N uses base_port + N.
+        address (str): Address to listen on.
+        control_port (int, optional): TCP port of the JSON control interface.
+        button_rate (float): Synthetic button presses per second, per console.
+        log (:obj:`logging.Logger`, optional): logging object.
+    """
+
+    def __init__(self, count, base_port=7778, address="localhost", control_port=None,
+                 button_rate=0.0, log=None):
+        self._log = logging.getLogger('att26asimfarm') if not log else log
+        self.address = address
+        self.control_port = control_port
+        self.consoles = [FarmConsole(i, base_port + i, self._log) for i in range(count)]
+        for console in self.consoles:
+            console.button_rate = button_rate
+        self._servers = []
+        self._loop = None
+        self._done = None
+
+    async def serve(self):
+        """Run the farm until a 'quit' command arrives."""
+        self._loop = asyncio.get_running_loop()
+        self._done = self._loop.create_future()
+
+        for console in self.consoles:
+            self._servers.append(await self._loop.create_server(
+                lambda console=console: _ConsoleProtocol(console),
+                self.address, console.port, reuse_address=True))
+            self._schedule_button(console)
+        if self.control_port is not None:
+            self._servers.append(await asyncio.start_server(
+                self._control_client, self.address, self.control_port, reuse_address=True))
+
+        self._log.info("Serving %d consoles on ports %d-%d", len(self.consoles),
+                       self.consoles[0].port, self.consoles[-1].port)
+        self._loop.call_soon(self._keepalive_tick, self._loop.time())
+        try:
+            await self._done
+        finally:
+            for server in self._servers:
+                server.close()
+            for console in self.consoles:
+                if console.transport is not None:
+                    console.transport.close()
+
+    def stop(self):
+        if self._done is not None and not self._done.done():
+            self._done.set_result(None)
+
+    def _keepalive_tick(self, when):
+        for console in self.consoles:
+            if console.transport is not None:
+                console.sim.send_keepalive()
+        # Schedule against the ideal time so the period does not drift.
+        when += KEEPALIVE_PERIOD
+        self._loop.call_at(max(when, self._loop.time()), self._keepalive_tick, when)
+
+    def _schedule_button(self, console):
+        if console._button_timer is not None:
+            console._button_timer.cancel()
+            console._button_timer = None
+        if console.button_rate > 0:
+            console._button_timer = self._loop.call_later(
+                random.expovariate(console.button_rate), self._button_tick, console)
+
+    def _button_tick(self, console):
+        console._button_timer = None
+        console.press(random.randrange(120))
+        self._schedule_button(console)
+
+    def set_button_rate(self, rate, console=None):
+        targets = self.consoles if console is None else [self.consoles[console]]
+        for target in targets:
+            target.button_rate = rate
+            self._schedule_button(target)
+
+    def dump(self):
+        return {'consoles': [console.state() for console in self.consoles]}
+
+    def handle_command(self, request):
+        cmd = request.get('cmd')
+        if cmd == 'dump':
+            return self.dump()
+        elif cmd == 'press':
+            self.consoles[int(request['console'])].press(int(request['btn']))
+            return {'ok': True}
+        elif cmd == 'buttons':
+            console = request.get('console')
+            self.set_button_rate(float(request['rate']),
+                                 None if console is None else int(console))
+            return {'ok': True}
+        elif cmd == 'quit':
+            self.stop()
+            return {'ok': True}
+        raise ValueError("Unknown command %r" % cmd)
+
+    async def _control_client(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    reply = self.handle_command(json.loads(line))
+                except (ValueError, KeyError, IndexError, TypeError) as e:
+                    reply = {'ok': False, 'error': str(e)}
+                writer.write(json.dumps(reply).encode() + b'\n')
+                await writer.drain()
+        except asyncio.CancelledError:
+            pass # The farm is shutting down.
+        finally:
+            writer.close()
+
+
+def main_cli():
+    import argparse
+    from .clihelper import VAction, get_verbose_level
+
+    parser = argparse.ArgumentParser(description='Headless farm of simulated AT&T 26As')
+    parser.add_argument('-n', '--consoles', type=int, default=1,
+                        help='Number of consoles to simulate.')
+    parser.add_argument('--port', type=int, default=7778,
+                        help='rfc2217 port of the first console; the rest follow it.')
+    parser.add_argument('--addr', type=str, default="localhost",
+                        help='Address to host the rfc2217 servers on.')
+    parser.add_argument('--control-port', type=int, default=None,
+                        help='Port of the JSON control interface.')
+    parser.add_argument('--button-rate', type=float, default=0.0,
+                        help='Synthetic button presses per second per console.')
+    parser.add_argument('-v', nargs='?', action=VAction, dest='verbose', default=0,
+                        help="Provide debug information. More than one v supported")
+    args = parser.parse_args()
+
+    loglevel = get_verbose_level(args.verbose)
+    logging.basicConfig(level=loglevel)
+    logging.getLogger('att26asimfarm').setLevel(loglevel)
+
+    farm = SimFarm(args.consoles, args.port, args.addr, args.control_port, args.button_rate)
+    try:
+        asyncio.run(farm.serve())
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main_cli()
@@ -1,8 +1,8 @@
-import collections
+import itertools
 import threading
-import math
 import time
 import logging
+import serial
 
 LED_OFF = 0x0
 LED_BLINK1 = 0x8
@@ -14,10 +14,67 @@ LED_MODES = (LED_OFF, LED_BLINK1, LED_BLINK2, LED_ON)
 MSG_KA = 0xFF # Keep Alive
 MSG_ACK = 0xFD # Acknowledge
 
+KEEPALIVE_PERIOD = 0.026
+
+def _shift7_right(b):
+    return ((b & 0x7E) >> 1) | ((b & 0x01) << 6)
+
+_SHIFT7_RIGHT = bytes(_shift7_right(b) for b in range(128))
+
+# Maps range write bits (0 or 1) to LED modes.
+_ONOFF_MODES = bytes((LED_OFF, LED_ON)) + bytes(254)
+
+# The 7 LED states held by a range data byte, high bit to low bit.
+_RANGE_BITS = tuple(tuple(bool((b >> bit) & 1) for bit in range(6, -1, -1))
+                    for b in range(128))
+
+class SimTiming(object):
+    """Wire timing of a simulated 26A.
+
+    Without a timing model the simulator answers instantly. With one,
+    every byte takes as long as it would on a real serial line, every
+    command takes 'command_delay' seconds to process before it is
+    ACKed, and frames longer than the 26A's receive buffer wrap
+    around and overwrite their own start.
+
+    Args:
+        baudrate (int): Line speed in bits per second.
+        command_delay (float): Seconds between receiving a frame's
+            0xFF and sending its response.
+        rx_buffer_size (int): Size of the 26A's frame buffer.
+        bits_per_byte (int): Start, data, parity and stop bits.
+    """
+
+    def __init__(self, baudrate=10752, command_delay=0.0005, rx_buffer_size=16,
+                 bits_per_byte=11):
+        self.baudrate = baudrate
+        self.command_delay = command_delay
+        self.rx_buffer_size = rx_buffer_size
+        self.bits_per_byte = bits_per_byte
+
+    @property
+    def byte_time(self):
+        return self.bits_per_byte / float(self.baudrate)
+
+
+def _sleep_until(deadline):
+    delay = deadline - time.monotonic()
+    if delay > 0:
+        time.sleep(delay)
+
+
 class Att26aSimBase(object):
-    def __init__(self, serialdev, log=None):
+    def __init__(self, serialdev, log=None, *, timing=None, threaded=True):
         self.__ser = serialdev
-        self.__recvbuff = collections.deque(maxlen=16)
+        self.__threaded = threaded
+        self.__frame = bytearray()
+
+        self.__timing = timing
+        self.__txlock = threading.Lock()
+        self.__tx_free = 0.0 # When the (simulated) UART finishes sending.
+        self.__rx_clock = 0.0 # When the last received byte finished arriving.
+
+        self.__in_reset = False
 
         self.__do_recvthread = False
         self.__recvthread = None
@@ -27,13 +84,22 @@ class Att26aSimBase(object):
 
         self._log = logging.getLogger('att26asim') if not log else log
 
+        # Ports that report DTR changes (RFC2217SerialAdapter) drive the reset line.
+        if hasattr(serialdev, 'add_dtr_listener'):
+            serialdev.add_dtr_listener(self._on_dtr)
+
         self.reset()
 
     def reset(self):
+        # Unthreaded simulators are fed by their host through _rx() and
+        # send_keepalive().
+        if not self.__threaded:
+            return
+
         # Terminate the reader thread
         self.__do_recvthread = False
         if self.__recvthread is not None:
-            self.__recvthread.wait(0.5)
+            self.__recvthread.join(0.5)
 
         # (Re)start the reader thread
         self.__do_recvthread = True
@@ -43,7 +109,7 @@ class Att26aSimBase(object):
         # Terminate the writer thread
         self.__do_keepalivethread = False
         if self.__keepalivethread is not None:
-            self.__keepalivethread.wait(0.5)
+            self.__keepalivethread.join(0.5)
 
         # (Re)start the reader thread
         self.__do_keepalivethread = True
@@ -51,25 +117,76 @@ class Att26aSimBase(object):
             daemon=True, target=self.__keepalivethread_func)
         self.__keepalivethread.start()
 
+    @property
+    def timing(self):
+        return self.__timing
+
+    @property
+    def in_reset(self):
+        """True while the reset line (DTR) holds the 26A in reset."""
+        return self.__in_reset
+
+    def _on_dtr(self, dtr):
+        """Follow the reset line: DTR low holds the 26A in reset."""
+        if not dtr and not self.__in_reset:
+            self._log.info("Entering reset")
+            self.__in_reset = True
+            self.__frame.clear()
+            self.on_reset()
+        elif dtr and self.__in_reset:
+            self._log.info("Leaving reset")
+            self.__in_reset = False
+
     def __recvthread_func(self):
-        retdata = bytearray()
+        ser = self.__ser
         while self.__do_recvthread:
             try:
-                data = self.__ser.read(1) # Blocks
+                # Take everything already buffered, or block for one byte.
+                data = ser.read(getattr(ser, 'in_waiting', 0) or 1)
             except serial.serialutil.SerialException as e:
-                self._log.error("ATT26A closing due to exception on receiver thread: '%s'" % e)
-                self._close(dojoin=False)
+                self._log.error("Simulator receiver thread terminating due to exception: '%s'", e)
+                break
 
-            self._rx(data)
+            if self.__timing is not None:
+                # The bytes started arriving no earlier than the last ones ended.
+                self.__rx_clock = max(self.__rx_clock,
+                                      time.monotonic() - len(data) * self.__timing.byte_time)
+            if not self.__in_reset:
+                self._rx(data)
 
     def __keepalivethread_func(self):
         self._log.info("Simulator Keepalive Message Thread STARTING")
         while self.__do_keepalivethread:
-            self.__ser.write(b'\xFF')
-            time.sleep(0.026)
+            try:
+                self.send_keepalive()
+            except serial.serialutil.SerialException as e:
+                self._log.error("Simulator keepalive thread terminating due to exception: '%s'", e)
+                break
+            time.sleep(KEEPALIVE_PERIOD)
 
         self._log.info("Simulator Keepalive Message Thread TERMINATING")
 
+    def send_keepalive(self):
+        if not self.__in_reset:
+            self._write(b'\xFF')
+
+    def _write(self, data):
+        """Send 'data' to the host, taking as long as the wire would."""
+        if self.__timing is None:
+            self.__ser.write(data)
+            return
+        with self.__txlock:
+            now = time.monotonic()
+            self.__tx_free = max(self.__tx_free, now) + len(data) * self.__timing.byte_time
+            _sleep_until(self.__tx_free)
+            self.__ser.write(data)
+
+    def _wait_received(self, nbytes):
+        """With a timing model, wait until 'nbytes' more bytes made it over the wire."""
+        if self.__timing is not None:
+            self.__rx_clock += nbytes * self.__timing.byte_time
+            _sleep_until(self.__rx_clock)
+
     @staticmethod
     def _shift7_left(b):
         return ((b << 1) & 0x7E) | ((b & 0x40) >> 6)
@@ -80,71 +197,98 @@ class Att26aSimBase(object):
 
     @staticmethod
     def _check_msg(msg):
+        """Check the hash (last byte) of a frame without its 0xFF terminator."""
         h = 0x7F
         for b in msg[1:-1]:
             h ^= b
         return h == msg[-1]
 
     def send_btn_press(self, btn_id):
-        self.__ser.write(bytes((Att26aSimBase._shift7_left(btn_id),)))
+        if self.__in_reset:
+            return
+        self._write(bytes((Att26aSimBase._shift7_left(btn_id),)))
 
     def _rx(self, data):
-        for b in data:
-            self._rx_byte(b)
+        """Parse a chunk of bytes received from the host.
+
+        0x85 and 0xA5 restart the frame, 0xFF ends it. Without a timing
+        model only the last 16 bytes of a frame are kept; with one,
+        longer frames wrap around the receive buffer like on the 26A.
+        """
+        frame = self.__frame
+        wrap = self.__timing is not None
+        bufsize = self.__timing.rx_buffer_size if wrap else 16
+        pos, end = 0, len(data)
+        while pos < end:
+            stop = data.find(0xFF, pos)
+            seg_end = end if stop == -1 else stop
+
+            head = max(data.rfind(0x85, pos, seg_end), data.rfind(0xA5, pos, seg_end))
+            if head >= 0:
+                frame[:] = data[head:seg_end]
+            else:
+                frame += data[pos:seg_end]
+            if len(frame) > bufsize:
+                if wrap:
+                    # Drop whole buffer laps; the write position is unchanged.
+                    del frame[:(len(frame) - 1) // bufsize * bufsize - bufsize]
+                else:
+                    del frame[:-bufsize]
+
+            if stop == -1:
+                break
+            self._wait_received(stop + 1 - pos)
+            if len(frame) > bufsize:
+                # The write position wrapped over the start of the frame.
+                split = len(frame) - len(frame) % bufsize
+                frame[:] = frame[split:] + frame[len(frame) - bufsize:split]
+            if len(frame) >= 2:
+                if Att26aSimBase._check_msg(frame):
+                    self._msg_dispatch(bytes(frame[:-1]))
+                else:
+                    self._log.warning("Message failed verification, DROP!")
+            frame.clear()
+            pos = stop + 1
+        if pos < end:
+            self._wait_received(end - pos)
 
     def _rx_byte(self, b):
-        if 0 > b > 255: raise ValueError("Invalid byte value")
-        if b == 0xFF:
-            if len(self.__recvbuff) >= 2:
-                msg = b"".join(self.__recvbuff)
-                if not Att26aSimBase._check_msg(msg):
-                    self._log.warn("Message failed verification, DROP!")
-                else:
-                    self._msg_dispatch(msg[:-1])
-        elif b == 0x85 or b == 0xA5:
-            self.__recvbuff.clear()
-            self.__recvbuff.append(b.to_bytes(1, 'little'))
-        else:
-            self.__recvbuff.append(b.to_bytes(1, 'little'))
+        if not 0 <= b <= 255: raise ValueError("Invalid byte value")
+        self._rx(bytes((b,)))
 
     def _msg_dispatch(self, msg):
-        self._log.debug("Message:", msg)
+        if self.__timing is not None and self.__timing.command_delay:
+            time.sleep(self.__timing.command_delay)
+        debug = self._log.isEnabledFor(logging.DEBUG)
+        if debug:
+            self._log.debug("Message: %s", msg.hex())
         if len(msg) < 3:
             self._tx_ack()
             return
         msgcat, msgtype, msgparam = msg[0], msg[1], msg[2:]
 
         if msgcat == 0x85: # WRITE
-            self._log.debug("Command type is WRITE")
             if msgtype == 0x07: # Set LED range ON/OFF (0-99)
-                self._log.debug("TRYING TO DO LED RANGE", msgparam, len(msgparam))
-                if len(msgparam) >= 3:
-                    self._log.debug("Still trying")
-                    led_id = Att26aSimBase._shift7_right(msgparam[0])
+                if len(msgparam) >= 2:
+                    led_id = _SHIFT7_RIGHT[msgparam[0] & 0x7F]
                     led_count = msgparam[1]
+                    # Counts are sent minus one, except 70 (71 is not expressible).
+                    if led_count != 70:
+                        led_count += 1
                     led_data = msgparam[2:]
-                    self._log.debug(led_id, led_count, led_data)
-                    self._log.debug("CHECKING", 0 <= led_id <= 99,
-                          (1 <= led_count <= 70 or 72 <= led_count <= 76),
-                          math.ceil(led_count/7.00) == len(led_data))
-                    if 0 <= led_id <= 99 and \
-                       (1 <= led_count <= 70 or 72 <= led_count <= 76) and \
-                       math.ceil(led_count/7.00) == len(led_data):
-                        state_array = []
-                        for d in led_data:
-                            if d & 0x80:
-                                self._log.debug("Invalid set led range data byte %x"%d)
-                                break
-                            for bit in range(6,-1,-1):
-                                self._log.debug("LEDCOUNT", led_count)
-                                if led_count == -1: break
-                                led_count -= 1;
-                                state_array.append(bool((d >> bit) & 1))
-                        else:
-                            self.on_set_led_range_state(led_id, state_array)
+                    if led_id <= 99 and led_count <= 77 and \
+                       (led_count + 6) // 7 == len(led_data) and \
+                       max(led_data) < 0x80:
+                        states = list(itertools.chain.from_iterable(
+                            _RANGE_BITS[d] for d in led_data))
+                        del states[led_count:]
+                        self.on_set_led_range_state(led_id, states)
+                    elif debug:
+                        self._log.debug("Invalid set led range: id %d, count %d, data %s",
+                                        led_id, led_count, led_data.hex())
             elif (msgtype & 0xF0) == 0x20: # Set LED state (0-119)
                 led_state = (msgtype & 0x0F)
-                led_id = Att26aSimBase._shift7_right(msgparam[0])
+                led_id = _SHIFT7_RIGHT[msgparam[0] & 0x7F]
                 if led_state in LED_MODES and 0 <= led_id <= 119:
                     self.on_set_led_state(led_state, led_id)
             elif msgtype == 0x10 and \
@@ -161,80 +305,140 @@ class Att26aSimBase(object):
                 self.on_set_IO_enable(False)
         elif msgcat == 0xA5: # READ
             if msgtype == 0x20: # Return state of LED (100-119)
-                led_id = Att26aSimBase._shift7_right(msgparam[0])
+                led_id = _SHIFT7_RIGHT[msgparam[0] & 0x7F]
                 if 100 <= led_id <= 119:
                     led_state = self.on_get_led_status(led_id) & 0x03
                     need_2nd_byte = led_id > 107
-                    self._log.debug("Need 2nd byte: %s"%\
-                                    ("YES" if need_2nd_byte else "NO"))
-                    self._log.debug("LED STATE:", led_state)
-                    data_out = bytes(0x80 | (led_state << 4) | \
-                                     (need_2nd_byte << 3) |\
-                                     (0 if need_2nd_byte else ((led_id-100) & 0x07)))
+                    if debug:
+                        self._log.debug("LED %d state %d, 2nd byte: %s",
+                                        led_id, led_state, need_2nd_byte)
+                    data_out = bytes((0x80 | (led_state << 4) | (need_2nd_byte << 3) |
+                                      (0x07 if need_2nd_byte else (led_id - 100)),))
                     if need_2nd_byte:
-                        data_out += bytes(0x80 | ((led_id - 100) & 0x1F))
+                        data_out += bytes((0x80 | ((led_id - 100) & 0x1F),))
 
                     data_out += bytes((MSG_ACK,))
 
-                    self.__ser.write(data_out)
+                    self._write(data_out)
                     return
-            else:
-                self._log.warn("UNKNOWN COMMAND CATEGORY")
+        else:
+            self._log.warning("UNKNOWN COMMAND CATEGORY")
 
         self._tx_ack()
 
     def _tx_ack(self):
-        self.__ser.write(b'\xFD')
+        self._write(b'\xFD')
 
+    def on_reset(self):
+        self._log.info("Reset: all LEDs off, IO driver on, factory test off")
 
     def on_set_led_range_state(self, start_ledid, states_on_off):
-        self._log.info("Setting led range starting at %d:" % start_ledid, states_on_off)
+        self._log.info("Setting led range starting at %d: %s", start_ledid, states_on_off)
 
     def on_set_led_state(self, state, ledID):
-        self._log.info("Setting led %d's state to %d"%(ledID, state))
+        self._log.info("Setting led %d's state to %d", ledID, state)
 
     def on_set_factory_test_mode_enable(self, enable):
-        self._log.info("%s factory test" % "Enable" if enable else "Disable")
+        self._log.info("%s factory test", "Enable" if enable else "Disable")
 
     def on_set_IO_enable(self, enable):
-        self._log.info("%s IO driver" % "Enable" if enable else "Disable")
+        self._log.info("%s IO driver", "Enable" if enable else "Disable")
 
     def on_get_led_status(self, ledID):
-        self._log.info("Reading led %d state" % ledID)
+        self._log.info("Reading led %d state", ledID)
         return False
 
 
 class Att26aSim(Att26aSimBase):
-    def __init__(self, serialdev):
-        super().__init__(serialdev)
+    """Headless simulator that keeps the complete state of the 26A.
 
-        self.__ledstates = [LED_MODES.index(LED_OFF)]*120
+    LED modes (att26a.LED_OFF, LED_BLINK1, LED_BLINK2 or LED_ON) are
+    kept in a 120 byte bytearray indexed by LED ID. Every applied
+    command increments a change counter.
+    """
+
+    def __init__(self, serialdev, **kwargs):
+        self.__lock = threading.Lock()
+        self.__leds = bytearray(120)
+        self.__changes = 0
         self._factory_test = False
         self._io_enabled = True
 
+        super().__init__(serialdev, **kwargs)
+
+    def snapshot(self):
+        """Return a read-only view of the LED modes and the change counter.
+
+        The view is not a copy: it always shows the current state. If
+        the counter read again later still matches, the view has not
+        changed in between.
+
+        Returns:
+            tuple: (memoryview of 120 LED modes, change counter)
+        """
+        with self.__lock:
+            return memoryview(self.__leds).toreadonly(), self.__changes
+
+    @property
+    def changes(self):
+        return self.__changes
+
+    @property
+    def factory_test(self):
+        return self._factory_test
+
+    @property
+    def io_enabled(self):
+        return self._io_enabled
+
+    def on_reset(self):
+        super().on_reset()
+        with self.__lock:
+            self.__leds[:] = bytes(120)
+            self._factory_test = False
+            self._io_enabled = True
+            self.__changes += 1
+
     def on_set_led_range_state(self, start_ledid, states_on_off):
-        self._log.info("Setting led range starting at %d: (%d)" % (start_ledid, len(states_on_off)), states_on_off)
+        self._log.debug("Setting led range starting at %d: (%d)",
+                        start_ledid, len(states_on_off))
+        modes = bytes(states_on_off).translate(_ONOFF_MODES)
+        first = min(len(modes), 100 - start_ledid)
+        with self.__lock:
+            self.__leds[start_ledid:start_ledid + first] = modes[:first]
+            # Writes past LED 99 wrap around to LED 0.
+            self.__leds[:len(modes) - first] = modes[first:]
+            self.__changes += 1
 
     def on_set_led_state(self, state, ledID):
-        self._log.info("Setting led %d's state to %d"%(ledID, state))
-        self.__ledstates[ledID] = LED_MODES.index(state)
+        self._log.debug("Setting led %d's state to %d", ledID, state)
+        with self.__lock:
+            self.__leds[ledID] = state
+            self.__changes += 1
 
     def on_set_factory_test_mode_enable(self, enable):
-        self._log.info("%s factory test" % "Enable" if enable else "Disable")
-        self._factory_test = enable
+        self._log.info("%s factory test", "Enable" if enable else "Disable")
+        with self.__lock:
+            self._factory_test = enable
+            self.__changes += 1
 
     def on_set_IO_enable(self, enable):
-        self._log.info("%s IO driver" % "Enable" if enable else "Disable")
-        self._io_enabled = enable
+        self._log.info("%s IO driver", "Enable" if enable else "Disable")
+        with self.__lock:
+            self._io_enabled = enable
+            self.__changes += 1
 
     def on_get_led_status(self, ledID):
-        self._log.info("Reading led %d state" % ledID)
-        return self.__ledstates[ledID]
+        self._log.debug("Reading led %d state", ledID)
+        return LED_MODES.index(self.__leds[ledID])
 
 class Att26aSimEventTester(Att26aSimBase):
-    def __init__(self, serialdev):
-        super().__init__(serialdev)
+    def __init__(self, serialdev, **kwargs):
         self._events = []
+        super().__init__(serialdev, **kwargs)
+
+    def on_reset(self):
+        self._events.append(("reset",))
 
     def on_set_led_range_state(self, start_ledid, states_on_off):
         self._events.append(("set_led_range_state", start_ledid, states_on_off))
@@ -249,5 +453,5 @@ class Att26aSimEventTester(Att26aSimBase):
         self._events.append(("set_IO_enable", enable))
 
     def on_get_led_status(self, ledID):
-        self._events.append(("get_led_status", enable))
+        self._events.append(("get_led_status", ledID))
         return False
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+
+"""Button storms: press buttons of a simulated 26A while LED writes
+saturate the link, and measure what the driver makes of it.
+
+A ButtonStorm presses buttons through a simulator's send_btn_press at
+a configurable rate and distribution, timestamping every press. While
+it runs, run_storm keeps the driver busy with LED writes and reads the
+presses back with get_btn_press, then reports the latency from press
+to get_btn_press returning, the ACK latency of the writes, and the
+presses that were dropped and the writes that stalled:
+
+    att26a-storm sim --rate 100 --distribution burst --duration 20
+    att26a-storm emu --rate 10
+"""
+
+import random
+import threading
+import time
+
+from . import Att26AProtocolError, CommandTimeoutError, DriverClosedError
+from . import ButtonTimeoutError, LED_MODES
+from .bench import WorkloadResult
+
+DISTRIBUTIONS = ('poisson', 'periodic', 'burst')
+
+
+def _sleep_until(deadline):
+    delay = deadline - time.monotonic()
+    if delay > 0:
+        time.sleep(delay)
+
+
+class ButtonStorm(object):
+    """Thread pressing random buttons of a simulated 26A.
+
+    Args:
+        sim: Simulated console (an :obj:`att26a.simulator.Att26aSimBase`
+            or :obj:`att26a.firmwaresim.Att26aFirmwareSim`).
+        rate (float): Mean presses per second.
+        distribution (str): 'poisson' (exponentially distributed gaps),
+            'periodic' (fixed gaps) or 'burst' ('burst' presses back to
+            back, 'burst'/'rate' seconds apart).
+        burst (int): Presses per burst.
+        buttons (sequence of int): Buttons to pick from.
+        seed (int, optional): Random seed.
+    """
+
+    def __init__(self, sim, rate=50.0, distribution='poisson', *, burst=10,
+                 buttons=range(120), seed=None):
+        if distribution not in DISTRIBUTIONS:
+            raise ValueError("distribution must be one of %s; not %r." % (
+                ", ".join(DISTRIBUTIONS), distribution))
+        if rate <= 0:
+            raise ValueError("rate must be positive; not %r." % rate)
+        self.sim = sim
+        self.rate = rate
+        self.distribution = distribution
+        self.burst = burst
+        self.buttons = tuple(buttons)
+        self.injected = [] # (button, time.monotonic() before pressing it)
+        self._rng = random.Random(seed)
+        self._running = False
+        self._thread = None
+
+    def _gaps(self):
+        """Seconds between consecutive presses."""
+        rng = self._rng
+        while True:
+            if self.distribution == 'poisson':
+                yield rng.expovariate(self.rate)
+            elif self.distribution == 'periodic':
+                yield 1.0 / self.rate
+            else:
+                for _ in range(self.burst - 1):
+                    yield 0.0
+                yield self.burst / self.rate
+
+    def start(self):
+        if not self._running:
+            self._running = True
+            self._thread = threading.Thread(target=self._thread_func, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._running:
+            self._running = False
+            self._thread.join()
+
+    def _thread_func(self):
+        # Presses are scheduled against their ideal times, so a slow
+        # send_btn_press delays presses but does not lower the rate.
+        due = time.monotonic()
+        for gap in self._gaps():
+            if not self._running:
+                break
+            _sleep_until(due)
+            btn = self._rng.choice(self.buttons)
+            self.injected.append((btn, time.monotonic()))
+            self.sim.send_btn_press(btn)
+            due += gap
+
+
+def match_presses(injected, received):
+    """Pair injected and received presses of each button in order.
+
+    Returns:
+        tuple: (list of latencies in seconds, presses never received,
+        presses received that were not injected)
+    """
+    pending = {}
+    for btn, stamp in injected:
+        pending.setdefault(btn, []).append(stamp)
+    latencies = []
+    unexpected = 0
+    for btn, stamp in received:
+        stamps = pending.get(btn)
+        if not stamps:
+            unexpected += 1
+            continue
+        latencies.append(stamp - stamps.pop(0))
+    return latencies, sum(len(s) for s in pending.values()), unexpected
+
+
+def run_storm(driver, sim, duration=10.0, rate=50.0, distribution='poisson', *, burst=10,
+              writes=True, settle=0.5, stall=0.1, seed=None):
+    """Run a button storm and an LED write workload at the same time.
+
+    The writes are random single LED and range writes, sent back to
+    back for 'duration' seconds. Presses are read until 'settle'
+    seconds after the storm ended.
+
+    Args:
+        driver (:obj:`att26a.ATT26A`): Driver of the console 'sim' is.
+        sim: Simulated console to press buttons on.
+        duration (float): Seconds to run the storm for.
+        rate, distribution, burst: See ButtonStorm.
+        writes (bool): Run the write workload.
+        settle (float): Seconds to wait for late presses.
+        stall (float): Button or ACK latency counted as a stall.
+        seed (int, optional): Random seed.
+
+    Returns:
+        dict: 'buttons' and 'writes' (summaries like att26a.bench's,
+        plus press counts and timeouts) and 'stalls'.
+    """
+    rng = random.Random(seed)
+    storm = ButtonStorm(sim, rate, distribution, burst=burst, seed=rng.random())
+    received = []
+    reading = threading.Event()
+    reading.set()
+
+    def read_buttons():
+        while reading.is_set():
+            try:
+                btn = driver.get_btn_press(timeout=0.05)
+            except ButtonTimeoutError:
+                continue
+            except DriverClosedError:
+                break
+            received.append((btn, time.monotonic()))
+
+    while True: # Start from an empty button queue.
+        try:
+            driver.get_btn_press(block=False)
+        except ButtonTimeoutError:
+            break
+    reader = threading.Thread(target=read_buttons, daemon=True)
+    reader.start()
+
+    dropped = driver.dropped_button_count
+    retransmits = driver.retransmit_count
+    wr = WorkloadResult('writes')
+    timeouts = 0
+    storm.start()
+    start = time.monotonic()
+    try:
+        while time.monotonic() - start < duration:
+            if not writes:
+                time.sleep(0.01)
+                continue
+            if rng.random() < 0.5:
+                args = (rng.choice(LED_MODES), rng.randrange(120))
+                op = driver.set_led_state
+            else:
+                args = (rng.randrange(100), [rng.random() < 0.5 for _ in range(rng.randint(1, 77))])
+                op = driver.set_led_range_state
+            t = time.perf_counter()
+            try:
+                op(*args)
+            except CommandTimeoutError:
+                timeouts += 1
+                wr.errors += 1
+            except Att26AProtocolError:
+                wr.errors += 1
+            else:
+                wr.latencies.append(time.perf_counter() - t)
+    finally:
+        storm.stop()
+        wr.elapsed = time.monotonic() - start
+        time.sleep(settle)
+        reading.clear()
+        reader.join()
+
+    latencies, missing, unexpected = match_presses(storm.injected, received)
+    br = WorkloadResult('buttons')
+    br.latencies = latencies
+    br.errors = missing
+    br.elapsed = wr.elapsed
+    wr.retransmits = driver.retransmit_count - retransmits
+
+    buttons = br.summary()
+    buttons.update({'injected': len(storm.injected), 'received': len(received),
+                    'dropped': missing, 'unexpected': unexpected,
+                    'queue_full_drops': driver.dropped_button_count - dropped})
+    writes = wr.summary()
+    writes['timeouts'] = timeouts
+    stalls = [l for l in latencies + wr.latencies if l > stall]
+    return {'buttons': buttons, 'writes': writes,
+            'stalls': {'count': len(stalls) + timeouts,
+                       'max_ms': max(stalls) * 1000.0 if stalls else None}}
+
+
+def format_report(result):
+    from .bench import format_report as bench_report
+    b, w, s = result['buttons'], result['writes'], result['stalls']
+    return "\n".join([
+        bench_report({'buttons': b, 'writes': w}),
+        "presses: %d injected, %d received, %d dropped (%d by a full queue), %d unexpected" % (
+            b['injected'], b['received'], b['dropped'], b['queue_full_drops'],
+            b['unexpected']),
+        "writes: %d timeouts; stalls: %d%s" % (
+            w['timeouts'], s['count'],
+            " (longest %.1f ms)" % s['max_ms'] if s['max_ms'] is not None else ""),
+    ])
+
+
+def _add_arguments(parser):
+    parser.add_argument('--rate', type=float, default=50.0, help='Mean presses per second.')
+    parser.add_argument('--distribution', type=str, default='poisson', choices=DISTRIBUTIONS,
+                        help='Distribution of the gaps between presses.')
+    parser.add_argument('--burst', type=int, default=10, help='Presses per burst.')
+    parser.add_argument('--duration', type=float, default=10.0,
+                        help='Seconds to run the storm for.')
+    parser.add_argument('--no-writes', action='store_true',
+                        help='Only press buttons; send no LED writes.')
+    parser.add_argument('--stall', type=float, default=100.0,
+                        help='Latency in ms counted as a stall.')
+    parser.add_argument('--port', type=int, default=7790,
+                        help='Local port of the simulated console.')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='Random seed, for repeatable storms.')
+
+def storm_cli(devname, args):
+    import att26a
+    from .serial_adapter import RFC2217SerialAdapter
+
+    firmware = None
+    if devname == 'emu' or devname.startswith('emu:'):
+        from .firmwaresim import load_firmware
+        try:
+            firmware = load_firmware(devname[4:] or None)
+        except OSError as e:
+            print("ERROR:", str(e))
+            return 1
+    elif devname != 'sim':
+        print("ERROR: the console must be 'sim' or 'emu[:FIRMWARE]'; not %r." % devname)
+        return 1
+
+    adapter = RFC2217SerialAdapter('localhost', args.port)
+    if firmware is None:
+        from .simulator import Att26aSim, SimTiming
+        sim = Att26aSim(adapter, timing=SimTiming())
+    else:
+        from .firmwaresim import Att26aFirmwareSim
+        sim = Att26aFirmwareSim(adapter, firmware)
+    try:
+        with att26a.ATT26A('rfc2217://localhost:%d' % args.port) as driver:
+            result = run_storm(driver, sim, args.duration, args.rate, args.distribution,
+                               burst=args.burst, writes=not args.no_writes,
+                               stall=args.stall / 1000.0, seed=args.seed)
+    finally:
+        if hasattr(sim, 'stop'):
+            sim.stop()
+        adapter.close()
+    print(format_report(result))
+    return 0
+
+def main_cli():
+    from .clihelper import setup_standard_demo_cli
+    setup_standard_demo_cli('AT&T 26A button storm ("sim" is the protocol simulator, '
+                            '"emu" the firmware emulator)', storm_cli, _add_arguments)
+
+if __name__ == "__main__":
+    main_cli()
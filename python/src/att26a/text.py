@@ -0,0 +1,262 @@
+"""Scrolling text on the main 10x10 grid.
+
+Messages are drawn with a 5x7 bitmap font and scroll from right to
+left, one column per step. Everything is computed up front: a
+ScrollingText holds, for every step, the commands turning the previous
+step into it (usually one range write) and a keyframe range write that
+sets the whole text band at once. A TextScroller only sends them at a
+steady rate, so scrolling costs almost no CPU, and any number of
+consoles can scroll the same ScrollingText each with their own
+scroller:
+
+    renderer = text.TextRenderer()
+    ticker = renderer.scrolling("HELLO WORLD")
+    with text.TextScroller(driver, ticker, rate=8.0):
+        ...
+
+A scroller that falls behind skips ahead and resends the keyframe of
+the step that is due, so it never drifts behind the clock.
+"""
+
+import logging
+import threading
+import time
+
+from . import LED_ON, Att26AError, DriverClosedError
+from . import framecache
+from . import framediff
+from . import grid
+
+GLYPH_WIDTH = 5
+GLYPH_HEIGHT = 7
+
+# Classic 5x7 font, printable ASCII from ' ' to '~'. Five column bytes
+# per glyph, left to right; bit 0 is the top row.
+_FONT_5X7 = bytes.fromhex(
+    '0000000000' '00005f0000' '0007000700' '147f147f14' '242a7f2a12'
+    '2313086462' '3649562050' '0005030000' '001c224100' '0041221c00'
+    '14083e0814' '08083e0808' '0050300000' '0808080808' '0060600000'
+    '2010080402' '3e5149453e' '00427f4000' '4261514946' '2141454b31'
+    '1814127f10' '2745454539' '3c4a494930' '0171090503' '3649494936'
+    '064949291e' '0036360000' '0056360000' '0814224100' '1414141414'
+    '0041221408' '0201510906' '3249794136' '7e1111117e' '7f49494936'
+    '3e41414122' '7f4141221c' '7f49494941' '7f09090901' '3e4149497a'
+    '7f0808087f' '00417f4100' '2040413f01' '7f08142241' '7f40404040'
+    '7f020c027f' '7f0408107f' '3e4141413e' '7f09090906' '3e4151215e'
+    '7f09192946' '4649494931' '01017f0101' '3f4040403f' '1f2040201f'
+    '3f4038403f' '6314081463' '0708700807' '6151494543' '007f414100'
+    '0204081020' '0041417f00' '0402010204' '4040404040' '0001020400'
+    '2054545478' '7f48444438' '3844444420' '384444487f' '3854545418'
+    '087e090102' '0814545434' '7f08040478' '00447d4000' '2040443d00'
+    '7f10284400' '00417f4000' '7c04180478' '7c08040478' '3844444438'
+    '7c14141408' '081414187c' '7c08040408' '4854545420' '043f444020'
+    '3c4040207c' '1c2040201c' '3c4030403c' '4428102844' '0c5050503c'
+    '4464544c44' '0008364100' '00007f0000' '0041360800' '1008081008')
+_FIRST_CHAR = 0x20
+
+
+class GlyphCache(object):
+    """Column bitmaps of characters, decoded once per character.
+
+    Characters the font does not have are drawn as '?'.
+
+    Args:
+        font (bytes, optional): GLYPH_WIDTH column bytes per glyph,
+            starting at ' ' (the built in font by default).
+    """
+
+    def __init__(self, font=None):
+        self.font = _FONT_5X7 if font is None else bytes(font)
+        self._glyphs = {}
+
+    def __len__(self):
+        return len(self._glyphs)
+
+    def glyph(self, char):
+        """Columns of 'char', left to right, as bitmasks (bit 0 on top)."""
+        cols = self._glyphs.get(char)
+        if cols is None:
+            index = ord(char) - _FIRST_CHAR
+            if not 0 <= index < len(self.font) // GLYPH_WIDTH:
+                index = ord('?') - _FIRST_CHAR
+            cols = tuple(self.font[index * GLYPH_WIDTH:(index + 1) * GLYPH_WIDTH])
+            self._glyphs[char] = cols
+        return cols
+
+    def columns(self, message, spacing=1):
+        """Columns of 'message', each glyph followed by 'spacing' blank ones."""
+        gap = (0,) * spacing
+        cols = []
+        for char in message:
+            cols.extend(self.glyph(char))
+            cols.extend(gap)
+        return cols
+
+
+class ScrollingText(object):
+    """Precomputed steps of a message scrolling across the main grid.
+
+    Step 0 shows an empty band; the message then enters from the right
+    and the last step shows its last column at the left edge, so
+    looping back to step 0 continues the scroll seamlessly.
+
+    Args:
+        columns (list of int): Column bitmasks of the message.
+        row (int): Panel row (0-3) of the top of the text band.
+        cost (:obj:`att26a.framediff.CommandCost`, optional): cost
+            model used to plan the deltas.
+    """
+
+    def __init__(self, columns, row=1, cost=None):
+        if not 0 <= row <= grid.MAIN_ROWS - GLYPH_HEIGHT:
+            raise ValueError("row must be between 0 and %d; not %d."
+                             % (grid.MAIN_ROWS - GLYPH_HEIGHT, row))
+        self.row = row
+        # LED IDs of the text band: whole rows of the main grid, so
+        # one contiguous range.
+        self.band_start = grid.ROWS[row + GLYPH_HEIGHT - 1][0]
+        self.band_end = grid.ROWS[row][-1] + 1
+
+        strip = [0] * grid.WIDTH + list(columns)
+        self.steps = len(columns) + grid.WIDTH
+        frames = [self._frame(strip[i:i + grid.WIDTH]) for i in range(self.steps)]
+        self.keyframes = [(framediff.CMD_RANGE, self.band_start,
+                           tuple(frame[i] == LED_ON for i in range(self.band_start,
+                                                                   self.band_end)))
+                          for frame in frames]
+        self.deltas = [framediff.plan_updates(frames[i - 1], frames[i],
+                                              range(self.band_start, self.band_end), cost)
+                       for i in range(self.steps)]
+        self.nbytes = sum(len(cmd[2]) if cmd[0] == framediff.CMD_RANGE else 8
+                          for cmds in self.deltas for cmd in cmds) + \
+            self.steps * (self.band_end - self.band_start)
+
+    def _frame(self, window):
+        frame = bytearray(120)
+        for x, mask in enumerate(window):
+            for dy in range(GLYPH_HEIGHT):
+                if mask & (1 << dy):
+                    frame[grid.ROWS[self.row + dy][x]] = LED_ON
+        return frame
+
+    def __len__(self):
+        return self.steps
+
+
+class TextRenderer(object):
+    """Build ScrollingTexts, caching glyphs and rendered messages.
+
+    Args:
+        font (bytes, optional): See GlyphCache.
+        spacing (int): Blank columns after every character.
+        cache_bytes (int): Size of the cache of rendered messages.
+    """
+
+    def __init__(self, font=None, spacing=1, cache_bytes=1 << 20):
+        self.glyphs = GlyphCache(font)
+        self.spacing = spacing
+        self.cache = framecache.EncodedFrameCache(cache_bytes)
+
+    def scrolling(self, message, row=1, cost=None):
+        """Return the ScrollingText of 'message' (see ScrollingText)."""
+        key = ('text', message, row, cost.key if cost is not None else None)
+        text = self.cache.get(key)
+        if text is None:
+            text = ScrollingText(self.glyphs.columns(message, self.spacing), row, cost)
+            self.cache.put(key, text, text.nbytes)
+        return text
+
+
+class TextScroller(object):
+    """Thread sending a ScrollingText to a 26A at a steady rate.
+
+    The scroller only writes the text band; it starts with a keyframe,
+    so the band may show anything beforehand.
+
+    Args:
+        driver (:obj:`att26a.ATT26A`): Driver to scroll on.
+        text (:obj:`ScrollingText`): Text to scroll.
+        rate (float): Steps (columns) per second.
+        loop (bool): Start over after the last step instead of
+            stopping.
+        log (:obj:`logging.Logger`, optional): logging object.
+    """
+
+    def __init__(self, driver, text, rate=8.0, loop=True, log=None):
+        self._log = logging.getLogger('att26a') if not log else log
+        self.driver = driver
+        self.text = text
+        self.rate = rate
+        self.loop = loop
+        self.step = 0
+        self.skipped = 0
+        self._running = False
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    @property
+    def running(self):
+        return self._running
+
+    def start(self):
+        if not self._running:
+            self._running = True
+            self._thread = threading.Thread(target=self._thread_func, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._running:
+            self._running = False
+            self._thread.join()
+
+    def join(self, timeout=None):
+        """Wait for a scroller that does not loop to finish."""
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _thread_func(self):
+        text = self.text
+        period = 1.0 / self.rate
+        due = time.monotonic()
+        resync = True
+        step = 0
+        while self._running:
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -period:
+                # Behind by whole steps: jump to the one that is due.
+                late = int(-delay / period)
+                step += late
+                due += late * period
+                self.skipped += late
+                resync = True
+                if step >= text.steps and not self.loop:
+                    break
+                step %= text.steps
+
+            cmds = (text.keyframes[step],) if resync else text.deltas[step]
+            try:
+                framediff.send_updates(self.driver, cmds)
+                resync = False
+            except DriverClosedError:
+                self._log.error("Driver closed; text scroller stopping.")
+                break
+            except Att26AError as e:
+                self._log.warning("Scrolling text failed (%s); resending the band.", e)
+                resync = True
+
+            self.step = step
+            step += 1
+            due += period
+            if step == text.steps:
+                if not self.loop:
+                    break
+                step = 0
+        self._running = False
@@ -0,0 +1,19 @@
+from att26a import LED_OFF, LED_ON
+from att26a import framediff
+
+
+class FakeDriver(object):
+    """Records commands and mirrors what a 26A would show."""
+
+    def __init__(self):
+        self.frame = bytearray(120)
+        self.cmds = []
+
+    def set_led_state(self, state, ledID):
+        self.cmds.append((framediff.CMD_LED, state, ledID))
+        self.frame[ledID] = state
+
+    def set_led_range_state(self, start_ledid, states_on_off):
+        self.cmds.append((framediff.CMD_RANGE, start_ledid, list(states_on_off)))
+        for i, val in enumerate(states_on_off):
+            self.frame[(start_ledid + i) % 100] = LED_ON if val else LED_OFF
@@ -0,0 +1,187 @@
+import os
+import random
+import shutil
+import tempfile
+import threading
+import unittest
+
+from att26a import LED_OFF, LED_ON, LED_BLINK1, LED_BLINK2, LED_MODES
+from att26a import animation
+from att26a import grid
+from att26a.simulator import Att26aSim
+
+from test_simulator import Capture
+
+
+class RecordingDriver(object):
+    """Driver stand-in decoding the frames it is sent with a simulator."""
+
+    journal = None
+
+    def __init__(self, stop_after=None, stop=None):
+        self.sim = Att26aSim(Capture(), threaded=False)
+        self.sent = 0
+        self.stop_after = stop_after
+        self.stop = stop
+
+    def _tx_frame(self, outmsg, idempotent=False):
+        self.sim._rx(bytes(outmsg))
+        self.sent += 1
+        if self.stop_after is not None and self.sent >= self.stop_after:
+            self.stop.set()
+        return b''
+
+    def replay(self, player, n):
+        """Send record 'n' of 'player'; its views are released on return."""
+        for cmd in player.commands(n):
+            self._tx_frame(cmd)
+
+    @property
+    def leds(self):
+        return bytes(self.sim.snapshot()[0])
+
+
+def random_frames(rng, count):
+    frames = [bytes(120)]
+    for _ in range(count - 1):
+        frame = bytearray(frames[-1])
+        for i in rng.sample(range(120), rng.randint(0, 60)):
+            frame[i] = rng.choice((LED_OFF, LED_ON, LED_ON, LED_BLINK1, LED_BLINK2))
+        frames.append(bytes(frame))
+    return frames
+
+
+class AnimationTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.rng = random.Random(40)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def path(self, name):
+        return os.path.join(self.dir, name)
+
+    def test_round_trip(self):
+        frames = random_frames(self.rng, 20)
+        path = self.path('a.anim')
+        self.assertEqual(animation.compile_animation(frames, path, fps=50.0), 20)
+
+        with animation.AnimationPlayer(path) as player:
+            self.assertEqual(player.frames, 20)
+            self.assertFalse(player.loops)
+            self.assertAlmostEqual(player.duration, 19 / 50.0)
+            driver = RecordingDriver()
+            for n, frame in enumerate(frames):
+                self.assertTrue(all(bytes(cmd).count(0xFF) == 1 for cmd in player.commands(n)))
+                driver.replay(player, n)
+                self.assertEqual(driver.leds, frame, n)
+
+            driver = RecordingDriver()
+            player.play(driver, speed=1000.0)
+            self.assertEqual(driver.leds, frames[-1])
+            self.assertEqual(driver.sent, sum(len(player.commands(n)) for n in range(20)))
+
+    def test_timed_frames(self):
+        frames = random_frames(self.rng, 3)
+        path = self.path('t.anim')
+        animation.compile_animation([(0.0, frames[0]), (0.5, frames[1]), (2.25, frames[2])], path)
+        with animation.AnimationPlayer(path) as player:
+            self.assertEqual([player._record(n)[0] for n in range(3)], [0, 500000, 2250000])
+        with self.assertRaises(ValueError):
+            animation.compile_animation([(1.0, frames[0]), (0.5, frames[1])], path)
+
+    def test_loop(self):
+        frames = random_frames(self.rng, 5)
+        frames[0] = bytes([LED_ON] * 10 + [LED_OFF] * 110)
+        path = self.path('l.anim')
+        animation.compile_animation(frames, path, fps=10.0, loop=True)
+        with animation.AnimationPlayer(path) as player:
+            self.assertTrue(player.loops)
+            self.assertAlmostEqual(player.duration, 0.5)
+            driver = RecordingDriver()
+            for n in range(6):
+                driver.replay(player, n)
+            self.assertEqual(driver.leds, frames[0])
+
+            # A second lap replays from frame 1 on top of the looped frame 0.
+            for n in range(1, 5):
+                driver.replay(player, n)
+                self.assertEqual(driver.leds, frames[n])
+
+            per_lap = sum(len(player.commands(n)) for n in range(1, 6))
+            stop = threading.Event()
+            driver = RecordingDriver(stop_after=len(player.commands(0)) + 2 * per_lap, stop=stop)
+            player.play(driver, loop=True, speed=1000.0, stop=stop)
+            self.assertEqual(driver.leds, frames[0])
+
+    def test_not_an_animation(self):
+        path = self.path('bad.anim')
+        with open(path, 'wb') as f:
+            f.write(b'\0' * 64)
+        with self.assertRaises(ValueError):
+            animation.AnimationPlayer(path)
+
+    def strip(self, frames):
+        """Gray pixels of an image strip of 'frames'."""
+        gray = {LED_OFF: 0, LED_BLINK1: 100, LED_BLINK2: 150, LED_ON: 255}
+        return [gray[frame[ledID]] for frame in frames
+                for row in grid.ROWS for ledID in row]
+
+    def test_image_strips(self):
+        frames = random_frames(self.rng, 3)
+        pixels = self.strip(frames)
+        height = 12 * len(frames)
+
+        plain = self.path('plain.pgm')
+        with open(plain, 'w') as f:
+            f.write("P2\n# strip\n10 %d\n255\n" % height)
+            f.write("\n".join(" ".join(str(p) for p in pixels[i:i + 10])
+                              for i in range(0, len(pixels), 10)) + "\n")
+        raw = self.path('raw.pgm')
+        with open(raw, 'wb') as f:
+            f.write(b"P5\n10 %d\n255\n" % height + bytes(pixels))
+        color = self.path('color.ppm')
+        with open(color, 'wb') as f:
+            f.write(b"P6 10 %d 255\n" % height + bytes(p for p in pixels for _ in range(3)))
+        for path in (plain, raw, color):
+            self.assertEqual(list(animation.frames_from_image_strip(path)), frames, path)
+
+        # Bitmaps only know OFF (black) and ON (white).
+        onoff = [bytes(LED_ON if m == LED_ON else LED_OFF for m in frame) for frame in frames]
+        bits = [1 if p == 0 else 0 for p in self.strip(onoff)]
+        pbm = self.path('bits.pbm')
+        with open(pbm, 'wb') as f:
+            f.write(b"P4\n10 %d\n" % height)
+            for y in range(height):
+                row = bits[y * 10:y * 10 + 10]
+                value = sum(bit << (15 - x) for x, bit in enumerate(row))
+                f.write(bytes((value >> 8, value & 0xFF)))
+        self.assertEqual(list(animation.frames_from_image_strip(pbm)), onoff)
+
+        bad = self.path('wide.pgm')
+        with open(bad, 'wb') as f:
+            f.write(b"P5\n11 12\n255\n" + bytes(132))
+        with self.assertRaises(ValueError):
+            list(animation.frames_from_image_strip(bad))
+
+    def test_csv(self):
+        frames = random_frames(self.rng, 2)
+        names = {v: k for k, v in animation.MODE_NAMES.items()}
+        path = self.path('a.csv')
+        with open(path, 'w') as f:
+            f.write("# time, then 120 modes\n")
+            f.write("0.0," + ",".join(str(m) for m in frames[0]) + "\n\n")
+            f.write("0.25," + ",".join(names[m].upper() for m in frames[1]) + "\n")
+        self.assertEqual(list(animation.frames_from_csv(path)),
+                         [(0.0, frames[0]), (0.25, frames[1])])
+
+        with open(path, 'w') as f:
+            f.write("0.0," + ",".join(["3"] * 120) + "\n")
+        with self.assertRaises(ValueError):
+            list(animation.frames_from_csv(path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+import random
+import unittest
+
+from att26a import ButtonTimeoutError
+from att26a import bench
+
+from fakes import FakeDriver
+
+
+class PressingDriver(FakeDriver):
+    """FakeDriver whose operator presses the buttons in 'presses'."""
+
+    def __init__(self, presses):
+        super(PressingDriver, self).__init__()
+        self.presses = list(presses)
+        self.prompted = 0
+
+    def get_btn_press(self, block=True, timeout=None):
+        if not block:
+            raise ButtonTimeoutError()
+        self.prompted += 1
+        return self.presses.pop(0)
+
+
+class BenchButtonsTest(unittest.TestCase):
+
+    def test_wrong_presses_leave_no_leds_lit(self):
+        rng = random.Random(39)
+        targets = random.Random(39).sample(range(120), 3)
+        wrong = next(b for b in range(120) if b not in targets)
+        driver = PressingDriver([targets[0], wrong, targets[2]])
+        result = bench.bench_buttons(driver, 3, rng)
+
+        self.assertEqual(result.name, 'button_echo')
+        self.assertEqual(len(result.latencies), 3)
+        self.assertEqual(result.errors, 1)
+        self.assertEqual(driver.frame, bytes(120))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import random
+import unittest
+
+from att26a import LED_OFF, LED_ON, LED_MODES
+from att26a import compositor
+from att26a import framediff
+
+from fakes import FakeDriver
+
+
+class PlanUpdatesTest(unittest.TestCase):
+
+    def test_untouched_leds_keep_their_mode(self):
+        rng = random.Random(26)
+        for _ in range(200):
+            current = bytearray(rng.choice(LED_MODES) for _ in range(120))
+            changed = set(rng.sample(range(120), rng.randint(0, 40)))
+            target = bytearray(current)
+            for i in changed:
+                target[i] = rng.choice(LED_MODES)
+            driver = FakeDriver()
+            driver.frame[:] = current
+            framediff.send_updates(driver, framediff.plan_updates(current, target, changed))
+            self.assertEqual(driver.frame, target)
+
+
+class CompositorTest(unittest.TestCase):
+
+    def test_tick_keeps_leds_lit_on_earlier_ticks(self):
+        driver = FakeDriver()
+        comp = compositor.Compositor(driver)
+        layer = comp.add_layer()
+        for i in range(0, 40, 2):
+            layer.set_led_state(LED_ON, i)
+        comp.tick()
+        for i in range(1, 40, 2):
+            layer.set_led_state(LED_ON, i)
+        comp.tick()
+
+        self.assertEqual(driver.frame, comp.compose())
+        self.assertEqual(comp.shown, bytes(comp.compose()))
+        self.assertEqual(list(driver.frame[:40]), [LED_ON] * 40)
+
+    def test_layers_survive_each_others_ticks(self):
+        rng = random.Random(35)
+        driver = FakeDriver()
+        comp = compositor.Compositor(driver)
+        layers = [comp.add_layer(z) for z in range(3)]
+        for _ in range(100):
+            layer = rng.choice(layers)
+            for i in rng.sample(range(120), rng.randint(1, 30)):
+                if rng.random() < 0.2:
+                    layer.clear_led(i)
+                else:
+                    layer.set_led_state(rng.choice((LED_ON, LED_OFF)), i)
+            comp.tick()
+            self.assertEqual(driver.frame, comp.compose())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import threading
+import unittest
+
+from att26a import LED_ON, CommandTimeoutError
+from att26a import consoled
+
+from fakes import FakeDriver
+
+
+class FlakyDriver(FakeDriver):
+    """FakeDriver whose first 'failures' commands time out."""
+
+    def __init__(self, failures):
+        super(FlakyDriver, self).__init__()
+        self.failures = failures
+        self.events = []
+
+    def set_led_state(self, state, ledID):
+        if self.failures:
+            self.failures -= 1
+            raise CommandTimeoutError("No ACK")
+        super(FlakyDriver, self).set_led_state(state, ledID)
+        self.events.append('sent')
+
+
+class DeadDriver(FakeDriver):
+    """FakeDriver of a console that never answers."""
+
+    def __init__(self):
+        super(DeadDriver, self).__init__()
+        self.attempts = 0
+
+    def set_led_state(self, state, ledID):
+        self.attempts += 1
+        raise CommandTimeoutError("No ACK")
+
+
+class FakeLoop(object):
+
+    def __init__(self, driver):
+        self.driver = driver
+
+    def call_soon_threadsafe(self, func, *args):
+        self.driver.events.append(('synced', [token for _, token in args[0]]))
+
+
+class PainterTest(unittest.TestCase):
+
+    def test_sync_is_acknowledged_after_the_frame_is_sent(self):
+        driver = FlakyDriver(failures=2)
+        daemon = consoled.ConsoleDaemon(driver)
+        daemon._loop = FakeLoop(driver)
+        layer = daemon.compositor.add_layer()
+        with daemon.compositor.batch():
+            layer.set_led_state(LED_ON, 105)
+        daemon._syncs.append((None, 7))
+
+        daemon._running = True
+        daemon._wake.set()
+        painter = threading.Thread(target=daemon._painter_func, daemon=True)
+        painter.start()
+        for _ in range(100):
+            if len(driver.events) >= 2:
+                break
+            threading.Event().wait(0.01)
+        daemon._running = False
+        daemon._wake.set()
+        painter.join(1)
+
+        self.assertEqual(driver.events, ['sent', ('synced', [7])])
+        self.assertEqual(driver.frame[105], LED_ON)
+
+    def test_failing_updates_back_off(self):
+        driver = DeadDriver()
+        daemon = consoled.ConsoleDaemon(driver)
+        layer = daemon.compositor.add_layer()
+        layer.set_led_state(LED_ON, 105)
+
+        daemon._running = True
+        daemon._wake.set()
+        painter = threading.Thread(target=daemon._painter_func, daemon=True)
+        with self.assertLogs('att26aconsoled', 'WARNING') as logs:
+            painter.start()
+            threading.Event().wait(0.5)
+            daemon._running = False
+            painter.join(2)
+
+        # 0.05 + 0.1 + 0.2 + 0.4 seconds of backoff fit in 0.5 seconds.
+        self.assertLessEqual(driver.attempts, 5)
+        self.assertEqual(len(logs.records), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,23 @@
+import unittest
+
+from att26a import ATT26A
+from att26a import explorer
+
+
+class ProbeMessagesTest(unittest.TestCase):
+
+    def test_every_message_can_be_framed(self):
+        params = explorer.DEFAULT_PARAMS + (b'\x01' * explorer.MAX_PARAMS,
+                                            b'\x01' * (explorer.MAX_PARAMS + 1))
+        messages = list(explorer.probe_messages(params=params))
+        self.assertTrue(messages)
+        for msg in messages:
+            framed = ATT26A.frame_msg(msg)
+            self.assertEqual(framed.count(0xFF), 1)
+        lengths = {len(msg) - 2 for msg in messages}
+        self.assertIn(explorer.MAX_PARAMS, lengths)
+        self.assertNotIn(explorer.MAX_PARAMS + 1, lengths)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import random
+import unittest
+
+from att26a import LED_OFF, LED_ON, LED_BLINK1, LED_MODES
+from att26a import grid
+
+from fakes import FakeDriver
+
+
+class GridTest(unittest.TestCase):
+
+    def test_position_round_trip(self):
+        for ledID in range(120):
+            self.assertEqual(grid.led_id(*grid.position(ledID)), ledID)
+        self.assertEqual(grid.led_id(0, 0), 90)
+        self.assertEqual(grid.led_id(9, 11), 119)
+
+    def test_unknown_leds_outside_the_shape_are_kept(self):
+        driver = FakeDriver()
+        driver.frame[75] = LED_ON
+        g = grid.Grid(driver)
+        g.fill_rect(0, 0, 3, 3, LED_ON)
+        g.draw_col(6, LED_ON)
+        self.assertEqual(driver.frame[75], LED_ON)
+        self.assertEqual(set(grid.rect_ids(0, 0, 3, 3)) | set(grid.rect_ids(6, 0, 1, 12)),
+                         {i for i in range(120) if driver.frame[i] == LED_ON} - {75})
+
+    def test_random_drawing_only_changes_drawn_leds(self):
+        rng = random.Random(49)
+        driver = FakeDriver()
+        driver.frame[:] = bytes(rng.choice(LED_MODES) for _ in range(120))
+        expected = bytearray(driver.frame)
+        g = grid.Grid(driver)
+        for _ in range(200):
+            x, y = rng.randrange(-2, 10), rng.randrange(-2, 12)
+            w, h = rng.randrange(0, 6), rng.randrange(0, 6)
+            mode = rng.choice((LED_ON, LED_OFF, LED_ON, LED_BLINK1))
+            g.fill_rect(x, y, w, h, mode)
+            for i in grid.rect_ids(x, y, w, h):
+                expected[i] = mode
+            self.assertEqual(driver.frame, expected)
+
+    def test_known_frame_allows_spanning(self):
+        driver = FakeDriver()
+        g = grid.Grid(driver, shown=bytes(120))
+        self.assertEqual(g.fill_rect(0, 0, 3, 3, LED_ON), 1)
+        self.assertEqual(driver.cmds[0][0], 'range')
+
+
+if __name__ == '__main__':
+    unittest.main()
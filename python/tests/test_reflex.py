@@ -0,0 +1,24 @@
+import unittest
+
+from att26a import LED_OFF, LED_ON
+from att26a import reflex
+
+
+class ReflexTest(unittest.TestCase):
+
+    def test_invalid_modes_are_rejected(self):
+        for cls in (reflex.Toggle, reflex.RadioGroup):
+            self.assertRaises(ValueError, cls, [1], on=0x3)
+            self.assertRaises(ValueError, cls, [1], off=0x10)
+        self.assertRaises(ValueError, reflex.Set, [1], state=0x3)
+        self.assertRaises(ValueError, reflex.Cycle, [1], modes=(LED_OFF, 0x3))
+
+    def test_radio_group(self):
+        rule = reflex.RadioGroup([1, 2, 3])
+        self.assertEqual(rule.press(2), [(LED_ON, 2)])
+        self.assertEqual(rule.press(3), [(LED_ON, 3), (LED_OFF, 2)])
+        self.assertEqual(rule.press(9), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+import queue
+import threading
+import time
+import unittest
+
+import serial
+
+import att26a
+from att26a import rtt
+
+
+class RttEstimatorTest(unittest.TestCase):
+
+    def test_first_sample(self):
+        est = rtt.RttEstimator()
+        self.assertEqual(est.rto, 0.1)
+        est.sample(0.012, wire=0.002)
+        self.assertEqual(est.min_rtt, 0.012)
+        self.assertAlmostEqual(est.srtt, 0.010)
+        self.assertAlmostEqual(est.rttvar, 0.005)
+        self.assertAlmostEqual(est.rto, 0.030)
+
+    def test_smoothing(self):
+        est = rtt.RttEstimator()
+        est.sample(0.010)
+        est.sample(0.018)
+        self.assertAlmostEqual(est.rttvar, 0.75 * 0.005 + 0.25 * 0.008)
+        self.assertAlmostEqual(est.srtt, 0.875 * 0.010 + 0.125 * 0.018)
+        self.assertEqual(est.samples, 2)
+        self.assertEqual(est.min_rtt, 0.010)
+
+    def test_backoff_doubles_up_to_max(self):
+        est = rtt.RttEstimator(initial_rto=0.1, max_rto=0.5)
+        est.backoff()
+        self.assertAlmostEqual(est.rto, 0.2)
+        est.backoff()
+        est.backoff()
+        self.assertEqual(est.rto, 0.5)
+
+    def test_clamping(self):
+        est = rtt.RttEstimator(min_rto=0.005, max_rto=1.0)
+        est.sample(0.0001)
+        self.assertEqual(est.rto, 0.005)
+        est = rtt.RttEstimator(min_rto=0.005, max_rto=1.0)
+        est.sample(2.0)
+        self.assertEqual(est.rto, 1.0)
+        est.sample(0.001, wire=0.002) # Shorter than the wire time.
+        self.assertGreaterEqual(est.srtt, 0.0)
+
+    def test_seed_only_before_samples(self):
+        est = rtt.RttEstimator()
+        est.seed(0.02, 0.005)
+        self.assertAlmostEqual(est.rto, 0.04)
+        est.sample(0.01)
+        est.seed(0.5, 0.5)
+        self.assertNotEqual(est.srtt, 0.5)
+
+    def test_wire_time(self):
+        self.assertAlmostEqual(rtt.wire_time(10752 // 11, 10752), 977 * 11 / 10752.0)
+
+
+class AckingPort(object):
+    """Serial port ACKing the n-th write after delays[n] seconds."""
+
+    def __init__(self, delays, baudrate=1200):
+        self.delays = list(delays)
+        self.baudrate = baudrate
+        self.dtr = True
+        self.writes = []
+        self._rx = queue.Queue()
+
+    def write(self, data):
+        delay = self.delays[len(self.writes)] if len(self.writes) < len(self.delays) else 0.0
+        self.writes.append((time.monotonic(), bytes(data)))
+        timer = threading.Timer(delay, self._rx.put, (b'\xfd',))
+        timer.daemon = True
+        timer.start()
+        return len(data)
+
+    def read(self, size=1):
+        data = self._rx.get()
+        if data is None:
+            raise serial.SerialException("Closed")
+        return data
+
+    def close(self):
+        self._rx.put(None)
+
+
+class RetransmitTest(unittest.TestCase):
+
+    def test_late_ack_before_any_sample_is_discarded(self):
+        # At 1200 baud a 5 byte frame and its ACK need 55 ms on the
+        # wire. The first transmission times out after wire + 100 ms;
+        # its ACK then arrives 15 ms into the retransmission, which is
+        # too early to answer it. The retransmission is never ACKed,
+        # so only a third transmission can complete the command.
+        port = AckingPort([0.170, 5.0, 0.080])
+        with att26a.ATT26A(port) as driver:
+            self.assertIsNone(driver.rtt.min_rtt)
+            driver.set_led_state(att26a.LED_ON, 3)
+            self.assertEqual(len(port.writes), 3)
+            self.assertEqual(driver.retransmit_count, 2)
+            self.assertEqual(driver.late_ack_count, 1)
+
+    def test_lost_acks_raise_after_retries(self):
+        port = AckingPort([5.0] * 3)
+        with att26a.ATT26A(port, max_retries=2) as driver:
+            driver.rtt = rtt.RttEstimator(initial_rto=0.02, max_rto=0.05)
+            with self.assertRaises(att26a.CommandTimeoutError):
+                driver.set_led_state(att26a.LED_ON, 3)
+            self.assertEqual(driver.retransmit_count, 2)
+            self.assertEqual(len(port.writes), 3)
+
+    def test_non_idempotent_commands_are_not_retransmitted(self):
+        port = AckingPort([5.0])
+        with att26a.ATT26A(port) as driver:
+            driver.rtt = rtt.RttEstimator(initial_rto=0.02, max_rto=0.05)
+            with self.assertRaises(att26a.CommandTimeoutError):
+                driver._tx_frame(att26a.ATT26A.frame_msg(b'\x85\x10'))
+            self.assertEqual(driver.retransmit_count, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import socket
+import threading
+import unittest
+
+import serial
+
+from att26a.ringbuffer import RingBuffer
+from att26a.serial_adapter import RFC2217SerialAdapter, AsyncRFC2217SerialAdapter
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('localhost', 0))
+        return s.getsockname()[1]
+
+
+class RingBufferTest(unittest.TestCase):
+
+    def test_wraps_and_grows(self):
+        ring = RingBuffer(4)
+        ring.write(b'abc')
+        self.assertEqual(ring.read(2), b'ab')
+        ring.write(b'defgh')
+        self.assertEqual(ring.in_waiting, 6)
+        self.assertEqual(ring.read(6), b'cdefgh')
+
+    def test_interrupt_and_resume(self):
+        ring = RingBuffer()
+        ring.interrupt()
+        self.assertEqual(ring.read(1), b'')
+        ring.resume()
+        threading.Timer(0.05, ring.write, (b'x',)).start()
+        self.assertEqual(ring.read(1), b'x')
+
+
+class ReopenTest(unittest.TestCase):
+
+    def _read_after_reopen(self, adapter, port):
+        adapter.close()
+        adapter.open()
+        try:
+            client = serial.serial_for_url('rfc2217://localhost:%d' % port, timeout=1)
+            try:
+                threading.Timer(0.1, client.write, (b'hello',)).start()
+                self.assertEqual(adapter.read(5), b'hello')
+            finally:
+                client.close()
+        finally:
+            adapter.close()
+
+    def test_rfc2217_adapter_reads_after_reopen(self):
+        port = _free_port()
+        self._read_after_reopen(RFC2217SerialAdapter('localhost', port), port)
+
+    def test_async_adapter_reads_after_reopen(self):
+        port = _free_port()
+        self._read_after_reopen(AsyncRFC2217SerialAdapter('localhost', port), port)
+
+
+class AsyncRFC2217SerialAdapterTest(unittest.TestCase):
+
+    def test_port_in_use_raises(self):
+        with socket.socket() as taken:
+            taken.bind(('localhost', 0))
+            taken.listen()
+            port = taken.getsockname()[1]
+            with self.assertRaises(OSError):
+                AsyncRFC2217SerialAdapter('localhost', port)
+
+    def test_bound_port(self):
+        adapter = AsyncRFC2217SerialAdapter('localhost', 0)
+        try:
+            self.assertTrue(adapter.bound_port)
+        finally:
+            adapter.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import asyncio
+import socket
+import threading
+import unittest
+
+import att26a
+from att26a import simfarm
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('localhost', 0))
+        return s.getsockname()[1]
+
+
+class SimFarmTest(unittest.TestCase):
+
+    def test_driver_sets_leds_on_a_farm_console(self):
+        farm = simfarm.SimFarm(1, base_port=_free_port())
+        loop = asyncio.new_event_loop()
+        started = threading.Event()
+
+        async def serve():
+            serving = asyncio.ensure_future(farm.serve())
+            await asyncio.sleep(0.1)
+            started.set()
+            await serving
+        thread = threading.Thread(target=loop.run_until_complete, args=(serve(),), daemon=True)
+        thread.start()
+        started.wait(5)
+        try:
+            with att26a.ATT26A('rfc2217://localhost:%d' % farm.consoles[0].port) as driver:
+                driver.set_led_state(att26a.LED_ON, 5)
+                driver.set_led_range_state(10, [True] * 20)
+                leds = bytes.fromhex(farm.consoles[0].state()['leds'])
+        finally:
+            loop.call_soon_threadsafe(farm.stop)
+            thread.join(2)
+
+        self.assertEqual(leds[5], att26a.LED_ON)
+        self.assertEqual(list(leds[10:30]), [att26a.LED_ON] * 20)
+        self.assertEqual(leds[30], att26a.LED_OFF)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import random
+import unittest
+
+from att26a import ATT26A, LED_OFF, LED_ON, LED_BLINK1
+from att26a.simulator import Att26aSim
+
+
+class Capture(object):
+    """Write end of a serial port, collecting the simulator's responses."""
+
+    def __init__(self):
+        self.data = bytearray()
+
+    def write(self, data):
+        self.data += data
+
+
+def range_frame(start, states):
+    return ATT26A.frame_msg(ATT26A.encode_led_range_state(start, states))
+
+
+def expected_leds(leds, start, states):
+    leds = bytearray(leds)
+    for i, val in enumerate(states):
+        leds[(start + i) % 100] = LED_ON if val else LED_OFF
+    return leds
+
+
+class RangeDecodeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.port = Capture()
+        self.sim = Att26aSim(self.port, threaded=False)
+        self.rng = random.Random(29)
+
+    def leds(self):
+        return bytes(self.sim.snapshot()[0])
+
+    def test_every_length_and_start(self):
+        for length in range(1, 78):
+            if length == 71:
+                continue
+            for start in (0, 23, 50, 99, self.rng.randrange(100)):
+                states = [self.rng.random() < 0.5 for _ in range(length)]
+                expected = expected_leds(self.leds(), start, states)
+                self.sim._rx(range_frame(start, states))
+                self.assertEqual(self.leds(), bytes(expected), (start, length))
+                self.assertEqual(self.port.data[-1:], b'\xfd')
+
+    def test_seventy_is_sent_as_itself(self):
+        msg = ATT26A.encode_led_range_state(0, [True] * 70)
+        self.assertEqual(msg[3], 70)
+        self.sim._rx(ATT26A.frame_msg(msg))
+        self.assertEqual(self.leds()[:71], bytes([LED_ON] * 70 + [LED_OFF]))
+
+    def test_wrap_past_led_99(self):
+        self.sim._rx(ATT26A.frame_msg(ATT26A.encode_led_state(LED_BLINK1, 100)))
+        self.sim._rx(range_frame(95, [True] * 10))
+        leds = self.leds()
+        self.assertEqual(leds[95:100], bytes([LED_ON] * 5))
+        self.assertEqual(leds[0:5], bytes([LED_ON] * 5))
+        self.assertEqual(leds[5], LED_OFF)
+        self.assertEqual(leds[100], LED_BLINK1) # Not reached by the wrap.
+
+    def test_chunked_stream(self):
+        frames = []
+        expected = bytearray(120)
+        for _ in range(50):
+            start = self.rng.randrange(100)
+            states = [self.rng.random() < 0.5 for _ in range(self.rng.choice((1, 7, 69, 70, 72, 77)))]
+            frames.append(range_frame(start, states))
+            expected = expected_leds(expected, start, states)
+        stream = b''.join(frames)
+        pos = 0
+        while pos < len(stream):
+            n = self.rng.randint(1, 40)
+            self.sim._rx(stream[pos:pos + n])
+            pos += n
+        self.assertEqual(self.leds(), bytes(expected))
+        self.assertEqual(self.port.data.count(0xFD), len(frames))
+
+    def test_bad_hash_is_dropped(self):
+        frame = bytearray(range_frame(0, [True] * 5))
+        frame[-2] ^= 0x01
+        self.sim._rx(bytes(frame))
+        self.assertEqual(self.leds(), bytes(120))
+        self.assertEqual(self.port.data, b'')
+
+
+if __name__ == '__main__':
+    unittest.main()